@@ -1,7 +1,17 @@
+from typing import Optional
+
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 
 
-def instance_bot(TOKEN: str) -> Bot:
-    return Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+def instance_bot(TOKEN: str, api_url: Optional[str] = None) -> Bot:
+    # A local Bot API server (or the benchmark's fake one) replaces api.telegram.org.
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_url)) if api_url else None
+    return Bot(
+        token=TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
@@ -1,4 +1,5 @@
-import grpc
+import asyncio
+
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -7,12 +8,8 @@ from aiogram.types.reply_keyboard_remove import ReplyKeyboardRemove
 from states import Form
 
 from bot.logger import logger
-from bot.services import (
-    DetectHandler,
-    PhotoProcessor,
-    PlantDiagnostics,
-    PredictionService,
-)
+from bot.services import AnalysisQueue, PhotoProcessor
+from bot.settings import settings
 
 predict_router = Router(name=__name__)
 
@@ -61,84 +58,31 @@ async def handle_plant_selection(message: Message, state: FSMContext) -> None:
 
 @predict_router.message(Form.predict_get_photo, F.photo)
 async def handle_get_photo(message: Message, state: FSMContext) -> None:
-    await state.update_data(predict_get_photo=message.photo[-1].file_id)
+    # The smallest rendition that still covers the detector input is enough.
+    photo_size = PhotoProcessor.select_photo_size(
+        message.photo, min_side=settings.DETECT_IMGSZ,
+    )
+    await state.update_data(predict_get_photo=photo_size.file_id)
     data = await state.get_data()
 
-    # Save the photo to a temporary file.
     try:
-        image_path = await PhotoProcessor.save_photo_to_tempfile(
-            data=data,
+        queue = AnalysisQueue.get_instance()
+        job = queue.submit(
             message=message,
-        )
-    except Exception as e:
-        logger.error(f"Error processing photo: {e}")
-        await message.answer("❌ Ошибка при обработке фото.")
-        return
-
-    await message.answer("🔄 Идет анализ фото...")
-
-    # Detect objects in the image.
-    try:
-        detect_handler = await DetectHandler.get_instance(
-            model_path="models/leaf_detect.pt",
-        )
-
-        detection_boxes, photo = await detect_handler.detect(image_path)
-        detection_count = len(detection_boxes)
-
-        if detection_count:
-            logger.info(f"Detected {detection_count} objects.")
-            await message.answer(f"Обнаружено объектов: {detection_count}")
-        else:
-            logger.info("No objects detected.")
-            await message.answer("Объекты не обнаружены. Попробуйте другое фото.")
-            return
-
-        await message.reply_photo(
-                photo=photo,
-                caption="🔍 Обнаруженные объекты",
-            )
-
-        await state.clear()
-
-    except Exception as e:
-        logger.error(f"Error during detection: {e}")
-        await message.answer("❌ Ошибка при обнаружении объектов.")
-        await state.clear()
-        return
-
-    # Make predictions based on the detected objects.
-    try:
-        predict_result = await PredictionService.predict(
+            state=state,
             data=data,
-            detection_boxes=detection_boxes,
+            photo_size=photo_size,
         )
-
-        plant_diagnostics = PlantDiagnostics()
-        report = await plant_diagnostics.analyze_and_report(
-            results=predict_result,
-            plant_type=data["predict"].lower(),
+    except asyncio.QueueFull:
+        logger.warning("Analysis queue is full, rejecting photo")
+        await message.answer(
+            "⏳ Сейчас слишком много запросов. Отправьте фото еще раз через минуту.",
         )
+        return
 
-        if not report:
-            await message.answer("❌ Что-то пошло не так. Отчет пуст, повторите попытку позже.")
-        else:
-            for item in report:
-                await message.answer(item)
-
-    except ConnectionError as e:
-        await message.answer("❌ Не удалось подключиться к серверу. Попробуйте позже.")
-        logger.error(f"Connection error: {e}")
-        await state.clear()
-    except grpc.RpcError as e:
-        error_message = f"❌ Ошибка сервера: {e.details()}"
-        await message.answer(error_message)
-        logger.error(f"gRPC error: {e}")
-        await state.clear()
-    except Exception as e:
-        await message.answer("❌ Произошла непредвиденная ошибка. Попробуйте еще раз.")
-        logger.error(f"Unexpected error: {e}")
-        await state.clear()
+    await job.progress.update(
+        f"🕐 Фото добавлено в очередь на анализ. Позиция в очереди: {queue.position(job)}",
+    )
 
 
 @predict_router.message(Form.predict_get_photo)
@@ -10,8 +10,14 @@ from aiogram import Dispatcher
 from bot.bot_instance import instance_bot
 from bot.logger import logger
 from bot.routers import main_router
+from bot.services.detection import DetectHandler
+from bot.services.diagnostics import DiseaseIndex
 from bot.services.grpc.prediction import PredictClient
+from bot.services.grpc.shm import SharedMemoryRing
+from bot.services.jobs import AnalysisQueue, run_analysis
 from bot.settings import settings
+from bot.storage import create_storage
+from bot.webhook import run_webhook
 
 
 def register_routers(dp: Dispatcher) -> None:
@@ -19,28 +25,61 @@ def register_routers(dp: Dispatcher) -> None:
     dp.include_router(main_router)
 
 
-async def main() -> None:
-    dp = Dispatcher(bot=bot)
-    register_routers(dp)
+async def on_startup() -> None:
+    """Prepare the services every bot worker needs."""
+    # Compile the diseases database before the first report is needed.
+    DiseaseIndex.get_instance()
 
-    await dp.start_polling(bot)
+    client = await PredictClient.get_instance(
+        host=settings.GRPC_HOST_LOCAL,
+        port=settings.GRPC_PORT,
+    )
 
+    try:
+        await client.connect()
+    except ConnectionError as e:
+        logger.error(f"Failed to connect to gRPC server: {e}")
+        sys.exit(1)
 
-if __name__ == "__main__":
-    bot = instance_bot(settings.BOT_TOKEN)
+    # Load the detector replicas while polling already serves other commands.
+    DetectHandler.preload(model_path=settings.DETECT_MODEL_PATH)
 
-    async def run():
-        client = await PredictClient.get_instance(
-            host=settings.GRPC_HOST_LOCAL,
-            port=settings.GRPC_PORT,
-        )
+    AnalysisQueue.start(
+        run_analysis,
+        workers=settings.ANALYSIS_WORKERS,
+        max_size=settings.ANALYSIS_QUEUE_SIZE,
+    )
 
-        try:
-            await client.connect()
-        except ConnectionError as e:
-            logger.error(f"Failed to connect to gRPC server: {e}")
-            sys.exit(1)
 
-        await main()
+async def on_shutdown() -> None:
+    await AnalysisQueue.get_instance().stop()
+    DetectHandler.log_pool_stats()
+    SharedMemoryRing.close_instance()
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(
+        storage=create_storage(settings.FSM_STORAGE_URL, ttl=settings.FSM_STATE_TTL),
+    )
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    register_routers(dp)
+
+    return dp
 
-    asyncio.run(run())
+
+async def main() -> None:
+    bot = instance_bot(settings.BOT_TOKEN, api_url=settings.TELEGRAM_API_URL)
+    dp = create_dispatcher()
+
+    # A webhook left over from webhook mode makes getUpdates fail with a
+    # conflict, pending updates stay queued for polling.
+    await bot.delete_webhook(drop_pending_updates=False)
+    await dp.start_polling(bot)
+
+
+if __name__ == "__main__":
+    if settings.BOT_MODE == "webhook":
+        run_webhook(create_dispatcher)
+    else:
+        asyncio.run(main())
@@ -1,13 +1,19 @@
+from .cache import ResultCache
 from .detection import DetectHandler, PhotoProcessor
-from .diagnostics import PlantDiagnostics
+from .diagnostics import DiseaseIndex, PlantDiagnostics
 from .grpc import PredictClient, PredictionService
+from .jobs import AnalysisQueue, run_analysis
 from .mapping import ModelMapper
 
 __all__ = [
+    "AnalysisQueue",
     "DetectHandler",
+    "DiseaseIndex",
     "ModelMapper",
     "PhotoProcessor",
     "PlantDiagnostics",
     "PredictClient",
     "PredictionService",
+    "ResultCache",
+    "run_analysis",
 ]
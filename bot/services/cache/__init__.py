@@ -0,0 +1,6 @@
+from .result_cache import CachedResult, ResultCache
+
+__all__ = [
+    "CachedResult",
+    "ResultCache",
+]
@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from bot.logger import logger
+from bot.settings import settings
+
+if TYPE_CHECKING:
+    from cv2.typing import MatLike
+
+
+@dataclass
+class CachedResult:
+    boxes: np.ndarray
+    annotated_file_id: str
+    report: list[str]
+    photo_hash: Optional[int] = None
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class ResultCache:
+    """ResultCache class remembers finished analyses of recently seen photos.
+
+    Entries are keyed by plant type and the photo's Telegram `file_unique_id`.
+    Photos that were re-encoded on the way (forwarded, resent after a network
+    error) are matched by a 64-bit perceptual hash within `max_distance` bits.
+    The cache is bounded by entry count (LRU) and by age.
+    """
+
+    _instance: Optional["ResultCache"] = None
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, max_distance: int = 4) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+
+        self._entries: OrderedDict[tuple[str, str], CachedResult] = OrderedDict()
+
+    @classmethod
+    def get_instance(cls) -> "ResultCache":
+        if cls._instance is None:
+            cls._instance = cls(
+                max_entries=settings.RESULT_CACHE_SIZE,
+                ttl=settings.RESULT_CACHE_TTL,
+                max_distance=settings.RESULT_CACHE_MAX_DISTANCE,
+            )
+        return cls._instance
+
+    @staticmethod
+    def perceptual_hash(image: "MatLike") -> int:
+        """Compute the 64-bit difference hash of an image.
+
+        Args:
+            image (MatLike): Grayscale or BGR image, may be heavily downscaled.
+
+        Returns:
+            int: The hash, close images differ in few bits.
+
+        """
+        import cv2
+
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    @classmethod
+    def hash_file(cls, image_path: str) -> Optional[int]:
+        """Compute the perceptual hash from a cheap 1/8 scale decode of the file."""
+        import cv2
+
+        image = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if image is None:
+            return None
+        return cls.perceptual_hash(image)
+
+    def _expired(self, entry: CachedResult) -> bool:
+        return time.monotonic() - entry.created_at > self.ttl
+
+    def get(self, plant_type: str, file_unique_id: str) -> Optional[CachedResult]:
+        key = (plant_type, file_unique_id)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if self._expired(entry):
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def find_similar(self, plant_type: str, photo_hash: int) -> Optional[CachedResult]:
+        """Find a cached photo of the same plant with a close perceptual hash."""
+        if self.max_distance <= 0:
+            return None
+
+        best, best_distance = None, self.max_distance + 1
+
+        for (cached_plant, _), entry in self._entries.items():
+            if cached_plant != plant_type or entry.photo_hash is None:
+                continue
+            if self._expired(entry):
+                continue
+
+            distance = (entry.photo_hash ^ photo_hash).bit_count()
+            if distance < best_distance:
+                best, best_distance = entry, distance
+
+        if best is not None:
+            logger.debug("Near-duplicate photo found at distance %d", best_distance)
+        return best
+
+    def put(self, plant_type: str, file_unique_id: str, result: CachedResult) -> None:
+        key = (plant_type, file_unique_id)
+
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,7 +1,20 @@
+from .batcher import DetectionBatcher, Detections
+from .crops import CropEncoder
 from .handler import DetectHandler
+from .intake import DecodePlan, ImageIntake
+from .pool import DetectorPool, PoolStats
+from .preview import PreviewRenderer
 from .processor import PhotoProcessor
 
 __all__ = [
+    "CropEncoder",
+    "DecodePlan",
     "DetectHandler",
+    "DetectionBatcher",
+    "Detections",
+    "DetectorPool",
+    "ImageIntake",
     "PhotoProcessor",
+    "PoolStats",
+    "PreviewRenderer",
 ]
@@ -0,0 +1,234 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+import numpy as np
+
+from bot.logger import logger
+from bot.services.detection.pool import DetectorPool
+
+if TYPE_CHECKING:
+    from cv2.typing import MatLike
+
+
+@dataclass
+class Detections:
+    """Detected boxes for a single image in original image coordinates.
+
+    Attributes:
+        boxes (np.ndarray): Array of shape (N, 4) with x1, y1, x2, y2 boxes.
+        scores (np.ndarray): Array of shape (N,) with detector confidences.
+        dropped (int): Number of duplicate or tiny boxes left out of `boxes`.
+        over_budget (int): Number of distinct leaves left out of `boxes`
+            because the leaf budget was reached.
+
+    """
+
+    boxes: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 4), dtype=np.float32),
+    )
+    scores: np.ndarray = field(
+        default_factory=lambda: np.empty((0,), dtype=np.float32),
+    )
+    dropped: int = 0
+    over_budget: int = 0
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+
+@dataclass
+class _PendingDetection:
+    image: "MatLike"
+    future: asyncio.Future
+
+
+def letterbox(
+    image: "MatLike",
+    size: int,
+    pad_value: int = 114,
+) -> tuple[np.ndarray, float, tuple[int, int]]:
+    """Resize the image keeping its aspect ratio and pad it to a square.
+
+    Args:
+        image (MatLike): BGR image to letterbox.
+        size (int): Side of the square output image.
+        pad_value (int): Value used to fill the padding.
+
+    Returns:
+        tuple: The letterboxed image, the scale applied and the (x, y) padding.
+
+    """
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (size - new_width) // 2
+    pad_y = (size - new_height) // 2
+
+    canvas = np.full((size, size, 3), pad_value, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = image
+
+    return canvas, scale, (pad_x, pad_y)
+
+
+def unletterbox_boxes(
+    boxes: np.ndarray,
+    scale: float,
+    pad: tuple[int, int],
+    shape: tuple[int, int],
+) -> np.ndarray:
+    """Map boxes from letterboxed coordinates back to the original image.
+
+    Args:
+        boxes (np.ndarray): Array of shape (N, 4) with x1, y1, x2, y2 boxes.
+        scale (float): Scale returned by `letterbox`.
+        pad (tuple[int, int]): Padding returned by `letterbox`.
+        shape (tuple[int, int]): Height and width of the original image.
+
+    Returns:
+        np.ndarray: Boxes in original image coordinates.
+
+    """
+    boxes = boxes.astype(np.float32, copy=True)
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+
+    height, width = shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+    return boxes
+
+
+class DetectionBatcher:
+    """DetectionBatcher class groups detection requests from concurrent callers.
+
+    Images submitted within `max_wait_ms` of each other (up to `max_batch_size`)
+    are letterboxed to a common size and sent through the detector in a single
+    forward pass. Every caller receives only the boxes of its own image.
+
+    A batch is closed once a replica of the pool is free, so every replica
+    runs its own batch and the batches grow while all of them are busy.
+    """
+
+    def __init__(
+        self,
+        pool: DetectorPool,
+        imgsz: int = 640,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        conf: float = 0.5,
+    ) -> None:
+        self._pool = pool
+        self.imgsz = imgsz
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.conf = conf
+
+        self._queue: asyncio.Queue[_PendingDetection] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def submit(self, image: "MatLike") -> Detections:
+        """Queue an image for detection and wait for its boxes.
+
+        Args:
+            image (MatLike): BGR image to run the detector on.
+
+        Returns:
+            Detections: Boxes and confidences for the submitted image.
+
+        """
+        self._ensure_worker()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingDetection(image=image, future=future))
+
+        return await future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _collect_batch(self, first: _PendingDetection) -> list[_PendingDetection]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+
+            # Requests arriving while every replica is busy join this batch.
+            model = await self._pool.acquire()
+            try:
+                batch = await self._collect_batch(first)
+            except BaseException:
+                self._pool.release(model)
+                raise
+
+            task = asyncio.create_task(self._run_batch(model, batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, model: Any, batch: list[_PendingDetection]) -> None:
+        logger.debug("Running detection batch of %d images", len(batch))
+
+        try:
+            detections = await asyncio.to_thread(
+                self._infer, model, [pending.image for pending in batch],
+            )
+        except Exception as e:
+            logger.error("Error during batched detection: %s", e, exc_info=True)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        finally:
+            self._pool.release(model)
+
+        for pending, result in zip(batch, detections):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    def _infer(self, model: Any, images: "list[MatLike]") -> list[Detections]:
+        letterboxed = [letterbox(image, self.imgsz) for image in images]
+
+        results = model.predict(
+            [canvas for canvas, _, _ in letterboxed],
+            task="detect",
+            imgsz=self.imgsz,
+            conf=self.conf,
+            save=False,
+            verbose=False,
+        )
+
+        detections = []
+        for image, (_, scale, pad), result in zip(images, letterboxed, results):
+            boxes = result.boxes.xyxy.cpu().numpy()
+            scores = result.boxes.conf.cpu().numpy().astype(np.float32)
+
+            detections.append(Detections(
+                boxes=unletterbox_boxes(boxes, scale, pad, image.shape[:2]),
+                scores=scores,
+            ))
+
+        return detections
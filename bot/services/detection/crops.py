@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, ClassVar, Optional
+
+import numpy as np
+
+from bot.logger import logger
+
+if TYPE_CHECKING:
+    from cv2.typing import MatLike
+
+
+class CropEncoder:
+    """CropEncoder class prepares leaf crops for the classifiers.
+
+    Each box is squared and padded, resized to the input resolution of the
+    target classifier, which differs between plants, and encoded in a shared
+    worker pool, so crops of one photo are encoded in parallel and the gRPC
+    payload stays small.
+    """
+
+    FORMATS: ClassVar[dict[str, str]] = {
+        "jpeg": ".jpg",
+        "webp": ".webp",
+        "png": ".png",
+        # Uncompressed pixels in a container mlcore can decode.
+        "raw": ".bmp",
+    }
+
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(
+        self,
+        size: int = 320,
+        padding: float = 0.1,
+        image_format: str = "jpeg",
+        quality: int = 90,
+        workers: int = 4,
+    ) -> None:
+        if image_format not in self.FORMATS:
+            error_msg = f"Unsupported crop format: {image_format}"
+            raise ValueError(error_msg)
+
+        self.size = size
+        self.padding = padding
+        self.image_format = image_format
+        self.quality = quality
+        self.workers = workers
+
+    @classmethod
+    def _get_executor(cls, workers: int) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="crop-encoder",
+            )
+        return cls._executor
+
+    @property
+    def _encode_params(self) -> list[int]:
+        import cv2
+
+        if self.image_format == "jpeg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        if self.image_format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        if self.image_format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        return []
+
+    def square_box(self, box: np.ndarray, shape: tuple[int, int]) -> tuple[int, ...]:
+        """Expand a box to a padded square around its center.
+
+        Args:
+            box (np.ndarray): The x1, y1, x2, y2 box.
+            shape (tuple[int, int]): Height and width of the image.
+
+        Returns:
+            tuple: The x1, y1, x2, y2 square, possibly outside the image.
+
+        """
+        x1, y1, x2, y2 = (float(v) for v in box)
+        side = max(x2 - x1, y2 - y1) * (1 + self.padding)
+        side = max(int(round(side)), 1)
+
+        height, width = shape
+        side = min(side, max(height, width))
+
+        x1 = int(round((x1 + x2 - side) / 2))
+        y1 = int(round((y1 + y2 - side) / 2))
+
+        # Shift the square back inside the image where it fits.
+        x1 = min(max(x1, 0), max(width - side, 0)) if side <= width else x1
+        y1 = min(max(y1, 0), max(height - side, 0)) if side <= height else y1
+
+        return x1, y1, x1 + side, y1 + side
+
+    def prepare(self, image: "MatLike", box: np.ndarray, size: Optional[int] = None) -> np.ndarray:
+        """Cut a square crop around the box and resize it for the classifier.
+
+        Args:
+            image (MatLike): The original BGR image.
+            box (np.ndarray): The x1, y1, x2, y2 box.
+            size (Optional[int]): Classifier input side, `self.size` if None.
+
+        Returns:
+            np.ndarray: The size x size BGR crop.
+
+        """
+        import cv2
+
+        size = size or self.size
+
+        height, width = image.shape[:2]
+        x1, y1, x2, y2 = self.square_box(box, (height, width))
+
+        crop = image[max(y1, 0):min(y2, height), max(x1, 0):min(x2, width)]
+
+        # Pad whatever part of the square lies outside the image.
+        top, left = max(-y1, 0), max(-x1, 0)
+        bottom, right = max(y2 - height, 0), max(x2 - width, 0)
+        if top or left or bottom or right:
+            crop = cv2.copyMakeBorder(
+                crop, top, bottom, left, right,
+                cv2.BORDER_CONSTANT, value=(114, 114, 114),
+            )
+
+        interpolation = (
+            cv2.INTER_AREA if crop.shape[0] > size else cv2.INTER_LINEAR
+        )
+        return cv2.resize(crop, (size, size), interpolation=interpolation)
+
+    def encode(self, crop: np.ndarray) -> bytes:
+        import cv2
+
+        ok, buffer = cv2.imencode(
+            self.FORMATS[self.image_format], crop, self._encode_params,
+        )
+        if not ok:
+            error_msg = f"Failed to encode crop as {self.image_format}"
+            raise RuntimeError(error_msg)
+        return buffer.tobytes()
+
+    def _prepare_and_encode(self, image: "MatLike", box: np.ndarray, size: Optional[int]) -> bytes:
+        return self.encode(self.prepare(image, box, size))
+
+    async def encode_all(
+        self, image: "MatLike", boxes: np.ndarray, size: Optional[int] = None,
+    ) -> list[bytes]:
+        """Prepare and encode every box of the image in the worker pool.
+
+        Args:
+            image (MatLike): The original BGR image.
+            boxes (np.ndarray): Array of shape (N, 4) with x1, y1, x2, y2 boxes.
+            size (Optional[int]): Input side of the classifier the crops are
+                for, `self.size` if None.
+
+        Returns:
+            list[bytes]: Encoded crops in the order of the boxes.
+
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor(self.workers)
+
+        crops = await asyncio.gather(*(
+            loop.run_in_executor(executor, self._prepare_and_encode, image, box, size)
+            for box in boxes
+        ))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Encoded %d crops as %s, %d bytes total",
+                len(crops), self.image_format, sum(len(crop) for crop in crops),
+            )
+        return list(crops)
@@ -1,15 +1,21 @@
 import asyncio
-import tempfile
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import cv2
-import numpy as np
-from aiogram.types import FSInputFile
-from cv2.typing import MatLike
-from ultralytics import YOLO
-from ultralytics.engine.results import Results
+from aiogram.types import BufferedInputFile
 
 from bot.logger import logger
+from bot.services.detection.batcher import DetectionBatcher, Detections
+from bot.services.detection.crops import CropEncoder
+from bot.services.detection.intake import ImageIntake
+from bot.services.detection.pool import DetectorPool, PoolStats
+from bot.services.detection.preview import PreviewRenderer
+from bot.services.detection.quantization import resolve_variant
+from bot.services.detection.selection import select_leaves
+from bot.settings import settings
+from bot.tracing import tracer
+
+if TYPE_CHECKING:
+    from cv2.typing import MatLike
 
 
 class DetectHandler:
@@ -18,106 +24,178 @@ class DetectHandler:
     It manages loading models, running detections, and converting results.
     """
 
-    _model: Optional["YOLO"] = None
+    _pool: Optional[DetectorPool] = None
     _instance: Optional["DetectHandler"] = None
+    _loading: Optional[asyncio.Task] = None
     _lock = asyncio.Lock()
 
     def __init__(self, model_path: str) -> None:
         self.model_path = model_path
         self._load_model()
 
+        self._batcher = DetectionBatcher(
+            self._pool,
+            imgsz=settings.DETECT_IMGSZ,
+            max_batch_size=settings.DETECT_BATCH_SIZE,
+            max_wait_ms=settings.DETECT_BATCH_WAIT_MS,
+            conf=0.5,
+        )
+
+        self._crop_encoder = CropEncoder(
+            size=settings.CROP_SIZE,
+            padding=settings.CROP_PADDING,
+            image_format=settings.CROP_FORMAT,
+            quality=settings.CROP_QUALITY,
+            workers=settings.CROP_WORKERS,
+        )
+
+        self._preview = PreviewRenderer(
+            max_side=settings.PREVIEW_MAX_SIDE,
+            quality=settings.PREVIEW_QUALITY,
+        )
+
+        self._intake = ImageIntake(
+            max_bytes=settings.MAX_IMAGE_BYTES,
+            max_pixels=settings.MAX_IMAGE_PIXELS,
+            memory_budget=settings.DECODE_MEMORY_BUDGET,
+        )
+
     @classmethod
     async def get_instance(cls, model_path: str) -> "DetectHandler":
+        # Requests are only batched together when they share one handler.
         async with cls._lock:
-            if cls._model is None:
-                cls._instance = cls(model_path)
+            if cls._instance is None:
+                # Loading and warming up the replicas takes seconds.
+                cls._instance = await asyncio.to_thread(cls, model_path)
             return cls._instance
 
-    def _load_model(self) -> None:
-        try:
-            self._model = YOLO(self.model_path)
-            logger.info(f"Model loaded from {self.model_path}")
-        except Exception as e:
-            logger.error(f"Failed to load model: {e}")
-            raise
+    @classmethod
+    def preload(cls, model_path: str) -> asyncio.Task:
+        """Load and warm up the detector in the background.
 
-    async def _process_results(self, results: Results, image: MatLike) -> list[bytes]:
-        if not results:
-            return []
+        The bot serves updates meanwhile, photos that arrive before the
+        detector is ready wait for it in `get_instance`.
+
+        Args:
+            model_path (str): Path to the detector weights.
 
-        return [
-            await self._crop_and_convert_to_bytes(box, image) for box in results.boxes
-        ]
+        Returns:
+            asyncio.Task: The loading task.
+
+        """
+        if cls._loading is None:
+            cls._loading = asyncio.create_task(cls.get_instance(model_path))
+            cls._loading.add_done_callback(cls._log_loaded)
+        return cls._loading
+
+    @staticmethod
+    def _log_loaded(task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # The next photo retries the loading through get_instance.
+            logger.error(f"Failed to load the detector: {task.exception()}")
+        else:
+            logger.info("Detector is loaded and warmed up")
 
-    async def _crop_and_convert_to_bytes(self, box: Results, image: MatLike) -> bytes:
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        cropped_image = image[y1:y2, x1:x2]
+    @property
+    def pool_stats(self) -> PoolStats:
+        return self._pool.stats()
 
-        _, buffer = cv2.imencode(".jpg", cropped_image)
-        return buffer.tobytes()
+    @classmethod
+    def log_pool_stats(cls) -> None:
+        if cls._instance is None or cls._instance._pool is None:
+            return
 
-    def _draw_boxes(self, image: np.ndarray, results: Results) -> np.ndarray:
-        for box in results.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        stats = cls._instance.pool_stats
+        logger.info(
+            f"Detector pool: {stats.checkouts} checkouts, {stats.waited} waited, "
+            f"mean wait {stats.mean_wait * 1000:.1f} ms, "
+            f"max wait {stats.max_wait * 1000:.1f} ms",
+        )
 
-            confidence = None
-            if hasattr(box, "conf") and box.conf is not None:
-                try:
-                    confidence = float(box.conf[0])
-                except Exception as e:
-                    logger.error(f"Error extracting confidence: {e}", exc_info=True)
+    def _load_model(self) -> None:
+        try:
+            path = resolve_variant(self.model_path, settings.DETECT_PRECISION)
+            self._pool = DetectorPool.load(
+                path,
+                size=settings.DETECT_POOL_SIZE,
+                imgsz=settings.DETECT_IMGSZ,
+                warmup=settings.DETECT_WARMUP,
+            )
+            logger.info(f"Model loaded from {path}")
+        except Exception as e:
+            logger.error(f"Failed to load model: {e}")
+            raise
 
-            if confidence is not None:
-                label = f"leaf {confidence * 100:.1f}%"
-            else:
-                label = "leaf"
+    async def _process_results(
+        self, detections: Detections, image: "MatLike", crop_size: Optional[int] = None,
+    ) -> list[bytes]:
+        if not len(detections):
+            return []
 
-            cv2.putText(image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5, (255, 0, 0), 1, cv2.LINE_AA)
-        return image
+        with tracer.span("detect.crops", leaves=len(detections), size=crop_size):
+            return await self._crop_encoder.encode_all(image, detections.boxes, crop_size)
 
+    async def _render_preview(
+        self, image: "MatLike", detections: Detections,
+    ) -> BufferedInputFile:
+        with tracer.span("detect.annotate") as span:
+            photo = await self._preview.render_file(image, detections)
+            span.set_attribute("bytes", len(photo.data))
+        return photo
 
-    async def detect(self, image_path: str) -> tuple[list[bytes], FSInputFile]:
+    async def detect(
+        self, image_path: str, crop_size: Optional[int] = None,
+    ) -> tuple[list[bytes], BufferedInputFile, Detections]:
         """Detect objects in the image.
 
         Args:
             image_path (str): Path to the image file.
+            crop_size (Optional[int]): Input side of the classifier the crops
+                are for, CROP_SIZE if None.
 
         Returns:
-            tuple: A tuple containing a list of cropped images and a photo file.
+            tuple: A tuple containing a list of cropped images, the annotated
+            preview and the detected boxes.
 
         """
-        if self._model is None:
+        if self._pool is None:
             logger.error("Model is not loaded.")
             raise ValueError("Model not loaded.")
 
         try:
-            result = self._model.predict(
-                image_path,
-                task="detect",
-                save=False,
-                conf=0.5,
-            )
-
-            image = cv2.imread(image_path)
-            if image is None:
-                raise RuntimeError(f"Failed to load image from path: {image_path}")
-
-            image_with_boxes = self._draw_boxes(image, result[0])
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-                cv2.imwrite(temp_file.name, image_with_boxes)
-                logger.info(f"Annotated image saved to temporary file: {temp_file.name}")
-
-                photo = FSInputFile(temp_file.name)
-
-            cropped_boxes = await self._process_results(result[0], image)
-            logger.info(f"Processed {len(cropped_boxes)} cropped objects.")
-
-            cropped_boxes = await self._process_results(result[0], image)
+            data = await self._intake.read(image_path)
+
+            # The decoded photo holds its share of the memory budget until
+            # the crops and the preview are done.
+            async with self._intake.load(data) as image:
+                # Concurrent callers share a single batched forward pass.
+                with tracer.span("detect.inference"):
+                    detections = await self._batcher.submit(image)
+
+                # Bound the classification cost of dense photos.
+                detections = select_leaves(
+                    detections,
+                    image.shape[:2],
+                    max_leaves=settings.MAX_LEAVES,
+                    overlap_threshold=settings.LEAF_OVERLAP_THRESHOLD,
+                    min_area_ratio=settings.MIN_LEAF_AREA_RATIO,
+                )
+                if detections.dropped or detections.over_budget:
+                    logger.info(
+                        "Dropped %d duplicate or tiny boxes, %d leaves over the budget",
+                        detections.dropped, detections.over_budget,
+                    )
+
+                # The preview and the crops only read the original, so both run at once.
+                photo, cropped_boxes = await asyncio.gather(
+                    self._render_preview(image, detections),
+                    self._process_results(detections, image, crop_size),
+                )
+            logger.info("Processed %d cropped objects.", len(cropped_boxes))
         except Exception as e:
-            logger.error(f"Error during detection: {e}", exc_info=True)
+            logger.error("Error during detection: %s", e, exc_info=True)
             raise RuntimeError("Error processing the image") from e
         else:
-            return cropped_boxes, photo
+            return cropped_boxes, photo, detections
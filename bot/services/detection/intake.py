@@ -0,0 +1,195 @@
+import asyncio
+import io
+import math
+import os
+import warnings
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from bot.logger import RATE_LIMITED, logger
+
+if TYPE_CHECKING:
+    from cv2.typing import MatLike
+
+# Downscale factors cv2 can apply while decoding, libjpeg does it natively.
+REDUCTIONS = (1, 2, 4, 8)
+
+
+@dataclass(frozen=True)
+class DecodePlan:
+    width: int
+    height: int
+    reduction: int
+    # Bytes of decoded pixels alive at once while the image is decoded.
+    nbytes: int
+
+
+class ImageIntake:
+    """ImageIntake class decodes photos within byte, pixel and memory limits.
+
+    Files over `max_bytes` are rejected before they are read. The size of
+    the image is read from its header, and images over `max_pixels` are
+    decoded at 1/2, 1/4 or 1/8 scale instead of being rejected. Decoded
+    pixels held by the photos in flight are kept under `memory_budget`, new
+    photos waiting in arrival order until enough of it is released, so
+    small photos cannot keep overtaking a large one.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 20 * 1024 * 1024,
+        max_pixels: int = 16_000_000,
+        memory_budget: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.memory_budget = memory_budget
+
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        # Tickets of the photos waiting for the budget, oldest first.
+        self._waiting: deque[object] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _check_bytes(self, nbytes: int) -> None:
+        if nbytes > self.max_bytes:
+            error_msg = f"Image of {nbytes} bytes is over the limit of {self.max_bytes}"
+            raise ValueError(error_msg)
+
+    @staticmethod
+    def read_size(data: bytes) -> tuple[int, int]:
+        """Width and height from the image header, nothing is decoded."""
+        from PIL import Image
+
+        try:
+            with warnings.catch_warnings():
+                # Size limits are enforced here, not by Pillow.
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                with Image.open(io.BytesIO(data)) as image:
+                    return image.size
+        except Image.DecompressionBombError as e:
+            error_msg = f"Image is too large to decode: {e}"
+            raise ValueError(error_msg) from None
+        except Exception:
+            error_msg = "Failed to decode image data"
+            raise ValueError(error_msg) from None
+
+    def plan(self, data: bytes) -> DecodePlan:
+        """Check the limits and pick the scale the image is decoded at.
+
+        Args:
+            data (bytes): Encoded image.
+
+        Returns:
+            DecodePlan: The reduction and the size of the decoded pixels.
+
+        Raises:
+            ValueError: If the image is over `max_bytes` or its header
+                cannot be read.
+
+        """
+        self._check_bytes(len(data))
+        width, height = self.read_size(data)
+
+        reduction = next(
+            (
+                factor for factor in REDUCTIONS
+                if math.ceil(width / factor) * math.ceil(height / factor) <= self.max_pixels
+            ),
+            REDUCTIONS[-1],
+        )
+
+        # Only JPEGs are decoded at the reduced size, other formats are
+        # decoded in full and shrunk afterwards.
+        scale = reduction if data[:2] == b"\xff\xd8" else 1
+        nbytes = math.ceil(width / scale) * math.ceil(height / scale) * 3
+
+        return DecodePlan(width=width, height=height, reduction=reduction, nbytes=nbytes)
+
+    def decode(self, data: bytes, plan: DecodePlan) -> "MatLike":
+        """Decode the image at the planned scale, within `max_pixels`."""
+        import cv2
+
+        flags = {
+            1: cv2.IMREAD_COLOR,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), flags[plan.reduction])
+        if image is None:
+            error_msg = "Failed to decode image data"
+            raise ValueError(error_msg)
+
+        if plan.reduction > 1:
+            logger.info(
+                "Decoded a %dx%d photo at 1/%d scale", plan.width, plan.height, plan.reduction,
+                extra=RATE_LIMITED,
+            )
+
+        height, width = image.shape[:2]
+        if height * width > self.max_pixels:
+            # Still too large at 1/8, e.g. a very long panorama.
+            scale = math.sqrt(self.max_pixels / (height * width))
+            size = (max(int(width * scale), 1), max(int(height * scale), 1))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+        return image
+
+    async def read(self, path: str) -> bytes:
+        """Read a photo from disk, refusing files over `max_bytes` unread."""
+
+        def read_file() -> bytes:
+            with open(path, "rb") as f:
+                self._check_bytes(os.fstat(f.fileno()).st_size)
+                return f.read()
+
+        return await asyncio.to_thread(read_file)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """Hold `nbytes` of the memory budget, waiting until it is available.
+
+        Photos are let in first come, first served. A photo larger than the
+        whole budget goes once nothing else is in flight, so it is slowed
+        down rather than rejected.
+        """
+        ticket = object()
+        async with self._condition:
+            self._waiting.append(ticket)
+            try:
+                await self._condition.wait_for(
+                    lambda: self._waiting[0] is ticket and (
+                        self._in_flight == 0 or self._in_flight + nbytes <= self.memory_budget
+                    ),
+                )
+            except BaseException:
+                # A cancelled photo must not hold up the ones behind it.
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+                raise
+            self._waiting.popleft()
+            self._in_flight += nbytes
+            # The next photo in line may fit as well.
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= nbytes
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def load(self, data: bytes) -> AsyncIterator["MatLike"]:
+        """Decode the photo off the event loop, holding its share of the budget."""
+        plan = self.plan(data)
+        async with self.reserve(plan.nbytes):
+            yield await asyncio.to_thread(self.decode, data, plan)
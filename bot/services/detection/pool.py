@@ -0,0 +1,117 @@
+import asyncio
+import copy
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from bot.logger import logger
+from bot.services.detection.quantization import load_int8
+
+
+@dataclass
+class PoolStats:
+    """Checkout counters of a DetectorPool, wait times are in seconds."""
+
+    size: int
+    in_use: int = 0
+    checkouts: int = 0
+    waited: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.checkouts if self.checkouts else 0.0
+
+
+class DetectorPool:
+    """DetectorPool class holds warmed-up replicas of the leaf detector.
+
+    The weights are read from disk once and copied into every replica. Each
+    replica serves one caller at a time, callers wait for a free one through
+    an async checkout, so up to `size` batches run through the detector in
+    parallel without sharing a model between threads.
+    """
+
+    def __init__(self, replicas: list[Any]) -> None:
+        if not replicas:
+            error_msg = "DetectorPool needs at least one replica"
+            raise ValueError(error_msg)
+
+        self.replicas = list(replicas)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for replica in self.replicas:
+            self._idle.put_nowait(replica)
+
+        self._stats = PoolStats(size=len(self.replicas))
+
+    @classmethod
+    def load(cls, model_path: str, size: int, imgsz: int = 640, warmup: bool = True) -> "DetectorPool":
+        """Load the weights once and build `size` warmed-up replicas.
+
+        Args:
+            model_path (str): Path to the detector weights.
+            size (int): Number of replicas.
+            imgsz (int): Input size used for the warm-up pass.
+            warmup (bool): Run one dummy inference per replica.
+
+        Returns:
+            DetectorPool: The ready pool.
+
+        """
+        # ultralytics pulls in torch, only the detector loading thread pays for it.
+        from ultralytics import YOLO
+
+        model = YOLO(model_path)
+        load_int8(model)
+        replicas = [model] + [copy.deepcopy(model) for _ in range(max(size, 1) - 1)]
+
+        if warmup:
+            dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+            for replica in replicas:
+                replica.predict([dummy], task="detect", imgsz=imgsz, save=False, verbose=False)
+
+        logger.info(f"Detector pool ready with {len(replicas)} replicas of {model_path}")
+        return cls(replicas)
+
+    @property
+    def size(self) -> int:
+        return len(self.replicas)
+
+    async def acquire(self) -> Any:
+        """Wait for a free replica and take it out of the pool."""
+        start = time.monotonic()
+        replica = await self._idle.get()
+        wait = time.monotonic() - start
+
+        stats = self._stats
+        stats.checkouts += 1
+        stats.in_use += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        if wait > 0.001:
+            stats.waited += 1
+            logger.debug("Waited %.1f ms for a detector replica", wait * 1000)
+
+        return replica
+
+    def release(self, replica: Any) -> None:
+        """Return a replica taken with `acquire`."""
+        self._stats.in_use -= 1
+        self._idle.put_nowait(replica)
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator[Any]:
+        """Borrow a replica for the duration of the `async with` block."""
+        replica = await self.acquire()
+        try:
+            yield replica
+        finally:
+            self.release(replica)
+
+    def stats(self) -> PoolStats:
+        return copy.copy(self._stats)
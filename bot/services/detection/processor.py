@@ -1,7 +1,11 @@
+import math
 import tempfile
-from typing import Any
+from typing import Any, Optional
 
-from aiogram.types import Message
+import numpy as np
+from aiogram.types import Message, PhotoSize
+
+from bot.services.detection.batcher import Detections
 
 
 class PhotoProcessor:
@@ -27,3 +31,66 @@ class PhotoProcessor:
 
         return tmp.name
 
+    @staticmethod
+    def select_photo_size(photo_sizes: list[PhotoSize], min_side: int) -> PhotoSize:
+        """Pick the smallest rendition whose longer side is at least `min_side`.
+
+        The detector letterboxes its input by the longer side, so anything above
+        its input resolution is only downscaled again.
+
+        Args:
+            photo_sizes (list[PhotoSize]): Renditions of the photo sent by Telegram.
+            min_side (int): Required length of the longer side in pixels.
+
+        Returns:
+            PhotoSize: The selected rendition, or the largest one if none is big enough.
+
+        """
+        ordered = sorted(photo_sizes, key=lambda size: size.width * size.height)
+
+        return next(
+            (size for size in ordered if max(size.width, size.height) >= min_side),
+            ordered[-1],
+        )
+
+    @staticmethod
+    def select_larger_photo_size(
+        photo_sizes: list[PhotoSize],
+        current: PhotoSize,
+        detections: Detections,
+        min_leaf_side: int,
+    ) -> Optional[PhotoSize]:
+        """Pick a higher resolution rendition when detected leaves are too small.
+
+        Args:
+            photo_sizes (list[PhotoSize]): Renditions of the photo sent by Telegram.
+            current (PhotoSize): The rendition the detections were made on.
+            detections (Detections): Leaves detected on the current rendition.
+            min_leaf_side (int): Shorter side a leaf needs for classification.
+
+        Returns:
+            Optional[PhotoSize]: A larger rendition, or None if the current one is
+            good enough or already the largest.
+
+        """
+        if not len(detections):
+            return None
+
+        sides = np.minimum(
+            detections.boxes[:, 2] - detections.boxes[:, 0],
+            detections.boxes[:, 3] - detections.boxes[:, 1],
+        )
+        leaf_side = float(np.median(sides))
+        if leaf_side >= min_leaf_side:
+            return None
+
+        scale = min_leaf_side / max(leaf_side, 1.0)
+        current_side = max(current.width, current.height)
+
+        larger = PhotoProcessor.select_photo_size(
+            photo_sizes, min_side=math.ceil(current_side * scale),
+        )
+        if larger.width * larger.height <= current.width * current.height:
+            return None
+
+        return larger
@@ -0,0 +1,91 @@
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from bot.logger import logger
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+
+# Written by mlcore/tools/quantize.py next to the weights it evaluated.
+QUANTIZATION_MANIFEST = "quantization.json"
+# Checkpoint key of the INT8 weights, next to the fused FP32 network in "model".
+INT8_STATE = "int8_state_dict"
+
+
+def resolve_variant(model_path: str, precision: str) -> str:
+    """Return the weights to load for the requested precision.
+
+    Args:
+        model_path (str): Path to the FP32 weights.
+        precision (str): "fp32", or a precision produced by the quantization tool.
+
+    Returns:
+        str: The quantized variant if it passed the accuracy gate, otherwise
+        the FP32 weights.
+
+    """
+    if precision == "fp32":
+        return model_path
+
+    path = Path(model_path)
+    try:
+        manifest = json.loads((path.parent / QUANTIZATION_MANIFEST).read_text(encoding="utf-8"))
+        entry = manifest.get(path.name, {})
+    except (OSError, ValueError):
+        entry = {}
+
+    if entry.get("precision") != precision or not entry.get("accepted"):
+        logger.warning(f"No accepted {precision} variant of {model_path}, using fp32")
+        return model_path
+
+    variant = path.parent / entry["variant"]
+    if not variant.is_file():
+        logger.warning(f"Quantized variant {variant} is missing, using fp32")
+        return model_path
+
+    return str(variant)
+
+
+def load_int8(model: "YOLO") -> None:
+    """Rebuild the INT8 layers of a quantized variant loaded with YOLO().
+
+    ultralytics can't unpickle quantized modules, so the quantization tool
+    stores the fused FP32 network with the INT8 state dict of its quantized
+    copy. The layers are swapped the way mlcore's Int8Layers does it.
+
+    Args:
+        model (YOLO): The loaded model, left as is for FP32 weights.
+
+    """
+    state = (model.ckpt or {}).get(INT8_STATE)
+    if state is None:
+        return
+
+    # Only the detector loading thread pays for importing torch.
+    import torch
+    from torch.ao import quantization
+    from torch.ao.nn import quantized
+    from ultralytics.nn.modules import DFL
+
+    network = model.model
+    for parent in list(network.modules()):
+        # The DFL conv holds fixed bin indices and stays in FP32.
+        if isinstance(parent, DFL):
+            continue
+        for name, conv in list(parent.named_children()):
+            if type(conv) is not torch.nn.Conv2d:
+                continue
+            setattr(parent, name, torch.nn.Sequential(
+                quantized.Quantize(1.0, 0, torch.quint8),
+                quantized.Conv2d(
+                    conv.in_channels, conv.out_channels, conv.kernel_size,
+                    stride=conv.stride, padding=conv.padding, dilation=conv.dilation,
+                    groups=conv.groups, bias=conv.bias is not None,
+                ),
+                quantized.DeQuantize(),
+            ))
+    quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    # Scales, zero points and packed weights all come from the state dict.
+    network.load_state_dict(state)
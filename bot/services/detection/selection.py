@@ -0,0 +1,74 @@
+import numpy as np
+
+from bot.services.detection.batcher import Detections
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, 2] - boxes[:, 0]).clip(0) * (boxes[:, 3] - boxes[:, 1]).clip(0)
+
+
+def overlaps(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """Overlap of a box with each of the boxes, relative to the smaller one.
+
+    Unlike IoU this also catches a small box lying inside a bigger one, e.g. a
+    leaf detected both on its own and as part of a cluster.
+    """
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+
+    intersection = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    smaller = np.minimum(box_areas(box[None])[0], box_areas(boxes))
+
+    return intersection / np.maximum(smaller, 1e-6)
+
+
+def select_leaves(
+    detections: Detections,
+    shape: tuple[int, int],
+    max_leaves: int = 16,
+    overlap_threshold: float = 0.6,
+    min_area_ratio: float = 0.002,
+) -> Detections:
+    """Keep at most `max_leaves` distinct, reasonably sized leaves.
+
+    Boxes smaller than `min_area_ratio` of the image are dropped, the rest are
+    ranked by confidence x area and greedily kept unless they overlap an
+    already kept box by more than `overlap_threshold`. Distinct leaves past
+    `max_leaves` are counted apart from the duplicates and tiny boxes.
+
+    Args:
+        detections (Detections): All boxes returned by the detector.
+        shape (tuple[int, int]): Height and width of the image.
+        max_leaves (int): Maximum number of leaves sent to classification.
+        overlap_threshold (float): Overlap above which a box is a duplicate.
+        min_area_ratio (float): Smallest box area as a fraction of the image.
+
+    Returns:
+        Detections: The kept boxes in rank order, `dropped` holds the number
+        of duplicate or tiny ones and `over_budget` the number of distinct
+        leaves past `max_leaves`.
+
+    """
+    total = len(detections)
+    if not total:
+        return detections
+
+    areas = box_areas(detections.boxes)
+    candidates = np.flatnonzero(areas >= min_area_ratio * shape[0] * shape[1])
+    candidates = candidates[np.argsort(-(detections.scores * areas)[candidates], kind="stable")]
+
+    distinct: list[int] = []
+    for index in candidates:
+        if distinct and overlaps(detections.boxes[index], detections.boxes[distinct]).max() > overlap_threshold:
+            continue
+        distinct.append(int(index))
+
+    kept = distinct[:max_leaves]
+    return Detections(
+        boxes=detections.boxes[kept],
+        scores=detections.scores[kept],
+        dropped=detections.dropped + total - len(distinct),
+        over_budget=detections.over_budget + len(distinct) - len(kept),
+    )
@@ -1 +1,2 @@
+from .disease_index import DiseaseIndex, DiseaseInfo
 from .plant_diagnostics import PlantDiagnostics
@@ -0,0 +1,100 @@
+from typing import Optional
+
+import numpy as np
+
+from bot.protos.predict import predict_pb2
+
+AGGREGATION_POLICIES = ("sum", "mean", "max", "weighted")
+
+
+def reply_to_matrix(reply: predict_pb2.PredictorReply) -> tuple[list[str], np.ndarray]:
+    """Build a leaves x classes probability matrix from the gRPC reply.
+
+    Args:
+        reply (predict_pb2.PredictorReply): Per-leaf class probabilities.
+
+    Returns:
+        tuple: Class names and a float32 matrix of shape (leaves, classes).
+
+    """
+    if not reply.result:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    class_names = [item.class_name for item in reply.result[0].results]
+    columns = {class_name: i for i, class_name in enumerate(class_names)}
+
+    matrix = np.zeros((len(reply.result), len(class_names)), dtype=np.float32)
+
+    for row, image_result in enumerate(reply.result):
+        names = [item.class_name for item in image_result.results]
+        probabilities = [item.probability for item in image_result.results]
+
+        # Every leaf is classified by the same model, so the class order
+        # normally matches and the row can be filled in one assignment.
+        if names == class_names:
+            matrix[row] = probabilities
+            continue
+
+        for class_name, probability in zip(names, probabilities):
+            if class_name not in columns:
+                columns[class_name] = len(class_names)
+                class_names.append(class_name)
+                matrix = np.pad(matrix, ((0, 0), (0, 1)))
+            matrix[row, columns[class_name]] += probability
+
+    return class_names, matrix
+
+
+def aggregate(
+    matrix: np.ndarray,
+    policy: str = "sum",
+    weights: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Combine per-leaf probabilities into one normalized class distribution.
+
+    Args:
+        matrix (np.ndarray): Probabilities of shape (leaves, classes).
+        policy (str): One of "sum", "mean", "max" or "weighted". "weighted"
+            weighs each leaf by `weights`, e.g. the detector confidence.
+        weights (Optional[np.ndarray]): Per-leaf weights of shape (leaves,).
+
+    Returns:
+        np.ndarray: Class probabilities of shape (classes,) summing to 1.
+
+    Raises:
+        ValueError: If the policy is unknown.
+
+    """
+    if policy not in AGGREGATION_POLICIES:
+        error_msg = f"Unknown aggregation policy: {policy}"
+        raise ValueError(error_msg)
+
+    if matrix.size == 0:
+        return np.zeros(matrix.shape[1], dtype=np.float32)
+
+    if policy == "sum":
+        vector = matrix.sum(axis=0)
+    elif policy == "mean":
+        vector = matrix.mean(axis=0)
+    elif policy == "max":
+        vector = matrix.max(axis=0)
+    else:
+        if weights is None:
+            weights = np.ones(matrix.shape[0], dtype=np.float32)
+        vector = np.asarray(weights, dtype=np.float32) @ matrix
+
+    total = vector.sum()
+    if total > 0:
+        vector = vector / total
+
+    return vector.astype(np.float32, copy=False)
+
+
+def top_k(vector: np.ndarray, k: int) -> np.ndarray:
+    """Return indices of the `k` largest values, in descending order."""
+    k = min(k, len(vector))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    indices = np.argpartition(vector, -k)[-k:]
+    return indices[np.argsort(vector[indices])[::-1]]
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from bot.logger import RATE_LIMITED, logger
+from bot.settings import settings
+
+DISEASES_DB_PATH = Path(__file__).parent.parent.parent / "data" / "diseases_db.json"
+
+
+@dataclass(frozen=True)
+class DiseaseInfo:
+    class_name: str
+    description: str
+    photo_url: str = ""
+    reference_url: str = ""
+    # Pre-rendered "photo / reference" part of the report message.
+    details: str = ""
+    is_healthy: bool = False
+    known: bool = True
+
+
+class DiseaseIndex:
+    """DiseaseIndex class is a compiled lookup table over `diseases_db.json`.
+
+    The database is compiled once into a per-plant dict keyed by normalized
+    class name and recompiled when the file's modification time changes.
+    """
+
+    _instance: Optional["DiseaseIndex"] = None
+    _lock: Lock = Lock()
+
+    def __init__(self, path: Path = DISEASES_DB_PATH, check_interval: float = 5.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+
+        self._index: dict[str, dict[str, DiseaseInfo]] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._reload_lock = Lock()
+
+        self.load()
+
+    @classmethod
+    def get_instance(cls) -> "DiseaseIndex":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    check_interval=settings.DISEASES_DB_CHECK_INTERVAL,
+                )
+            return cls._instance
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return name.strip().lower()
+
+    @staticmethod
+    def _render_details(photo_url: str, reference_url: str) -> str:
+        lines = []
+        if photo_url:
+            lines.append(f"Фото: {photo_url}")
+        if reference_url:
+            lines.append(f"Подробнее: {reference_url}")
+        return "\n\n".join(lines)
+
+    @classmethod
+    def compile(cls, db: dict) -> dict[str, dict[str, DiseaseInfo]]:
+        """Compile the raw database into per-plant lookup tables."""
+        index = {}
+
+        for plant_type, plant in db.items():
+            diseases = {}
+            for disease in plant.get("diseases", []):
+                class_name = disease["class_name"].strip()
+                photo_url = disease.get("photo_url", "")
+                reference_url = disease.get("reference_url", "")
+
+                diseases[cls.normalize(class_name)] = DiseaseInfo(
+                    class_name=class_name,
+                    description=disease.get("description", "") or class_name,
+                    photo_url=photo_url,
+                    reference_url=reference_url,
+                    details=cls._render_details(photo_url, reference_url),
+                    is_healthy="healthy" in cls.normalize(class_name),
+                )
+
+            index[cls.normalize(plant_type)] = diseases
+
+        return index
+
+    def load(self) -> None:
+        mtime = os.stat(self.path).st_mtime
+
+        with open(self.path, encoding="utf-8") as f:
+            index = self.compile(json.load(f))
+
+        self._index = index
+        self._mtime = mtime
+        logger.info(f"Compiled diseases database for {len(index)} plants")
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+
+        with self._reload_lock:
+            self._checked_at = now
+
+            try:
+                if os.stat(self.path).st_mtime != self._mtime:
+                    logger.info("Diseases database changed, reloading")
+                    self.load()
+            except (OSError, ValueError) as e:
+                # Keep serving the last good index if the file is mid-edit.
+                logger.error(f"Failed to reload diseases database: {e}")
+
+    def get(self, plant_type: str, class_name: str) -> DiseaseInfo:
+        """Look up a class of the given plant.
+
+        Args:
+            plant_type (str): Plant name as used in the database, e.g. "помидор".
+            class_name (str): Class name returned by the classifier.
+
+        Returns:
+            DiseaseInfo: The compiled entry, or a fallback built from the class
+            name when the class is missing from the database.
+
+        """
+        self._reload_if_changed()
+
+        info = self._index.get(self.normalize(plant_type), {}).get(
+            self.normalize(class_name),
+        )
+        if info is not None:
+            return info
+
+        logger.warning("Unknown class %r for plant %r", class_name, plant_type, extra=RATE_LIMITED)
+        readable = " ".join(class_name.replace("_", " ").split())
+        return DiseaseInfo(
+            class_name=class_name,
+            description=readable or "Неизвестное заболевание",
+            is_healthy="healthy" in self.normalize(class_name),
+            known=False,
+        )
@@ -1,13 +1,14 @@
-import json
 from dataclasses import dataclass
-from pathlib import Path
 from threading import Lock
-from typing import Optional
+from typing import ClassVar, Optional
 
-import aiofiles
+import numpy as np
 
 from bot.logger import logger
 from bot.protos.predict import predict_pb2
+from bot.services.diagnostics.aggregation import aggregate, reply_to_matrix, top_k
+from bot.services.diagnostics.disease_index import DiseaseIndex
+from bot.settings import settings
 
 
 @dataclass
@@ -17,12 +18,16 @@ class DiseaseResult:
     description: str = ""
     photo_url: str = ""
     reference_url: str = ""
+    details: str = ""
+    is_healthy: bool = False
 
 
 class PlantDiagnostics:
     _instance: Optional["PlantDiagnostics"] = None
     _lock: Lock = Lock()
-    _db: Optional[dict] = None
+
+    # Number of diseases listed in the report.
+    TOP_DISEASES: ClassVar[int] = 3
 
     def __new__(cls):
         logger.debug("Creating a new instance of PlantDiagnostics")
@@ -32,92 +37,108 @@ class PlantDiagnostics:
                 cls._instance = super().__new__(cls)
         return cls._instance
 
-    async def _load_db(self):
-        if self._db is not None:
-            return self._db
+    @property
+    def index(self) -> DiseaseIndex:
+        return DiseaseIndex.get_instance()
+
+    async def analyze_and_report(
+        self,
+        results: predict_pb2.PredictorReply,
+        plant_type: str,
+        scores: Optional[np.ndarray] = None,
+    ) -> list[str]:
+        """Aggregate per-leaf probabilities and build the report messages.
+
+        Args:
+            results (predict_pb2.PredictorReply): Per-leaf class probabilities.
+            plant_type (str): Plant name as used in the diseases database.
+            scores (Optional[np.ndarray]): Detector confidence of every leaf,
+                used by the "weighted" aggregation policy.
 
-        db_path = Path(__file__).parent.parent.parent / "data" / "diseases_db.json"
-        async with aiofiles.open(db_path, encoding="utf-8") as f:
-            self._db = json.loads(await f.read())
+        Returns:
+            list[str]: Report messages.
 
-        logger.debug("Loaded diseases database")
-        return self._db
+        """
+        class_names, matrix = reply_to_matrix(results)
 
-    async def analyze_and_report(self, results: predict_pb2.PredictorReply, plant_type: str) -> str:
-        db = await self._load_db()
+        aggregated = await self._aggregate_results(class_names, matrix, scores)
+        processed = await self._process_results(aggregated, plant_type)
 
-        raw_results = []
+        return await self._generate_report(processed)
 
-        raw_results.extend(
-            {
-                "class_name": class_prob.class_name,
-                "probability": class_prob.probability,
-            }
-            for image_result in results.result
-            for class_prob in image_result.results
-        )
+    def is_decisive(
+        self,
+        results: predict_pb2.PredictorReply,
+        scores: Optional[np.ndarray] = None,
+    ) -> bool:
+        """Check whether the leaves classified so far already settle the diagnosis.
+
+        Args:
+            results (predict_pb2.PredictorReply): Per-leaf class probabilities.
+            scores (Optional[np.ndarray]): Detector confidence of these leaves.
+
+        Returns:
+            bool: True once enough leaves were seen and the top class beats the
+            runner-up by at least EARLY_EXIT_MARGIN.
+
+        """
+        if len(results.result) < settings.EARLY_EXIT_MIN_LEAVES:
+            return False
+
+        _, matrix = reply_to_matrix(results)
+        vector = aggregate(matrix, policy=settings.AGGREGATION_POLICY, weights=scores)
+        if len(vector) < 2:
+            return True
 
-        processed = await self._process_results(raw_results, plant_type, db)
-        aggregated = await self._aggregate_results(processed)
+        first, second = vector[top_k(vector, 2)]
+        return first - second >= settings.EARLY_EXIT_MARGIN
 
-        return await self._generate_report(aggregated)
+    async def _aggregate_results(
+        self,
+        class_names: list[str],
+        matrix: np.ndarray,
+        scores: Optional[np.ndarray] = None,
+        policy: Optional[str] = None,
+    ) -> dict[str, float]:
+        vector = aggregate(
+            matrix,
+            policy=policy or settings.AGGREGATION_POLICY,
+            weights=scores,
+        )
+
+        # The report needs the top diseases plus, at most, one healthy class
+        # that can only matter when it is ranked first.
+        return {
+            class_names[i]: float(vector[i])
+            for i in top_k(vector, self.TOP_DISEASES + 1)
+        }
 
     async def _process_results(
         self,
-        results: list[dict],
+        aggregated: dict[str, float],
         plant_type: str,
-        db: dict,
-    ) -> list[DiseaseResult]:
-        plant_diseases = db.get(plant_type, {}).get("diseases", [])
-        processed = []
-
-        for result in results:
-            class_name = result["class_name"]
-            probability = result["probability"]
-
-            info = next(
-                (
-                    disease
-                    for disease in plant_diseases
-                    if disease["class_name"].lower() == class_name.lower()
-                ),
-                None,
-            )
+    ) -> dict[str, DiseaseResult]:
+        # One index lookup per class, independent of the number of leaves.
+        processed = {}
+
+        for class_name, probability in aggregated.items():
+            info = self.index.get(plant_type, class_name)
 
-            processed.append(DiseaseResult(
+            processed[class_name] = DiseaseResult(
                 class_name=class_name,
                 probability=probability,
-                description=info.get("description", ""),
-                photo_url=info.get("photo_url", ""),
-                reference_url=info.get("reference_url", ""),
-            ))
+                description=info.description,
+                photo_url=info.photo_url,
+                reference_url=info.reference_url,
+                details=info.details,
+                is_healthy=info.is_healthy,
+            )
 
         return processed
 
-    async def _aggregate_results(self, results: list[DiseaseResult]) -> dict[str, DiseaseResult]:
-        aggregated = {}
-
-        for result in results:
-            class_name = result.class_name
-            if class_name not in aggregated:
-                aggregated[class_name] = result
-            else:
-                aggregated[class_name].probability += result.probability
-
-        total = sum(r.probability for r in aggregated.values())
-        if total > 0:
-            for result in aggregated.values():
-                result.probability /= total
-
-        return aggregated
-
     async def _generate_report(self, aggregated: dict[str, DiseaseResult]) -> list[str]:
         healthy_result = next(
-            (
-                result
-                for class_name, result in aggregated.items()
-                if "healthy" in class_name.lower()
-            ),
+            (result for result in aggregated.values() if result.is_healthy),
             None,
         )
 
@@ -142,16 +163,14 @@ class PlantDiagnostics:
         messages = ["\n".join(report_lines)]
 
         top_diseases = [
-            d for d in sorted_results if "healthy" not in d.class_name.lower()
-        ][:min(3, len(sorted_results))]
+            d for d in sorted_results if not d.is_healthy
+        ][:min(self.TOP_DISEASES, len(sorted_results))]
 
         for disease in top_diseases:
             emoji = "🟡" if disease.probability < 0.5 else "🔴"
-            disease_message = (
-                f"{emoji} {disease.description} - вероятность {disease.probability:.1%}\n\n"
-                f"Фото: {disease.photo_url}\n\n"
-                f"Подробнее: {disease.reference_url}"
-            )
+            disease_message = f"{emoji} {disease.description} - вероятность {disease.probability:.1%}"
+            if disease.details:
+                disease_message += f"\n\n{disease.details}"
             messages.append(disease_message)
 
         return messages
@@ -6,6 +6,8 @@ from grpc import aio
 
 from bot.logger import logger
 from bot.protos.predict import predict_pb2, predict_pb2_grpc
+from bot.services.grpc.shm import SharedMemoryRing
+from bot.tracing import tracer
 
 
 class PredictClient:
@@ -19,14 +21,34 @@ class PredictClient:
     _lock = asyncio.Lock()
 
     def __init__(
-        self, host: str, port: str, channel: Optional[aio.Channel] = None,
+        self,
+        host: str,
+        port: str,
+        channel: Optional[aio.Channel] = None,
+        shm_ring: Optional[SharedMemoryRing] = None,
+        shm_min_bytes: int = 0,
     ) -> None:
         self.host = host
         self.port = port
-        self.channel = channel or aio.insecure_channel(f"{self.host}:{self.port}")
+        self.channel = channel or aio.insecure_channel(self.target)
         self.stub = predict_pb2_grpc.PredictorStub(self.channel)
         self._connect_timeout = 10.0
 
+        # Only a server on the same host can read the shared memory ring.
+        self.shm_ring = shm_ring if self.is_local else None
+        self.shm_min_bytes = shm_min_bytes
+
+    @property
+    def target(self) -> str:
+        # "unix:/path/to.sock" addresses carry no port.
+        if self.is_local:
+            return self.host
+        return f"{self.host}:{self.port}"
+
+    @property
+    def is_local(self) -> bool:
+        return self.host.startswith("unix:")
+
     @classmethod
     async def get_instance(cls, host: str, port: str) -> "PredictClient":
         async with cls._lock:
@@ -40,7 +62,7 @@ class PredictClient:
             return
 
         try:
-            self.channel = aio.insecure_channel(f"{self.host}:{self.port}")
+            self.channel = aio.insecure_channel(self.target)
             self.stub = predict_pb2_grpc.PredictorStub(self.channel)
 
             # Wait for the connection to be established.
@@ -49,9 +71,9 @@ class PredictClient:
                 self.channel.channel_ready(),
                 timeout=self._connect_timeout,
             )
-            logger.info(f"Connected to gRPC server at {self.host}:{self.port}")
+            logger.info(f"Connected to gRPC server at {self.target}")
         except asyncio.TimeoutError:
-            raise ConnectionError(f"Connection timeout to {self.host}:{self.port}")
+            raise ConnectionError(f"Connection timeout to {self.target}")
         except Exception as e:
             logger.error(f"Connection error: {e!s}", exc_info=True)
             raise ConnectionError(f"Failed to connect: {e}")
@@ -92,16 +114,29 @@ class PredictClient:
         if not self.connected:
             await self.connect()
 
-        try:
-            request = predict_pb2.PredictorRequest(
-                image_data=images_data,
-                plant=plant_type,
-            )
+        request = predict_pb2.PredictorRequest(plant=plant_type)
 
-            return await asyncio.wait_for(
-                self.stub.Predict(request),
-                timeout=self._connect_timeout,
-            )
+        allocation = None
+        if self.shm_ring and sum(len(data) for data in images_data) >= self.shm_min_bytes:
+            allocation = self.shm_ring.write(request, images_data)
+        if allocation is None:
+            request.image_data.extend(images_data)
+
+        try:
+            with tracer.span(
+                "grpc.predict",
+                target=self.target,
+                images=len(images_data),
+                shared_memory=allocation is not None,
+            ):
+                # The trace continues in mlcore under this span, the deadline
+                # bounds how long mlcore keeps the call waiting for memory.
+                return await asyncio.wait_for(
+                    self.stub.Predict(
+                        request, metadata=tracer.inject(), timeout=self._connect_timeout,
+                    ),
+                    timeout=self._connect_timeout,
+                )
         except grpc.RpcError as e:
             error_mapping = {
                 grpc.StatusCode.INVALID_ARGUMENT: "Invalid argument",
@@ -111,9 +146,14 @@ class PredictClient:
             }
 
             error_type = error_mapping.get(e.code(), "Unknown error")
-            logger.error(f"{error_type}: {e.details()}")
+            logger.error("%s: %s", error_type, e.details())
 
             raise ConnectionError(f"gRPC error: {error_type}") from e
+        finally:
+            # mlcore may still be reading a cancelled call's images, it
+            # notices the cleared generation and drops the request.
+            if allocation is not None:
+                self.shm_ring.release(allocation)
 
     async def __aenter__(self):
         await self.connect()
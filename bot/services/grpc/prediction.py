@@ -1,14 +1,43 @@
-from typing import Any
+import asyncio
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, NoReturn, Optional
 
 import grpc
 
 from bot.logger import logger
 from bot.protos.predict import predict_pb2
 from bot.services.grpc.predict_client import PredictClient
+from bot.services.grpc.sharding import ShardRouter
+from bot.services.grpc.shm import SharedMemoryRing
 from bot.services.mapping.plant_mapper import ModelMapper
 from bot.settings import settings
 
 
+def _raise_error(
+    exception: Optional[Exception],
+    message: str,
+    error_type: type[Exception],
+) -> NoReturn:
+    logger.error(f"{message}. Original exception: {exception}")
+    raise error_type(message) from exception
+
+
+@contextmanager
+def _prediction_errors() -> Iterator[None]:
+    """Log a failed prediction and re-raise it as the type callers expect."""
+    try:
+        yield
+    except ValueError as e:
+        _raise_error(e, f"Invalid plant type: {e}", ValueError)
+    except ConnectionError as e:
+        _raise_error(e, f"Connection error: {e}", ConnectionError)
+    except grpc.RpcError as e:
+        _raise_error(e, f"gRPC error: {e.code()} - {e.details()}", grpc.RpcError)
+    except Exception as e:
+        _raise_error(e, f"Error during prediction: {e}", RuntimeError)
+
+
 class PredictionService:
     """PredictionService class is responsible for handling predictions.
 
@@ -16,6 +45,55 @@ class PredictionService:
     based on the detected objects in the images.
     """
 
+    _router: Optional[ShardRouter] = None
+
+    @classmethod
+    def get_router(cls) -> ShardRouter:
+        if cls._router is None:
+            cls._router = ShardRouter.from_settings()
+        return cls._router
+
+    @staticmethod
+    def _get_shm_ring() -> Optional[SharedMemoryRing]:
+        if settings.SHM_RING_SIZE <= 0 or not settings.GRPC_UNIX_SOCKET:
+            return None
+        return SharedMemoryRing.get_instance(settings.SHM_RING_SIZE)
+
+    @classmethod
+    async def _connect(cls, plant_type: predict_pb2.Plant) -> PredictClient:
+        """Connect to the first reachable mlcore node serving the plant type.
+
+        Nodes that fail are remembered by the router and tried last by the
+        following requests until their back-off runs out.
+
+        Raises:
+            ConnectionError: If none of the nodes is reachable.
+
+        """
+        router = cls.get_router()
+        targets = router.targets(plant_type)
+
+        for address in targets:
+            host, port = ShardRouter.split_address(address)
+            client = PredictClient(
+                host=host,
+                port=port,
+                shm_ring=cls._get_shm_ring(),
+                shm_min_bytes=settings.SHM_MIN_BYTES,
+            )
+            try:
+                await client.connect()
+            except ConnectionError as e:
+                logger.warning("mlcore node %s is unavailable: %s", address, e)
+                router.mark_down(address)
+                await client.close()
+            else:
+                router.mark_up(address)
+                return client
+
+        error_msg = f"No mlcore node available for plant type {plant_type}"
+        raise ConnectionError(error_msg)
+
     @staticmethod
     async def predict(
         data: dict[str, Any],
@@ -35,21 +113,10 @@ class PredictionService:
             RuntimeError: If there is an error during prediction.
 
         """
-        def _raise_error(
-            exception: Exception,
-            message: str,
-            error_type: type[Exception],
-        ) -> None:
-            logger.error(f"{message}. Original exception: {exception}")
-            raise error_type(message) from exception
-
-        try:
+        with _prediction_errors():
             plant_type = ModelMapper.get_plant_type(data["predict"])
 
-            async with PredictClient(
-                host=settings.GRPC_HOST_LOCAL,
-                port=settings.GRPC_PORT,
-            ) as client:
+            async with await PredictionService._connect(plant_type) as client:
                 result = await client.predict(
                     images_data=detection_boxes,
                     plant_type=plant_type,
@@ -64,11 +131,81 @@ class PredictionService:
                     )
 
                 return result
-        except ValueError as e:
-            _raise_error(e, f"Invalid plant type: {e}", ValueError)
-        except ConnectionError as e:
-            _raise_error(e, f"Connection error: {e}", ConnectionError)
-        except grpc.RpcError as e:
-            _raise_error(e, f"gRPC error: {e.code()} - {e.details()}",grpc.RpcError)
-        except Exception as e:
-            _raise_error(e, f"Error during prediction: {e}", RuntimeError)
+
+    @staticmethod
+    async def predict_progressive(
+        data: dict[str, Any],
+        detection_boxes: list[bytes],
+        should_stop: Callable[[predict_pb2.PredictorReply], bool],
+        chunk_size: int,
+    ) -> predict_pb2.PredictorReply:
+        """Classify the detected objects chunk by chunk until the result is clear.
+
+        The next chunk is already in flight while the previous reply is
+        checked, once `should_stop` accepts the merged reply it is cancelled and
+        the remaining chunks are never sent.
+
+        Args:
+            data (dict[str, Any]): Data containing the plant type.
+            detection_boxes (list[bytes]): Detected objects in bytes, most
+                confident first.
+            should_stop (Callable[[predict_pb2.PredictorReply], bool]): Decides
+                from the results so far whether more leaves are needed.
+            chunk_size (int): Number of objects sent per request.
+
+        Returns:
+            predict_pb2.PredictorReply: Results of the classified objects, in
+            the order of `detection_boxes`.
+
+        Raises:
+            ValueError: If the plant type is invalid.
+            RuntimeError: If there is an error during prediction.
+
+        """
+        chunks = [
+            detection_boxes[i:i + chunk_size]
+            for i in range(0, len(detection_boxes), chunk_size)
+        ]
+        merged = predict_pb2.PredictorReply()
+
+        with _prediction_errors():
+            plant_type = ModelMapper.get_plant_type(data["predict"])
+
+            async with await PredictionService._connect(plant_type) as client:
+                pending = [asyncio.create_task(
+                    client.predict(images_data=chunks[0], plant_type=plant_type),
+                )]
+
+                try:
+                    for i in range(len(chunks)):
+                        # Send the next chunk before waiting for this one.
+                        if i + 1 < len(chunks):
+                            pending.append(asyncio.create_task(client.predict(
+                                images_data=chunks[i + 1], plant_type=plant_type,
+                            )))
+
+                        result = await pending.pop(0)
+
+                        if not result:
+                            logger.warning("Empty response from gRPC server")
+                            _raise_error(
+                                None,
+                                "Empty response from gRPC server",
+                                RuntimeError,
+                            )
+                        merged.result.extend(result.result)
+
+                        if pending and should_stop(merged):
+                            logger.info(
+                                "Early exit after %d of %d objects",
+                                len(merged.result), len(detection_boxes),
+                            )
+                            break
+                finally:
+                    # Cancelling the call also stops the work on the mlcore side.
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+                return merged
+
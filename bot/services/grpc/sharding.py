@@ -0,0 +1,121 @@
+import bisect
+import hashlib
+import time
+
+from bot.protos.predict import predict_pb2
+from bot.settings import settings
+
+
+class HashRing:
+    """HashRing class assigns plant types to mlcore nodes by consistent hashing.
+
+    Every node is placed on the ring several times (virtual nodes), a key is
+    owned by the first `replication` distinct nodes found clockwise from its
+    hash. Adding or removing a node only moves the keys next to it.
+
+    mlcore keeps an identical copy of this class to decide which models each
+    node preloads, so both sides must be configured with the same node list.
+    """
+
+    def __init__(self, nodes: list[str], replication: int = 2, vnodes: int = 64) -> None:
+        self.nodes = list(dict.fromkeys(nodes))
+        self.replication = max(1, min(replication, len(self.nodes)))
+
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Python's hash() is salted per process, the ring must be stable.
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def owners(self, key: str) -> list[str]:
+        """Return the nodes responsible for the key, preferred node first."""
+        if not self._ring:
+            return []
+
+        owners = []
+        start = bisect.bisect(self._hashes, self._hash(key))
+
+        for i in range(len(self._ring)):
+            node = self._ring[(start + i) % len(self._ring)][1]
+            if node not in owners:
+                owners.append(node)
+                if len(owners) == self.replication:
+                    break
+
+        return owners
+
+
+class ShardRouter:
+    """ShardRouter class picks the mlcore nodes to call for a plant type.
+
+    A co-located node on a unix socket is tried first when its ring id
+    `local_node` owns the plant type, or when there is no ring at all, and
+    takes the place of its TCP address. The owners of the plant type follow
+    in ring order, so a replica takes over when the preferred node is down.
+    The load-balanced GRPC_HOST_LOCAL address is always the last resort.
+    Nodes that failed to connect are moved behind the others for
+    `retry_after` seconds, so requests do not keep waiting for the connect
+    timeout of a node that is down.
+    """
+
+    def __init__(
+        self,
+        nodes: list[str],
+        replication: int,
+        fallback: str,
+        local: str = "",
+        local_node: str = "",
+        retry_after: float = 30.0,
+    ) -> None:
+        self.ring = HashRing(nodes, replication=replication)
+        self.fallback = fallback
+        self.local = local
+        self.local_node = local_node
+        self.retry_after = retry_after
+
+        # Address -> monotonic time until which the node is tried last.
+        self._down: dict[str, float] = {}
+
+    @classmethod
+    def from_settings(cls) -> "ShardRouter":
+        nodes = [node.strip() for node in settings.GRPC_NODES.split(",") if node.strip()]
+        return cls(
+            nodes,
+            replication=settings.SHARD_REPLICATION,
+            fallback=f"{settings.GRPC_HOST_LOCAL}:{settings.GRPC_PORT}",
+            local=settings.GRPC_UNIX_SOCKET,
+            local_node=settings.GRPC_UNIX_SOCKET_NODE,
+            retry_after=settings.NODE_RETRY_AFTER,
+        )
+
+    @staticmethod
+    def split_address(address: str) -> tuple[str, str]:
+        if address.startswith("unix:"):
+            return address, ""
+        host, _, port = address.rpartition(":")
+        return host, port
+
+    def mark_down(self, address: str) -> None:
+        self._down[address] = time.monotonic() + self.retry_after
+
+    def mark_up(self, address: str) -> None:
+        self._down.pop(address, None)
+
+    def targets(self, plant_type: predict_pb2.Plant) -> list[str]:
+        """Return node addresses to try for the plant type, in order."""
+        targets = self.ring.owners(predict_pb2.Plant.Name(plant_type))
+        # A node that does not own the plant type would load its model lazily.
+        if self.local and (not self.ring.nodes or self.local_node in targets):
+            targets = [self.local, *(n for n in targets if n != self.local_node)]
+        if self.fallback not in targets:
+            targets.append(self.fallback)
+
+        # Recently failed nodes keep their order but go after the healthy ones.
+        now = time.monotonic()
+        return sorted(targets, key=lambda address: self._down.get(address, 0.0) > now)
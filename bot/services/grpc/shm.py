@@ -0,0 +1,134 @@
+import os
+import uuid
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from threading import Lock
+from typing import Optional
+
+from bot.logger import logger
+from bot.protos.predict import predict_pb2
+
+# mlcore only attaches to segments whose name starts with this prefix.
+SHM_PREFIX = "leafcare-"
+
+# Every allocation starts with its generation, written before the images.
+GENERATION_BYTES = 8
+
+
+@dataclass(frozen=True)
+class Allocation:
+    start: int
+    end: int
+    generation: int = 0
+
+
+class SharedMemoryRing:
+    """SharedMemoryRing class is a shared-memory segment for outgoing crops.
+
+    A co-located mlcore reads the crops straight from the segment, so the
+    request only carries offsets and lengths. Space is handed out from a
+    moving head that wraps around, a request that does not fit next to the
+    allocations still in flight falls back to sending the bytes inline.
+
+    A call can be given up while mlcore still reads its images, so each
+    allocation is stamped with a generation that is cleared on release.
+    mlcore checks the stamp after decoding and rejects the request if the
+    space was released and possibly reused in the meantime.
+    """
+
+    _instance: Optional["SharedMemoryRing"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, size: int, name: Optional[str] = None) -> None:
+        self.name = name or f"{SHM_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.size = size
+
+        self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        self._head = 0
+        self._generation = 0
+        self._live: set[Allocation] = set()
+        self._lock = Lock()
+
+        logger.info(f"Created shared memory ring {self.name} of {size} bytes")
+
+    @classmethod
+    def get_instance(cls, size: int) -> "SharedMemoryRing":
+        # One segment per bot process, webhook workers each get their own.
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(size)
+            return cls._instance
+
+    @classmethod
+    def close_instance(cls) -> None:
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.close()
+                cls._instance = None
+
+    def _fits(self, start: int, end: int) -> bool:
+        return end <= self.size and all(
+            end <= allocation.start or start >= allocation.end
+            for allocation in self._live
+        )
+
+    def allocate(self, length: int) -> Optional[Allocation]:
+        """Reserve `length` contiguous bytes, or return None if they are busy."""
+        with self._lock:
+            for start in (self._head, 0):
+                if self._fits(start, start + length):
+                    self._generation += 1
+                    allocation = Allocation(start, start + length, self._generation)
+                    self._live.add(allocation)
+                    self._head = allocation.end
+                    return allocation
+        return None
+
+    def release(self, allocation: Allocation) -> None:
+        with self._lock:
+            if allocation in self._live:
+                # Cleared before the space can be handed out again.
+                header = slice(allocation.start, allocation.start + GENERATION_BYTES)
+                self._shm.buf[header] = bytes(GENERATION_BYTES)
+                self._live.discard(allocation)
+
+    def write(
+        self,
+        request: predict_pb2.PredictorRequest,
+        images_data: list[bytes],
+    ) -> Optional[Allocation]:
+        """Put the images into the segment and reference them from the request.
+
+        Returns:
+            Optional[Allocation]: The space to release once the reply arrived,
+            or None if the images did not fit and must be sent inline.
+
+        """
+        length = GENERATION_BYTES + sum(len(data) for data in images_data)
+        allocation = self.allocate(length)
+        if allocation is None:
+            logger.debug("Shared memory ring is full, sending images inline")
+            return None
+
+        header = slice(allocation.start, allocation.start + GENERATION_BYTES)
+        self._shm.buf[header] = allocation.generation.to_bytes(GENERATION_BYTES, "little")
+
+        offset = allocation.start + GENERATION_BYTES
+        for data in images_data:
+            self._shm.buf[offset:offset + len(data)] = data
+            request.image_refs.append(
+                predict_pb2.SharedMemoryRef(offset=offset, length=len(data)),
+            )
+            offset += len(data)
+
+        request.shm_name = self.name
+        request.shm_generation = allocation.generation
+        return allocation
+
+    def close(self) -> None:
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info(f"Removed shared memory ring {self.name}")
@@ -0,0 +1,9 @@
+from .pipeline import run_analysis
+from .queue import AnalysisJob, AnalysisQueue, Progress
+
+__all__ = [
+    "AnalysisJob",
+    "AnalysisQueue",
+    "Progress",
+    "run_analysis",
+]
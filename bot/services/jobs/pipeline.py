@@ -0,0 +1,269 @@
+import asyncio
+import time
+
+import grpc
+from aiogram.types import Message
+
+from bot.logger import logger
+from bot.services.cache.result_cache import CachedResult, ResultCache
+from bot.services.detection.handler import DetectHandler
+from bot.services.detection.processor import PhotoProcessor
+from bot.services.diagnostics.plant_diagnostics import PlantDiagnostics
+from bot.services.grpc.prediction import PredictionService
+from bot.services.jobs.queue import AnalysisJob
+from bot.services.mapping.plant_mapper import ModelMapper
+from bot.settings import settings
+from bot.tracing import tracer
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+REPORT_SEPARATOR = "\n\n➖➖➖\n\n"
+
+
+def pack_messages(items: list[str], limit: int = TELEGRAM_MESSAGE_LIMIT) -> list[str]:
+    """Join report items into as few messages as Telegram's length limit allows."""
+    messages = []
+
+    for item in items:
+        if messages and len(messages[-1]) + len(REPORT_SEPARATOR) + len(item) <= limit:
+            messages[-1] += REPORT_SEPARATOR + item
+        else:
+            messages.append(item)
+
+    return messages
+
+
+async def _send_report(message: Message, report: list[str]) -> None:
+    for text in pack_messages(report):
+        await message.answer(text)
+
+
+async def _reply_from_cache(job: AnalysisJob, cached: CachedResult) -> None:
+    await job.progress.update(
+        f"✅ Это фото уже анализировалось. Обнаружено объектов: {len(cached.boxes)}",
+    )
+    await job.message.reply_photo(
+        photo=cached.annotated_file_id,
+        caption="🔍 Обнаруженные объекты",
+    )
+    await _send_report(job.message, cached.report)
+
+    await job.state.clear()
+
+
+async def run_analysis(job: AnalysisJob) -> None:
+    """Analyse a queued photo: download, detect, classify and report.
+
+    Every stage is recorded as a span of one trace per photo.
+
+    Args:
+        job (AnalysisJob): The job taken from the analysis queue.
+
+    """
+    with tracer.span(
+        "analysis",
+        user_id=job.user_id,
+        plant=job.data["predict"].lower(),
+        queue_wait_ms=round((time.monotonic() - job.enqueued_at) * 1000, 1),
+    ):
+        await _run_analysis(job)
+
+
+async def _run_analysis(job: AnalysisJob) -> None:
+    """Run the stages of `run_analysis`.
+
+    Args:
+        job (AnalysisJob): The job taken from the analysis queue.
+
+    """
+    message, state, data = job.message, job.state, job.data
+    photo_size = job.photo_size
+
+    # Renditions of a photo have distinct file_unique_ids, the largest one's
+    # stays the same when that upload is forwarded or sent again.
+    cache = ResultCache.get_instance()
+    plant_type = data["predict"].lower()
+    file_unique_id = message.photo[-1].file_unique_id
+
+    cached = cache.get(plant_type, file_unique_id)
+    if cached is not None:
+        logger.info("Result cache hit for %s", file_unique_id)
+        await _reply_from_cache(job, cached)
+        return
+
+    # The status update and the download run at the same time.
+    status = asyncio.create_task(job.progress.update("🔄 Идет анализ фото..."))
+
+    # Save the photo to a temporary file.
+    try:
+        with tracer.span("telegram.download", size=f"{photo_size.width}x{photo_size.height}"):
+            image_path = await PhotoProcessor.save_photo_to_tempfile(
+                data=data,
+                message=message,
+            )
+    except Exception as e:
+        logger.error("Error processing photo: %s", e)
+        # Let the status message land first, or it can overwrite the error.
+        await asyncio.gather(status, return_exceptions=True)
+        await job.progress.update("❌ Ошибка при обработке фото.")
+        return
+
+    await asyncio.gather(status, return_exceptions=True)
+
+    # Forwarded or re-encoded copies only match by perceptual hash.
+    photo_hash = await asyncio.to_thread(ResultCache.hash_file, image_path)
+    if photo_hash is not None:
+        cached = cache.find_similar(plant_type, photo_hash)
+        if cached is not None:
+            logger.info("Result cache near-duplicate hit for %s", file_unique_id)
+            cache.put(plant_type, file_unique_id, cached)
+            await _reply_from_cache(job, cached)
+            return
+
+    # Detect objects in the image.
+    try:
+        # Crops are cut at the resolution this plant's classifier expects.
+        crop_size = ModelMapper.get_input_size(
+            ModelMapper.get_plant_type(plant_type), default=settings.CROP_SIZE,
+        )
+        detect_handler = await DetectHandler.get_instance(
+            model_path=settings.DETECT_MODEL_PATH,
+        )
+
+        with tracer.span("detect") as span:
+            detection_boxes, photo, detections = await detect_handler.detect(image_path, crop_size)
+            span.set_attribute("leaves", len(detection_boxes))
+
+        # Fetch a larger rendition only when the leaves are too small to classify.
+        larger_size = PhotoProcessor.select_larger_photo_size(
+            message.photo,
+            current=photo_size,
+            detections=detections,
+            min_leaf_side=settings.CLASSIFIER_MIN_SIDE,
+        )
+        if larger_size is not None:
+            logger.info(
+                "Leaves too small on %dx%d, retrying on %dx%d",
+                photo_size.width, photo_size.height, larger_size.width, larger_size.height,
+            )
+            await state.update_data(predict_get_photo=larger_size.file_id)
+            data = await state.get_data()
+
+            with tracer.span("telegram.download", size=f"{larger_size.width}x{larger_size.height}"):
+                image_path = await PhotoProcessor.save_photo_to_tempfile(
+                    data=data,
+                    message=message,
+                )
+            with tracer.span("detect") as span:
+                detection_boxes, photo, detections = await detect_handler.detect(
+                    image_path, crop_size,
+                )
+                span.set_attribute("leaves", len(detection_boxes))
+
+        detection_count = len(detection_boxes)
+
+        if detection_count:
+            logger.info("Detected %d objects.", detection_count)
+            detected_text = f"Обнаружено объектов: {detection_count}"
+            if detections.dropped:
+                detected_text += f" (отброшено повторяющихся или мелких: {detections.dropped})"
+            if detections.over_budget:
+                detected_text += (
+                    f" (сверх лимита в {settings.MAX_LEAVES} листьев: {detections.over_budget})"
+                )
+        else:
+            logger.info("No objects detected.")
+            await job.progress.update("Объекты не обнаружены. Попробуйте другое фото.")
+            return
+
+        await state.clear()
+
+    except Exception as e:
+        logger.error("Error during detection: %s", e)
+        await job.progress.update("❌ Ошибка при обнаружении объектов.")
+        await state.clear()
+        return
+
+    # Upload the annotated photo and update the status while mlcore classifies.
+    telegram_io = asyncio.gather(
+        message.reply_photo(
+            photo=photo,
+            caption="🔍 Обнаруженные объекты",
+        ),
+        job.progress.update(
+            f"{detected_text}\n🔄 Идет классификация...",
+        ),
+        return_exceptions=True,
+    )
+
+    # Make predictions based on the detected objects.
+    try:
+        plant_diagnostics = PlantDiagnostics()
+
+        # Leaves come ranked by the detector, so the first chunks carry the
+        # clearest evidence and the tail is often not needed at all.
+        with tracer.span("classify", leaves=len(detection_boxes)) as span:
+            if settings.EARLY_EXIT_ENABLED and len(detection_boxes) > settings.EARLY_EXIT_CHUNK_SIZE:
+                predict_result = await PredictionService.predict_progressive(
+                    data=data,
+                    detection_boxes=detection_boxes,
+                    should_stop=lambda reply: plant_diagnostics.is_decisive(
+                        reply, detections.scores[:len(reply.result)],
+                    ),
+                    chunk_size=settings.EARLY_EXIT_CHUNK_SIZE,
+                )
+            else:
+                predict_result = await PredictionService.predict(
+                    data=data,
+                    detection_boxes=detection_boxes,
+                )
+            span.set_attribute("classified", len(predict_result.result))
+
+        with tracer.span("report"):
+            report = await plant_diagnostics.analyze_and_report(
+                results=predict_result,
+                plant_type=plant_type,
+                scores=detections.scores[:len(predict_result.result)],
+            )
+
+        # The report goes out after the annotated photo.
+        with tracer.span("telegram.upload_wait"):
+            annotated, _ = await telegram_io
+        if isinstance(annotated, Exception):
+            logger.error("Failed to send annotated photo: %s", annotated)
+            annotated = None
+
+        if not report:
+            await job.progress.update("❌ Что-то пошло не так. Отчет пуст, повторите попытку позже.")
+        else:
+            with tracer.span("telegram.send_report"):
+                await asyncio.gather(
+                    job.progress.update(
+                        f"✅ Анализ завершен. {detected_text}",
+                    ),
+                    _send_report(message, report),
+                )
+
+            if annotated is not None:
+                cache.put(plant_type, file_unique_id, CachedResult(
+                    boxes=detections.boxes,
+                    annotated_file_id=annotated.photo[-1].file_id,
+                    report=report,
+                    photo_hash=photo_hash,
+                ))
+
+    except ConnectionError as e:
+        await telegram_io
+        await job.progress.update("❌ Не удалось подключиться к серверу. Попробуйте позже.")
+        logger.error("Connection error: %s", e)
+        await state.clear()
+    except grpc.RpcError as e:
+        await telegram_io
+        error_message = f"❌ Ошибка сервера: {e.details()}"
+        await job.progress.update(error_message)
+        logger.error("gRPC error: %s", e)
+        await state.clear()
+    except Exception as e:
+        await telegram_io
+        await job.progress.update("❌ Произошла непредвиденная ошибка. Попробуйте еще раз.")
+        logger.error("Unexpected error: %s", e)
+        await state.clear()
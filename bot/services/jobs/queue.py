@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, PhotoSize
+
+from bot.logger import logger
+
+
+class Progress:
+    """Progress class keeps the user informed through a single status message.
+
+    The first update sends the message, every following one edits it.
+    """
+
+    def __init__(self, message: Message) -> None:
+        self._message = message
+        self._status: Optional[Message] = None
+        self._lock = asyncio.Lock()
+
+    async def update(self, text: str) -> None:
+        async with self._lock:
+            if self._status is None:
+                self._status = await self._message.answer(text)
+                return
+
+            try:
+                self._status = await self._status.edit_text(text)
+            except TelegramBadRequest as e:
+                # Editing to the same text is rejected, nothing to do then.
+                logger.debug(f"Progress message not updated: {e}")
+
+
+@dataclass(order=True)
+class AnalysisJob:
+    priority: int
+    sequence: int
+    message: Message = field(compare=False)
+    state: FSMContext = field(compare=False)
+    data: dict[str, Any] = field(compare=False)
+    photo_size: PhotoSize = field(compare=False)
+    progress: Progress = field(compare=False)
+    enqueued_at: float = field(default_factory=time.monotonic, compare=False)
+
+    def __hash__(self) -> int:
+        return self.sequence
+
+    @property
+    def user_id(self) -> int:
+        return self.message.chat.id
+
+
+class AnalysisQueue:
+    """AnalysisQueue class runs photo analysis jobs in a pool of workers.
+
+    The queue is bounded, so overload is reported to the user right away
+    instead of piling up timeouts. Jobs of users that already have photos
+    waiting get a lower priority, so one user cannot starve the others.
+    """
+
+    _instance: Optional["AnalysisQueue"] = None
+
+    def __init__(
+        self,
+        handler: Callable[[AnalysisJob], Awaitable[None]],
+        workers: int = 4,
+        max_size: int = 100,
+    ) -> None:
+        self._handler = handler
+        self.workers = workers
+        self.max_size = max_size
+
+        self._queue: asyncio.PriorityQueue[AnalysisJob] = asyncio.PriorityQueue(max_size)
+        self._waiting: set[AnalysisJob] = set()
+        self._per_user: Counter[int] = Counter()
+        self._sequence = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    @classmethod
+    def get_instance(cls) -> "AnalysisQueue":
+        if cls._instance is None:
+            error_msg = "AnalysisQueue is not started"
+            raise RuntimeError(error_msg)
+        return cls._instance
+
+    @classmethod
+    def start(
+        cls,
+        handler: Callable[[AnalysisJob], Awaitable[None]],
+        workers: int,
+        max_size: int,
+    ) -> "AnalysisQueue":
+        """Create the shared queue and start its workers."""
+        queue = cls(handler, workers=workers, max_size=max_size)
+        queue._tasks = [
+            asyncio.create_task(queue._work(i)) for i in range(workers)
+        ]
+        cls._instance = queue
+
+        logger.info(f"Analysis queue started with {workers} workers")
+        return queue
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self,
+        message: Message,
+        state: FSMContext,
+        data: dict[str, Any],
+        photo_size: PhotoSize,
+    ) -> AnalysisJob:
+        """Queue a photo for analysis.
+
+        Args:
+            message (Message): The message with the photo.
+            state (FSMContext): The user's FSM context.
+            data (dict[str, Any]): The FSM data with the plant and photo.
+            photo_size (PhotoSize): The photo rendition to analyse.
+
+        Returns:
+            AnalysisJob: The queued job.
+
+        Raises:
+            asyncio.QueueFull: If the queue is at capacity.
+
+        """
+        user_id = message.chat.id
+
+        job = AnalysisJob(
+            priority=self._per_user[user_id],
+            sequence=next(self._sequence),
+            message=message,
+            state=state,
+            data=data,
+            photo_size=photo_size,
+            progress=Progress(message),
+        )
+
+        self._queue.put_nowait(job)
+        self._waiting.add(job)
+        self._per_user[user_id] += 1
+
+        return job
+
+    def position(self, job: AnalysisJob) -> int:
+        """Return the 1-based position of a waiting job, 0 once it has started."""
+        if job not in self._waiting:
+            return 0
+        return sum(1 for other in self._waiting if other < job) + 1
+
+    @property
+    def size(self) -> int:
+        return len(self._waiting)
+
+    async def _work(self, worker_id: int) -> None:
+        while True:
+            job = await self._queue.get()
+            self._waiting.discard(job)
+
+            logger.info(
+                f"Worker {worker_id} started job {job.sequence} after "
+                f"{time.monotonic() - job.enqueued_at:.2f}s in queue",
+            )
+
+            try:
+                await self._handler(job)
+            except Exception as e:
+                logger.error(f"Unhandled error in analysis job: {e}", exc_info=True)
+            finally:
+                self._per_user[job.user_id] -= 1
+                if self._per_user[job.user_id] <= 0:
+                    del self._per_user[job.user_id]
+                self._queue.task_done()
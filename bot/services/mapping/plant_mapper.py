@@ -18,6 +18,16 @@ class ModelMapper:
         "перец": predict_pb2.PLANT_PEPPER,
     }
 
+    # Input resolution (imgsz) each plant's classifier was trained at.
+    CLASSIFIER_INPUT_SIZE: ClassVar[dict[predict_pb2.Plant, int]] = {
+        predict_pb2.PLANT_TOMATO: 256,
+        predict_pb2.PLANT_CUCUMBER: 320,
+        predict_pb2.PLANT_MELON: 320,
+        predict_pb2.PLANT_WATERMELON: 320,
+        predict_pb2.PLANT_STRAWBERRY: 320,
+        predict_pb2.PLANT_PEPPER: 320,
+    }
+
     @classmethod
     def get_plant_type(cls, plant_name: str) -> predict_pb2.Plant:
         plant_name = plant_name.strip()
@@ -28,3 +38,8 @@ class ModelMapper:
             error_msg = f"Unknown plant name: {plant_name}"
             raise ValueError(error_msg)
         return plant_type
+
+    @classmethod
+    def get_input_size(cls, plant_type: predict_pb2.Plant, default: int) -> int:
+        """Side of the square crops the plant's classifier expects."""
+        return cls.CLASSIFIER_INPUT_SIZE.get(plant_type, default)
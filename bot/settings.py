@@ -8,7 +8,108 @@ class Settings(BaseSettings):
     GRPC_HOST_LOCAL: str = "nginx"
     GRPC_PORT: int = 443
 
+    # mlcore nodes as "host:port,..." for plant type affinity routing, the
+    # same list mlcore gets in MLCORE_NODES. Empty sends everything to
+    # GRPC_HOST_LOCAL, which also stays the fallback when owners are down.
+    GRPC_NODES: str = ""
+    SHARD_REPLICATION: int = 2
+    # Seconds a node that failed to connect is tried after the others.
+    NODE_RETRY_AFTER: float = 30.0
+
+    # Co-located mlcore on "unix:/path/to.sock", tried before the nodes above
+    # for the plant types its GRPC_UNIX_SOCKET_NODE entry of GRPC_NODES owns.
+    # Requests of at least SHM_MIN_BYTES to it pass the crops through a
+    # shared memory ring of SHM_RING_SIZE bytes, 0 disables the ring.
+    GRPC_UNIX_SOCKET: str = ""
+    GRPC_UNIX_SOCKET_NODE: str = ""
+    SHM_RING_SIZE: int = 0
+    SHM_MIN_BYTES: int = 65536
+
     BOT_TOKEN: str = os.getenv("BOT_TOKEN")
+    # Base URL of a local Bot API server, empty uses api.telegram.org.
+    TELEGRAM_API_URL: str = ""
+
+    # Update intake: "polling" or "webhook" served by several workers.
+    BOT_MODE: str = "polling"
+    WEBHOOK_BASE_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str = ""
+    WEBAPP_HOST: str = "0.0.0.0"
+    WEBAPP_PORT: int = 8081
+    WEBHOOK_WORKERS: int = 2
+
+    # FSM storage shared by workers: "memory://" or "redis://host:port/db".
+    FSM_STORAGE_URL: str = "memory://"
+    FSM_STATE_TTL: int = 0
+
+    # Photo analysis jobs: worker pool size and queue capacity.
+    ANALYSIS_WORKERS: int = 4
+    ANALYSIS_QUEUE_SIZE: int = 100
+
+    # Finished analyses reused for resent or forwarded photos.
+    RESULT_CACHE_SIZE: int = 1024
+    RESULT_CACHE_TTL: float = 3600
+    RESULT_CACHE_MAX_DISTANCE: int = 4
+
+    # Leaf detection: input resolution and cross-user micro-batching.
+    DETECT_IMGSZ: int = 640
+    DETECT_BATCH_SIZE: int = 8
+    DETECT_BATCH_WAIT_MS: float = 5.0
+    # "int8" loads the quantized detector if it passed the accuracy gate.
+    DETECT_PRECISION: str = "fp32"
+    # Detector replicas loaded and warmed up at startup, one batch each.
+    DETECT_MODEL_PATH: str = "models/leaf_detect.pt"
+    DETECT_POOL_SIZE: int = 2
+    DETECT_WARMUP: bool = True
+
+    # Photo intake: larger files are refused, larger images are decoded at
+    # 1/2, 1/4 or 1/8 scale, and photos wait while the decoded pixels in
+    # flight are over the budget.
+    MAX_IMAGE_BYTES: int = 20 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 16_000_000
+    DECODE_MEMORY_BUDGET: int = 256 * 1024 * 1024
+
+    # Per-photo leaf budget: at most MAX_LEAVES distinct, non-tiny boxes.
+    MAX_LEAVES: int = 16
+    LEAF_OVERLAP_THRESHOLD: float = 0.6
+    MIN_LEAF_AREA_RATIO: float = 0.002
+
+    # Leaf crops sent to mlcore: encoding, and the input size of classifiers
+    # missing from ModelMapper.CLASSIFIER_INPUT_SIZE.
+    CROP_SIZE: int = 320
+    CROP_PADDING: float = 0.1
+    CROP_FORMAT: str = "jpeg"
+    CROP_QUALITY: int = 90
+    CROP_WORKERS: int = 4
+
+    # Annotated preview sent back to the user, sized for Telegram's display.
+    PREVIEW_MAX_SIDE: int = 1280
+    PREVIEW_QUALITY: int = 80
+
+    # Median leaf side (px) below which a larger photo rendition is fetched.
+    CLASSIFIER_MIN_SIDE: int = 112
+
+    # Seconds between checks of diseases_db.json for changes.
+    DISEASES_DB_CHECK_INTERVAL: float = 5.0
+
+    # How per-leaf probabilities are combined: sum, mean, max or weighted.
+    AGGREGATION_POLICY: str = "sum"
+
+    # Progressive classification: leaves are sent in chunks, most confident
+    # first, and the rest is skipped once the top class leads by the margin.
+    EARLY_EXIT_ENABLED: bool = True
+    EARLY_EXIT_CHUNK_SIZE: int = 4
+    EARLY_EXIT_MIN_LEAVES: int = 3
+    EARLY_EXIT_MARGIN: float = 0.5
+
+    # Per-stage spans, sampled per trace and continued by mlcore through the
+    # traceparent gRPC metadata. Exported to "file:///path.jsonl" or to a
+    # collector on "udp://host:port". Spans past TRACE_QUEUE_SIZE waiting
+    # for export are dropped.
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 0.1
+    TRACE_EXPORT_URL: str = "file:///tmp/leafcare-traces.jsonl"
+    TRACE_QUEUE_SIZE: int = 10000
 
 
 load_dotenv()
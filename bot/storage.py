@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.logger import logger
+
+
+def create_storage(url: str, ttl: int = 0) -> BaseStorage:
+    """Create the FSM storage backend for the given URL.
+
+    `memory://` keeps states inside the process, which only works with a
+    single bot worker. `redis://` (or `rediss://`) shares states between all
+    workers, so any of them can handle a user's next message.
+
+    Args:
+        url (str): Storage URL, e.g. "memory://" or "redis://redis:6379/0".
+        ttl (int): Seconds after which an unfinished dialog is forgotten,
+            0 keeps it forever.
+
+    Returns:
+        BaseStorage: The storage to pass to the Dispatcher.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+
+    """
+    if url.startswith("memory://"):
+        logger.info("Using in-memory FSM storage")
+        return MemoryStorage()
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        logger.info("Using Redis FSM storage")
+        state_ttl = timedelta(seconds=ttl) if ttl else None
+        return RedisStorage.from_url(url, state_ttl=state_ttl, data_ttl=state_ttl)
+
+    error_msg = f"Unsupported FSM storage URL: {url}"
+    raise ValueError(error_msg)
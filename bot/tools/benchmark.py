@@ -0,0 +1,470 @@
+"""Benchmark the whole photo path of the bot against a fake Telegram Bot API.
+
+The bot is started as a subprocess with its Bot API pointed at a local
+server that plays Telegram. Virtual users go through /predict, pick a plant
+and send a photo from the corpus, every call the bot makes back is recorded.
+A local mlcore is started next to it unless --mlcore points at a running one.
+
+End-to-end latency runs from the moment a photo update is queued for the bot
+until the bot's last request for that chat. Stage latencies come from the
+spans both processes write with tracing forced on, and memory is sampled
+from both processes.
+
+Usage:
+    python bot/tools/benchmark.py --corpus data/leaves --users 20 --photos 3
+    python bot/tools/benchmark.py --corpus data/leaves --mlcore 127.0.0.1:50051 \
+        --env ANALYSIS_WORKERS=8 --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import psutil
+from aiohttp import web
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))
+
+from bot.logger import logger
+
+BENCH_TOKEN = "123456:benchmark"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "LeafCare", "username": "leafcare_bench_bot"}
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+PLANTS = ["Помидор", "Огурец", "Дыня", "Арбуз", "Клубника", "Перец"]
+
+# Status texts that end the analysis of a photo, mapped to an outcome.
+OUTCOMES = {
+    "✅ Анализ завершен": "ok",
+    "✅ Это фото уже анализировалось": "cached",
+    "Объекты не обнаружены": "no_leaves",
+    "⏳": "rejected",
+    "❌": "error",
+}
+
+
+@dataclass
+class CorpusPhoto:
+    file_id: str
+    data: bytes
+    width: int
+    height: int
+
+
+@dataclass
+class Outgoing:
+    at: float
+    method: str
+    text: str
+
+
+@dataclass
+class Chat:
+    outbox: asyncio.Queue = field(default_factory=asyncio.Queue)
+    last_request: float = 0.0
+
+
+class FakeBotAPI:
+    """FakeBotAPI class answers the Bot API calls the bot makes.
+
+    Updates are served through long polling from an in-memory list, files
+    are served from the corpus and everything the bot sends is put into the
+    outbox of its chat, so virtual users can wait for replies.
+    """
+
+    def __init__(self, corpus: list[CorpusPhoto]) -> None:
+        self.files = {photo.file_id: photo for photo in corpus}
+        self.chats: defaultdict[int, Chat] = defaultdict(Chat)
+        self.polling = asyncio.Event()
+
+        self._updates: list[dict[str, Any]] = []
+        self._has_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._handle_file)
+        return app
+
+    def _message(self, chat_id: int, sender: dict[str, Any], **fields: Any) -> dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": sender,
+            **fields,
+        }
+
+    def _push(self, chat_id: int, **fields: Any) -> float:
+        user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+        self._updates.append({
+            "update_id": next(self._update_ids),
+            "message": self._message(chat_id, user, **fields),
+        })
+        self._has_updates.set()
+        return time.monotonic()
+
+    def push_text(self, chat_id: int, text: str) -> float:
+        entities = [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else []
+        return self._push(chat_id, text=text, entities=entities)
+
+    def push_photo(self, chat_id: int, photo: CorpusPhoto, unique_id: str) -> float:
+        return self._push(chat_id, photo=[{
+            "file_id": photo.file_id,
+            "file_unique_id": unique_id,
+            "width": photo.width,
+            "height": photo.height,
+            "file_size": len(photo.data),
+        }])
+
+    async def _handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        form = await request.post()
+
+        if method == "getUpdates":
+            result = await self._get_updates(form)
+        elif method == "getMe":
+            result = BOT_USER
+        elif method == "getFile":
+            file_id = form["file_id"]
+            result = {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.files[file_id].data),
+                "file_path": f"photos/{file_id}",
+            }
+        elif "chat_id" in form:
+            result = self._record(method, form)
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, form: Any) -> list[dict[str, Any]]:
+        self.polling.set()
+
+        # Everything below the offset was confirmed by the bot.
+        offset = int(form.get("offset", 0))
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+
+        if not self._updates:
+            self._has_updates.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._has_updates.wait(), float(form.get("timeout", 0)))
+
+        return self._updates[:100]
+
+    def _record(self, method: str, form: Any) -> Any:
+        chat_id = int(form["chat_id"])
+        text = str(form.get("text") or form.get("caption") or "")
+
+        chat = self.chats[chat_id]
+        chat.last_request = time.monotonic()
+        chat.outbox.put_nowait(Outgoing(chat.last_request, method, text))
+
+        fields: dict[str, Any] = {"text": text}
+        if method == "sendPhoto":
+            size = sum(len(value.file.read()) for value in form.values() if isinstance(value, web.FileField))
+            file_id = f"sent-{next(self._message_ids)}"
+            fields = {"caption": text, "photo": [{
+                "file_id": file_id, "file_unique_id": file_id, "width": 1, "height": 1, "file_size": size,
+            }]}
+
+        return self._message(chat_id, BOT_USER, **fields)
+
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        file_id = request.match_info["path"].removeprefix("photos/")
+        photo = self.files.get(file_id)
+        if photo is None:
+            raise web.HTTPNotFound
+        return web.Response(body=photo.data, content_type="image/jpeg")
+
+    async def wait_for(self, chat_id: int, prefixes: tuple[str, ...], timeout: float) -> Outgoing:
+        """Wait for a message to the chat starting with one of the prefixes."""
+        outbox = self.chats[chat_id].outbox
+        async with asyncio.timeout(timeout):
+            while True:
+                outgoing = await outbox.get()
+                if outgoing.text.startswith(prefixes):
+                    return outgoing
+
+
+def load_corpus(folder: Path, limit: int) -> list[CorpusPhoto]:
+    paths = sorted(path for path in folder.rglob("*") if path.suffix.lower() in IMAGE_SUFFIXES)
+    if limit:
+        paths = paths[:limit]
+
+    corpus = []
+    for i, path in enumerate(paths):
+        with Image.open(path) as image:
+            width, height = image.size
+        corpus.append(CorpusPhoto(f"corpus-{i}", path.read_bytes(), width, height))
+    return corpus
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """Summarize latencies in milliseconds."""
+    if not values:
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": len(values),
+        "mean": round(float(np.mean(values)), 1),
+        "p50": round(float(p50), 1),
+        "p90": round(float(p90), 1),
+        "p99": round(float(p99), 1),
+        "max": round(float(np.max(values)), 1),
+    }
+
+
+def stage_latencies(trace_files: list[Path]) -> dict[str, dict[str, float]]:
+    """Group exported spans by service and stage name."""
+    durations: defaultdict[str, list[float]] = defaultdict(list)
+    queue_waits = []
+
+    for path in trace_files:
+        if not path.exists():
+            continue
+        for line in path.read_text(encoding="utf-8").splitlines():
+            span = json.loads(line)
+            durations[f"{span['service']}.{span['name']}"].append((span["end_ns"] - span["start_ns"]) / 1e6)
+            if "queue_wait_ms" in span["attributes"]:
+                queue_waits.append(span["attributes"]["queue_wait_ms"])
+
+    stages = {name: percentiles(values) for name, values in sorted(durations.items())}
+    stages["bot.queue_wait"] = percentiles(queue_waits)
+    return stages
+
+
+class MemorySampler:
+    """Samples the resident memory of the benchmarked processes."""
+
+    def __init__(self, processes: dict[str, subprocess.Popen], interval: float = 0.5) -> None:
+        self.processes = {name: psutil.Process(process.pid) for name, process in processes.items()}
+        self.interval = interval
+        self.samples: defaultdict[str, list[int]] = defaultdict(list)
+
+    async def run(self) -> None:
+        while True:
+            for name, process in self.processes.items():
+                with contextlib.suppress(psutil.Error):
+                    self.samples[name].append(process.memory_info().rss)
+            await asyncio.sleep(self.interval)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        mib = 1024 * 1024
+        return {
+            name: {
+                "start_mib": round(samples[0] / mib, 1),
+                "peak_mib": round(max(samples) / mib, 1),
+                "end_mib": round(samples[-1] / mib, 1),
+            }
+            for name, samples in self.samples.items() if samples
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, process: subprocess.Popen, timeout: float) -> None:
+    async with asyncio.timeout(timeout):
+        while True:
+            if process.poll() is not None:
+                error_msg = f"mlcore exited with code {process.returncode}"
+                raise RuntimeError(error_msg)
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                await asyncio.sleep(0.5)
+                continue
+            writer.close()
+            return
+
+
+def start_process(service: str, env: dict[str, str], log_dir: Path) -> subprocess.Popen:
+    # Both services run from their own folder, as in their containers.
+    log = open(log_dir / f"{service}.log", "wb")  # noqa: SIM115
+    return subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=ROOT / service,
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+@dataclass
+class UserResult:
+    latencies: list[float] = field(default_factory=list)
+    outcomes: defaultdict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+async def run_user(
+    api: FakeBotAPI,
+    chat_id: int,
+    corpus: list[CorpusPhoto],
+    photos: int,
+    think: float,
+    timeout: float,
+) -> UserResult:
+    """Play one user sending `photos` photos one after another."""
+    result = UserResult()
+
+    for n in range(photos):
+        photo = corpus[(chat_id + n) % len(corpus)]
+
+        try:
+            api.push_text(chat_id, "/predict")
+            await api.wait_for(chat_id, ("Выберите",), timeout)
+            api.push_text(chat_id, PLANTS[chat_id % len(PLANTS)])
+            await api.wait_for(chat_id, ("Вы выбрали",), timeout)
+
+            # A fresh file_unique_id per send keeps the result cache out of the way.
+            sent_at = api.push_photo(chat_id, photo, unique_id=f"{photo.file_id}-{chat_id}-{n}")
+            status = await api.wait_for(chat_id, tuple(OUTCOMES), timeout)
+        except TimeoutError:
+            result.outcomes["timeout"] += 1
+            continue
+
+        # Report messages may still follow the final status, the user looks
+        # at the answer for `think` seconds and the last request counts.
+        await asyncio.sleep(think)
+        result.outcomes[next(o for p, o in OUTCOMES.items() if status.text.startswith(p))] += 1
+        result.latencies.append((api.chats[chat_id].last_request - sent_at) * 1000)
+
+    return result
+
+
+async def benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    corpus = load_corpus(args.corpus, args.limit)
+    if not corpus:
+        error_msg = f"No images found in {args.corpus}"
+        raise ValueError(error_msg)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="leafcare-bench-"))
+    traces = {service: work_dir / f"{service}-spans.jsonl" for service in ("bot", "mlcore")}
+    tracing = {"TRACING_ENABLED": "true", "TRACE_SAMPLE_RATE": "1"}
+
+    api = FakeBotAPI(corpus)
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    api_port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", api_port).start()
+
+    processes: dict[str, subprocess.Popen] = {}
+    try:
+        if args.mlcore:
+            mlcore_host, _, mlcore_port = args.mlcore.rpartition(":")
+        else:
+            mlcore_host, mlcore_port = "127.0.0.1", str(free_port())
+            processes["mlcore"] = start_process("mlcore", {
+                "GRPC_HOST_LOCAL": mlcore_host,
+                "GRPC_PORT": mlcore_port,
+                "TRACE_EXPORT_URL": f"file://{traces['mlcore']}",
+                **tracing,
+            }, work_dir)
+            await wait_for_port(int(mlcore_port), processes["mlcore"], args.startup_timeout)
+
+        processes["bot"] = start_process("bot", {
+            "BOT_TOKEN": BENCH_TOKEN,
+            "BOT_MODE": "polling",
+            "TELEGRAM_API_URL": f"http://127.0.0.1:{api_port}",
+            "GRPC_HOST_LOCAL": mlcore_host,
+            "GRPC_PORT": mlcore_port,
+            "GRPC_NODES": "",
+            "FSM_STORAGE_URL": "memory://",
+            "RESULT_CACHE_MAX_DISTANCE": "0",
+            "TRACE_EXPORT_URL": f"file://{traces['bot']}",
+            **tracing,
+            **dict(item.split("=", 1) for item in args.env),
+        }, work_dir)
+
+        async with asyncio.timeout(args.startup_timeout):
+            await api.polling.wait()
+        logger.info(f"Bot is polling, replaying {args.photos} photos for {args.users} users")
+
+        sampler = MemorySampler(processes)
+        sampling = asyncio.create_task(sampler.run())
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(
+            run_user(api, chat_id, corpus, args.photos, args.think, args.timeout)
+            for chat_id in range(1, args.users + 1)
+        ))
+        elapsed = time.monotonic() - started
+
+        sampling.cancel()
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        await runner.cleanup()
+
+    latencies = [latency for result in results for latency in result.latencies]
+    outcomes: defaultdict[str, int] = defaultdict(int)
+    for result in results:
+        for outcome, count in result.outcomes.items():
+            outcomes[outcome] += count
+
+    return {
+        "users": args.users,
+        "photos": args.users * args.photos,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(latencies) / elapsed, 3),
+        "outcomes": dict(outcomes),
+        "end_to_end_ms": percentiles(latencies),
+        "stages_ms": stage_latencies(list(traces.values())),
+        "memory": sampler.summary(),
+        "logs": str(work_dir),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, required=True, help="Folder of leaf photos")
+    parser.add_argument("--limit", type=int, default=0, help="Max corpus images, 0 for all")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--photos", type=int, default=3, help="Photos sent by every user")
+    parser.add_argument("--think", type=float, default=0.5, help="Seconds a user waits after a result")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for one result")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--mlcore", help="host:port of a running mlcore instead of a local one")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE setting for the bot")
+    parser.add_argument("--output", type=Path, help="Write the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(benchmark(args))
+
+    report = json.dumps(summary, indent=2, ensure_ascii=False)
+    print(report)  # noqa: T201
+    if args.output:
+        args.output.write_text(report + "\n", encoding="utf-8")
+
+    return 0 if summary["outcomes"].keys() <= {"ok", "no_leaves"} else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,423 @@
+"""Classify folders and archives of field photos without going through Telegram.
+
+Images are streamed from a directory, a tar archive (compressed or not) or a
+zip archive through the bot's own pipeline: batched leaf detection, leaf
+crops, classification by one or more mlcore backends and per-photo
+aggregation. At most --concurrency photos are in flight. Results are
+appended to a JSONL or CSV file as they finish, so a rerun with the same
+output skips the photos already classified and retries the failed ones. A
+summary of the whole output is written next to it at the end.
+
+Usage:
+    python bot/tools/classify_bulk.py photos/ --plant tomato --output results.jsonl
+    python bot/tools/classify_bulk.py field.tar.gz --plant помидор --output results.csv \
+        --mlcore 10.0.0.5:50051 --mlcore 10.0.0.6:50051 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+# The bot settings require a token, this tool never talks to Telegram.
+os.environ.setdefault("BOT_TOKEN", "0:offline")
+
+import numpy as np
+
+from bot.logger import logger
+from bot.protos.predict import predict_pb2
+from bot.services.detection.batcher import DetectionBatcher, Detections
+from bot.services.detection.crops import CropEncoder
+from bot.services.detection.intake import ImageIntake
+from bot.services.detection.pool import DetectorPool
+from bot.services.detection.quantization import resolve_variant
+from bot.services.detection.selection import select_leaves
+from bot.services.diagnostics.aggregation import aggregate, reply_to_matrix, top_k
+from bot.services.grpc.predict_client import PredictClient
+from bot.services.grpc.sharding import ShardRouter
+from bot.services.mapping.plant_mapper import ModelMapper
+from bot.settings import settings
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+# Results that are not retried on the next run, errors are.
+FINAL_STATUSES = ("ok", "no_leaves")
+
+
+def _is_image(name: str) -> bool:
+    return Path(name).suffix.lower() in IMAGE_SUFFIXES
+
+
+def iter_images(source: Path) -> Iterator[tuple[str, bytes]]:
+    """Yield (name, encoded bytes) of every image in a folder or archive.
+
+    Tar archives are read as a stream, so even a compressed one is never
+    unpacked to disk or held in memory as a whole.
+    """
+    if source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if path.is_file() and _is_image(path.name):
+                yield path.relative_to(source).as_posix(), path.read_bytes()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image(info.filename):
+                    yield info.filename, archive.read(info)
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and _is_image(member.name):
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        error_msg = f"{source} is neither a folder nor a tar or zip archive"
+        raise ValueError(error_msg)
+
+
+def parse_plant(name: str) -> predict_pb2.Plant:
+    """Accept the bot's Russian plant names as well as "tomato" or "PLANT_TOMATO"."""
+    try:
+        return ModelMapper.get_plant_type(name)
+    except ValueError:
+        pass
+
+    enum_name = name.strip().upper()
+    if not enum_name.startswith("PLANT_"):
+        enum_name = f"PLANT_{enum_name}"
+    try:
+        return predict_pb2.Plant.Value(enum_name)
+    except ValueError:
+        error_msg = f"Unknown plant: {name}"
+        raise ValueError(error_msg) from None
+
+
+class ResultWriter:
+    """ResultWriter class appends per-image results to a JSONL or CSV file.
+
+    Every result is flushed as one line, so an interrupted run loses at most
+    the line being written. That partial line is cut off before appending.
+    Images already classified are skipped on the next run, failed ones are
+    tried again and their new result appended, the last line of an image
+    is the one that counts.
+    """
+
+    def __init__(self, path: Path, top: int = 3) -> None:
+        self.path = path
+        self.top = top
+        self.is_csv = path.suffix.lower() == ".csv"
+        self.columns = ["image", "status", "leaves", "dropped", "over_budget"]
+        for i in range(1, top + 1):
+            self.columns += [f"top{i}", f"top{i}_probability"]
+        self.columns += ["error", "elapsed_ms"]
+
+        self._file = None
+        self._csv: Optional[csv.DictWriter] = None
+
+    def _repair(self) -> None:
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+                logger.warning("Dropped a partially written line from %s", self.path)
+
+    def read(self) -> list[dict[str, Any]]:
+        """Read back the results as flat rows with the CSV columns."""
+        if not self.path.exists():
+            return []
+        self._repair()
+
+        with open(self.path, encoding="utf-8", newline="") as f:
+            if self.is_csv:
+                return list(csv.DictReader(f))
+            return [self.flatten(json.loads(line)) for line in f if line.strip()]
+
+    def latest(self) -> dict[str, dict[str, Any]]:
+        """The last result of every image, in the order images first appear."""
+        return {row["image"]: row for row in self.read()}
+
+    def done(self) -> set[str]:
+        return {image for image, row in self.latest().items() if row["status"] in FINAL_STATUSES}
+
+    def flatten(self, result: dict[str, Any]) -> dict[str, Any]:
+        row = {key: value for key, value in result.items() if key != "top"}
+        for i, item in enumerate(result.get("top", []), start=1):
+            row[f"top{i}"] = item["class_name"]
+            row[f"top{i}_probability"] = item["probability"]
+        return row
+
+    def open(self) -> None:
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, "a", encoding="utf-8", newline="")  # noqa: SIM115
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore")
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, result: dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.writerow(self.flatten(result))
+        else:
+            self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> dict[str, Any]:
+        """Aggregate the last result of every image, including earlier runs."""
+        rows = list(self.latest().values())
+        classified = [row for row in rows if row["status"] == "ok"]
+        return {
+            "images": len(rows),
+            "statuses": dict(Counter(row["status"] for row in rows)),
+            "top1": dict(Counter(row["top1"] for row in classified).most_common()),
+            "mean_leaves": round(
+                float(np.mean([int(row["leaves"]) for row in classified])) if classified else 0.0, 2,
+            ),
+        }
+
+
+class BulkClassifier:
+    """BulkClassifier class runs one photo through detection and classification.
+
+    Photos classified at the same time share detector batches, and their
+    classification requests are spread over the backends in turn. A backend
+    that cannot be reached or does not answer in time is skipped for that
+    request.
+    """
+
+    def __init__(
+        self,
+        batcher: DetectionBatcher,
+        encoder: CropEncoder,
+        clients: list[PredictClient],
+        plant_type: predict_pb2.Plant,
+        policy: str = "sum",
+        top: int = 3,
+        intake: Optional[ImageIntake] = None,
+    ) -> None:
+        self.batcher = batcher
+        self.encoder = encoder
+        self.clients = clients
+        self.plant_type = plant_type
+        self.policy = policy
+        self.top = top
+        self.intake = intake or ImageIntake()
+        self.crop_size = ModelMapper.get_input_size(plant_type, default=encoder.size)
+
+        self._turn = itertools.cycle(range(len(clients)))
+
+    async def _predict(self, crops: list[bytes]) -> predict_pb2.PredictorReply:
+        start = next(self._turn)
+        for i in range(len(self.clients)):
+            client = self.clients[(start + i) % len(self.clients)]
+            try:
+                return await client.predict(images_data=crops, plant_type=self.plant_type)
+            except (ConnectionError, asyncio.TimeoutError) as e:
+                logger.warning("Backend %s failed: %s", client.target, e or type(e).__name__)
+        error_msg = "No mlcore backend could classify the photo"
+        raise ConnectionError(error_msg)
+
+    def _top(self, reply: predict_pb2.PredictorReply, detections: Detections) -> list[dict[str, Any]]:
+        class_names, matrix = reply_to_matrix(reply)
+        vector = aggregate(matrix, policy=self.policy, weights=detections.scores[:len(matrix)])
+        return [
+            {"class_name": class_names[i], "probability": round(float(vector[i]), 4)}
+            for i in top_k(vector, self.top)
+        ]
+
+    async def classify(self, name: str, data: bytes) -> dict[str, Any]:
+        started = time.monotonic()
+        result: dict[str, Any] = {
+            "image": name, "status": "ok", "leaves": 0, "dropped": 0, "over_budget": 0,
+        }
+
+        try:
+            # Large photos are decoded downscaled, within the memory budget.
+            async with self.intake.load(data) as image:
+                detections = select_leaves(
+                    await self.batcher.submit(image),
+                    image.shape[:2],
+                    max_leaves=settings.MAX_LEAVES,
+                    overlap_threshold=settings.LEAF_OVERLAP_THRESHOLD,
+                    min_area_ratio=settings.MIN_LEAF_AREA_RATIO,
+                )
+                crops = await self.encoder.encode_all(
+                    image, detections.boxes, self.crop_size,
+                ) if len(detections) else []
+            result["leaves"], result["dropped"] = len(detections), detections.dropped
+            result["over_budget"] = detections.over_budget
+
+            if not crops:
+                result["status"] = "no_leaves"
+            else:
+                result["top"] = self._top(await self._predict(crops), detections)
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e) or type(e).__name__
+
+        result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return result
+
+
+@dataclass
+class Throughput:
+    skipped: int = 0
+    processed: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    started: float = field(default_factory=time.monotonic)
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.processed / elapsed if elapsed else 0.0
+        statuses = ", ".join(f"{status} {count}" for status, count in sorted(self.statuses.items()))
+        return (
+            f"{self.processed} photos in {elapsed:.0f} s, {rate:.2f} photos/s"
+            f" ({statuses or 'nothing yet'}), {self.skipped} already done"
+        )
+
+
+async def report_progress(throughput: Throughput, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Progress: %s", throughput.line())
+
+
+async def connect_backends(addresses: list[str]) -> list[PredictClient]:
+    """Connect to every reachable backend, the run fails only without any.
+
+    Raises:
+        ConnectionError: If none of the backends could be reached.
+
+    """
+    clients = []
+    for address in addresses:
+        host, port = ShardRouter.split_address(address)
+        client = PredictClient(host=host, port=port)
+        try:
+            await client.connect()
+        except ConnectionError as e:
+            logger.warning("Leaving out backend %s: %s", address, e)
+            await client.close()
+            continue
+        clients.append(client)
+
+    if not clients:
+        error_msg = f"None of the mlcore backends is reachable: {', '.join(addresses)}"
+        raise ConnectionError(error_msg)
+
+    return clients
+
+
+async def run(args: argparse.Namespace) -> Throughput:
+    writer = ResultWriter(args.output, top=args.top)
+    done = writer.done()
+
+    model_path = resolve_variant(args.detector, settings.DETECT_PRECISION)
+    pool = await asyncio.to_thread(
+        DetectorPool.load, model_path, size=args.detector_replicas,
+        imgsz=settings.DETECT_IMGSZ, warmup=settings.DETECT_WARMUP,
+    )
+
+    clients = await connect_backends(
+        args.mlcore or [f"{settings.GRPC_HOST_LOCAL}:{settings.GRPC_PORT}"],
+    )
+
+    classifier = BulkClassifier(
+        DetectionBatcher(
+            pool,
+            imgsz=settings.DETECT_IMGSZ,
+            max_batch_size=settings.DETECT_BATCH_SIZE,
+            max_wait_ms=settings.DETECT_BATCH_WAIT_MS,
+            conf=0.5,
+        ),
+        CropEncoder(
+            size=settings.CROP_SIZE,
+            padding=settings.CROP_PADDING,
+            image_format=settings.CROP_FORMAT,
+            quality=settings.CROP_QUALITY,
+            workers=settings.CROP_WORKERS,
+        ),
+        clients,
+        plant_type=parse_plant(args.plant),
+        policy=args.policy,
+        top=args.top,
+        intake=ImageIntake(
+            max_bytes=settings.MAX_IMAGE_BYTES,
+            max_pixels=settings.MAX_IMAGE_PIXELS,
+            memory_budget=settings.DECODE_MEMORY_BUDGET,
+        ),
+    )
+
+    throughput = Throughput()
+    # Bounds the photos read ahead of the workers, and so the memory used.
+    queue: asyncio.Queue[Optional[tuple[str, bytes]]] = asyncio.Queue(args.concurrency * 2)
+
+    async def produce() -> None:
+        images = iter_images(args.input)
+        while (item := await asyncio.to_thread(next, images, None)) is not None:
+            if item[0] in done:
+                throughput.skipped += 1
+                continue
+            await queue.put(item)
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    async def work() -> None:
+        while (item := await queue.get()) is not None:
+            result = await classifier.classify(*item)
+            writer.write(result)
+            throughput.processed += 1
+            throughput.statuses[result["status"]] += 1
+
+    writer.open()
+    progress = asyncio.create_task(report_progress(throughput, args.progress_interval))
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(args.concurrency)))
+    finally:
+        progress.cancel()
+        writer.close()
+        for client in clients:
+            await client.close()
+
+    summary_path = args.output.with_name(f"{args.output.stem}.summary.json")
+    summary_path.write_text(json.dumps(writer.summary(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    logger.info("Done: %s, summary in %s", throughput.line(), summary_path)
+
+    return throughput
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="Folder, tar or zip archive of photos")
+    parser.add_argument("--plant", required=True, help="Plant type of every photo, e.g. tomato")
+    parser.add_argument("--output", type=Path, required=True, help="Results file, .jsonl or .csv")
+    parser.add_argument("--mlcore", action="append", help="host:port of a backend, repeatable")
+    parser.add_argument("--detector", default=str(Path(__file__).resolve().parents[1] / settings.DETECT_MODEL_PATH))
+    parser.add_argument("--detector-replicas", type=int, default=settings.DETECT_POOL_SIZE)
+    parser.add_argument("--concurrency", type=int, default=16, help="Photos in flight")
+    parser.add_argument("--policy", default=settings.AGGREGATION_POLICY, help="Leaf aggregation policy")
+    parser.add_argument("--top", type=int, default=3, help="Classes kept per photo")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between reports")
+    args = parser.parse_args(argv)
+
+    throughput = asyncio.run(run(args))
+
+    return 2 if throughput.statuses["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Profile the modules the bot imports before it starts polling.
+
+`import main` runs in a fresh interpreter with `-X importtime` from the bot
+folder, the slowest packages and modules are reported with their cumulative
+time. The ML stack must stay out of startup, the detector imports it while
+it loads in the background, so the profile fails when one of the deferred
+packages is imported or the total exceeds the budget.
+
+Usage:
+    python bot/tools/import_profile.py
+    python bot/tools/import_profile.py --top 30 --budget 3 --output imports.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+BOT_DIR = Path(__file__).resolve().parents[1]
+
+# Imported by the detector loading thread, never by the startup path.
+DEFERRED = ("ultralytics", "torch", "cv2")
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """Parse the `import time:` lines written by `python -X importtime`."""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The header line.
+            continue
+
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        records.append(ImportRecord(
+            name=stripped,
+            self_us=int(fields[0]),
+            cumulative_us=int(fields[1]),
+            depth=(len(name) - len(stripped) - 1) // 2,
+        ))
+    return records
+
+
+def profile_imports(module: str = "main") -> list[ImportRecord]:
+    """Import the module in a fresh interpreter and return its import times."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("BOT_TOKEN", "123456:profile")
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        error_msg = f"import {module} failed:\n{completed.stderr[-2000:]}"
+        raise RuntimeError(error_msg)
+
+    return parse_importtime(completed.stderr)
+
+
+def summarize(records: list[ImportRecord], top: int) -> dict[str, Any]:
+    packages: dict[str, int] = {}
+    for record in records:
+        package = record.name.split(".")[0]
+        packages[package] = packages.get(package, 0) + record.self_us
+
+    return {
+        "total_s": round(sum(record.self_us for record in records) / 1e6, 3),
+        "modules": len(records),
+        "deferred_imported": sorted({
+            record.name.split(".")[0] for record in records
+            if record.name.split(".")[0] in DEFERRED
+        }),
+        "packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest": [
+            asdict(record)
+            for record in sorted(records, key=lambda record: -record.cumulative_us)[:top]
+        ],
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module imported from the bot folder")
+    parser.add_argument("--top", type=int, default=15, help="Packages and modules to list")
+    parser.add_argument("--budget", type=float, default=0, help="Max total seconds, 0 for none")
+    parser.add_argument("--output", type=Path, help="Write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    summary = summarize(profile_imports(args.module), args.top)
+
+    report = json.dumps(summary, indent=2)
+    print(report)  # noqa: T201
+    if args.output:
+        args.output.write_text(report + "\n", encoding="utf-8")
+
+    if summary["deferred_imported"]:
+        return 2
+    if args.budget and summary["total_s"] > args.budget:
+        return 3
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+from .tracer import Span, Tracer, tracer
+
+__all__ = [
+    "Span",
+    "Tracer",
+    "tracer",
+]
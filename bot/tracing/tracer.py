@@ -0,0 +1,185 @@
+import json
+import multiprocessing.util
+import queue
+import random
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from bot.logger import RATE_LIMITED, logger
+from bot.settings import settings
+
+SERVICE_NAME = "bot"
+
+
+@dataclass
+class Span:
+    """A timed stage of a trace, exported as one JSON object."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    service: str = SERVICE_NAME
+    start_ns: int = 0
+    end_ns: int = 0
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+    sampled: bool = True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        # W3C trace context header, understood by mlcore and by nginx logs.
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class _Exporter:
+    """Writes finished spans from a background thread.
+
+    "file:///path/traces.jsonl" appends JSON lines, "udp://host:port" sends
+    one datagram per span to a local collector. The sink is opened right
+    away, so a bad URL fails at startup. At most `queue_size` spans wait for
+    the thread, newer ones are dropped beyond that.
+    """
+
+    def __init__(self, url: str, queue_size: int = 10000) -> None:
+        self.url = urlparse(url)
+        self.queue_size = queue_size
+        self.dropped = 0
+
+        self._file = None
+        self._sock = None
+        if self.url.scheme == "file":
+            self._file = open(self.url.path, "a", encoding="utf-8")  # noqa: SIM115
+        elif self.url.scheme == "udp" and self.url.hostname and self.url.port:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            error_msg = f"Unsupported trace export URL: {url}"
+            raise ValueError(error_msg)
+
+        self._start()
+        # Forked workers inherit the sink but not the thread.
+        multiprocessing.util.register_after_fork(self, _Exporter._start)
+
+    def _start(self) -> None:
+        self._queue: queue.Queue = queue.Queue(self.queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Losing a span beats blocking a request on a slow sink.
+            self.dropped += 1
+
+    def _write(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str)
+        if self._file is not None:
+            self._file.write(line + "\n")
+            # Flush once the backlog is written, not after every span.
+            if self._queue.empty():
+                self._file.flush()
+        else:
+            self._sock.sendto(line.encode(), (self.url.hostname, self.url.port))
+
+    def _run(self) -> None:
+        while True:
+            span = self._queue.get()
+            try:
+                self._write(span)
+            except Exception as e:
+                # A failing sink loses spans, it must not stop the thread.
+                logger.warning("Failed to export span: %s", e, extra=RATE_LIMITED)
+
+
+class Tracer:
+    """Tracer class records pipeline stages as spans of a distributed trace.
+
+    The sampling decision is taken once per trace at the root span and
+    travels to mlcore in the `traceparent` gRPC metadata. When tracing is
+    disabled or a trace is not sampled, `span` only costs a context variable
+    lookup and nothing is exported.
+    """
+
+    _current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+    def __init__(
+        self, enabled: bool, sample_rate: float, export_url: str, queue_size: int = 10000,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.export_url = export_url
+        self._exporter = _Exporter(export_url, queue_size) if enabled else None
+
+    @property
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the block as a child of the current span, or as a new trace."""
+        parent = self._current.get()
+
+        if not self.enabled or (parent is not None and not parent.sampled):
+            yield _NOOP_SPAN
+            return
+
+        if parent is None:
+            span = Span(
+                name=name,
+                trace_id=uuid.uuid4().hex,
+                span_id=uuid.uuid4().hex[:16],
+                sampled=random.random() < self.sample_rate,
+            )
+        else:
+            span = Span(
+                name=name,
+                trace_id=parent.trace_id,
+                span_id=uuid.uuid4().hex[:16],
+                parent_id=parent.span_id,
+            )
+
+        if span.sampled:
+            span.attributes.update(attributes)
+            span.start_ns = time.time_ns()
+
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = f"error: {type(e).__name__}"
+            raise
+        finally:
+            self._current.reset(token)
+            if span.sampled:
+                span.end_ns = time.time_ns()
+                self._exporter.export(span)
+
+    def inject(self) -> list[tuple[str, str]]:
+        """gRPC metadata carrying the current trace context."""
+        span = self._current.get()
+        if span is None or span is _NOOP_SPAN:
+            return []
+        return [("traceparent", span.traceparent)]
+
+
+_NOOP_SPAN = Span(name="", trace_id="0" * 32, span_id="0" * 16, sampled=False)
+
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    export_url=settings.TRACE_EXPORT_URL,
+    queue_size=settings.TRACE_QUEUE_SIZE,
+)
@@ -0,0 +1,84 @@
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.bot_instance import instance_bot
+from bot.logger import logger
+from bot.settings import settings
+
+
+def build_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """Build the aiohttp application that receives Telegram updates."""
+    app = web.Application()
+
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET or None,
+    ).register(app, path=settings.WEBHOOK_PATH)
+
+    # Runs the dispatcher startup/shutdown hooks together with the app.
+    setup_application(app, dp, bot=bot)
+
+    return app
+
+
+async def set_webhook(bot: Bot) -> None:
+    url = f"{settings.WEBHOOK_BASE_URL.rstrip('/')}{settings.WEBHOOK_PATH}"
+
+    await bot.set_webhook(
+        url=url,
+        secret_token=settings.WEBHOOK_SECRET or None,
+    )
+    await bot.session.close()
+
+    logger.info(f"Webhook set to {url}")
+
+
+def _serve(create_dispatcher: Callable[[], Dispatcher]) -> None:
+    bot = instance_bot(settings.BOT_TOKEN, api_url=settings.TELEGRAM_API_URL)
+    dp = create_dispatcher()
+
+    # Workers share the listening port, the kernel spreads connections.
+    web.run_app(
+        build_app(dp, bot),
+        host=settings.WEBAPP_HOST,
+        port=settings.WEBAPP_PORT,
+        reuse_port=settings.WEBHOOK_WORKERS > 1,
+        print=None,
+    )
+
+
+def run_webhook(create_dispatcher: Callable[[], Dispatcher]) -> None:
+    """Register the webhook and serve updates from several worker processes.
+
+    Args:
+        create_dispatcher (Callable[[], Dispatcher]): Builds the dispatcher of
+            every worker. With more than one worker it must use a shared FSM
+            storage.
+
+    """
+    if settings.WEBHOOK_WORKERS > 1 and settings.FSM_STORAGE_URL.startswith("memory://"):
+        logger.warning("Several webhook workers with in-memory FSM storage will lose states")
+
+    asyncio.run(set_webhook(instance_bot(settings.BOT_TOKEN, api_url=settings.TELEGRAM_API_URL)))
+
+    if settings.WEBHOOK_WORKERS == 1:
+        _serve(create_dispatcher)
+        return
+
+    workers = [
+        multiprocessing.Process(target=_serve, args=(create_dispatcher,), daemon=False)
+        for _ in range(settings.WEBHOOK_WORKERS)
+    ]
+
+    for worker in workers:
+        worker.start()
+    logger.info(f"Started {len(workers)} webhook workers on port {settings.WEBAPP_PORT}")
+
+    for worker in workers:
+        worker.join()
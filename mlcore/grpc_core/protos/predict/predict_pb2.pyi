@@ -37,13 +37,27 @@ class ImageResults(_message.Message):
     results: _containers.RepeatedCompositeFieldContainer[ClassProbability]
     def __init__(self, results: _Optional[_Iterable[_Union[ClassProbability, _Mapping]]] = ...) -> None: ...
 
+class SharedMemoryRef(_message.Message):
+    __slots__ = ("offset", "length")
+    OFFSET_FIELD_NUMBER: _ClassVar[int]
+    LENGTH_FIELD_NUMBER: _ClassVar[int]
+    offset: int
+    length: int
+    def __init__(self, offset: _Optional[int] = ..., length: _Optional[int] = ...) -> None: ...
+
 class PredictorRequest(_message.Message):
-    __slots__ = ("image_data", "plant")
+    __slots__ = ("image_data", "plant", "shm_name", "image_refs", "shm_generation")
     IMAGE_DATA_FIELD_NUMBER: _ClassVar[int]
     PLANT_FIELD_NUMBER: _ClassVar[int]
+    SHM_NAME_FIELD_NUMBER: _ClassVar[int]
+    IMAGE_REFS_FIELD_NUMBER: _ClassVar[int]
+    SHM_GENERATION_FIELD_NUMBER: _ClassVar[int]
     image_data: _containers.RepeatedScalarFieldContainer[bytes]
     plant: Plant
-    def __init__(self, image_data: _Optional[_Iterable[bytes]] = ..., plant: _Optional[_Union[Plant, str]] = ...) -> None: ...
+    shm_name: str
+    image_refs: _containers.RepeatedCompositeFieldContainer[SharedMemoryRef]
+    shm_generation: int
+    def __init__(self, image_data: _Optional[_Iterable[bytes]] = ..., plant: _Optional[_Union[Plant, str]] = ..., shm_name: _Optional[str] = ..., image_refs: _Optional[_Iterable[_Union[SharedMemoryRef, _Mapping]]] = ..., shm_generation: _Optional[int] = ...) -> None: ...
 
 class PredictorReply(_message.Message):
     __slots__ = ("result",)
@@ -0,0 +1,186 @@
+import io
+import math
+import os
+import threading
+import time
+import warnings
+from collections import deque
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from mlcore.logger import RATE_LIMITED, logger
+
+# Decode flags by downscale factor, libjpeg scales JPEGs while decoding.
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+@dataclass(frozen=True)
+class DecodePlan:
+    width: int
+    height: int
+    reduction: int
+    # Bytes of decoded pixels alive at once while the image is decoded.
+    nbytes: int
+
+
+class ImageIntake:
+    """ImageIntake class bounds the memory decoded images can take.
+
+    Image sizes are read from the headers before anything is decoded.
+    Images over MAX_IMAGE_PIXELS are decoded at 1/2, 1/4 or 1/8 of their
+    size instead of being rejected, and the decoded pixels of the requests
+    in flight on all server threads are kept under DECODE_MEMORY_BUDGET,
+    new requests waiting in arrival order until enough of it is released.
+    """
+
+    _in_flight = 0
+    _condition = threading.Condition()
+    # Tickets of the requests waiting for the budget, oldest first.
+    _waiting = deque()
+
+    @staticmethod
+    def limits():
+        return (
+            int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024))),
+            int(os.getenv("MAX_IMAGE_PIXELS", str(16_000_000))),
+        )
+
+    @staticmethod
+    def budget():
+        return int(os.getenv("DECODE_MEMORY_BUDGET", str(256 * 1024 * 1024)))
+
+    @staticmethod
+    def read_size(image_data):
+        """Width and height from the image header, nothing is decoded."""
+        try:
+            with warnings.catch_warnings():
+                # Size limits are enforced here, not by Pillow.
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                with Image.open(io.BytesIO(image_data)) as image:
+                    return image.size
+        except Image.DecompressionBombError as e:
+            error_msg = f"Image is too large to decode: {e}"
+            raise ValueError(error_msg) from None
+        except Exception:
+            error_msg = "Failed to decode image data"
+            raise ValueError(error_msg) from None
+
+    @classmethod
+    def plan(cls, image_data):
+        """Check the limits and pick the scale the image is decoded at.
+
+        :param image_data: Encoded image bytes.
+        :return: A DecodePlan with the reduction and the decoded size.
+        :raises ValueError: If the image is over MAX_IMAGE_BYTES or its
+            header cannot be read.
+        """
+        max_bytes, max_pixels = cls.limits()
+        if len(image_data) > max_bytes:
+            error_msg = f"Image of {len(image_data)} bytes is over the limit of {max_bytes}"
+            raise ValueError(error_msg)
+
+        width, height = cls.read_size(image_data)
+
+        reduction = next(
+            (
+                factor for factor in REDUCED_FLAGS
+                if math.ceil(width / factor) * math.ceil(height / factor) <= max_pixels
+            ),
+            max(REDUCED_FLAGS),
+        )
+
+        # Only JPEGs are decoded at the reduced size, other formats are
+        # decoded in full and shrunk afterwards.
+        is_jpeg = bytes(image_data[:2]) == b"\xff\xd8"
+        scale = reduction if is_jpeg else 1
+        nbytes = math.ceil(width / scale) * math.ceil(height / scale) * 3
+
+        return DecodePlan(width=width, height=height, reduction=reduction, nbytes=nbytes)
+
+    @classmethod
+    def decode(cls, image_data, plan):
+        """Decode the image at the planned scale, within MAX_IMAGE_PIXELS."""
+        # np.frombuffer wraps the request bytes without copying them.
+        image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), REDUCED_FLAGS[plan.reduction])
+        if image is None:
+            error_msg = "Failed to decode image data"
+            raise ValueError(error_msg)
+
+        if plan.reduction > 1:
+            logger.info(
+                "Decoded a %dx%d image at 1/%d scale", plan.width, plan.height, plan.reduction,
+                extra=RATE_LIMITED,
+            )
+
+        _, max_pixels = cls.limits()
+        height, width = image.shape[:2]
+        if height * width > max_pixels:
+            # Still too large at 1/8, e.g. a very long panorama.
+            scale = math.sqrt(max_pixels / (height * width))
+            size = (max(int(width * scale), 1), max(int(height * scale), 1))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+        return image
+
+    @classmethod
+    def acquire(cls, nbytes, timeout=None, is_active=None):
+        """Wait until `nbytes` of decoded pixels fit in the budget.
+
+        Requests are let in first come, first served. A request larger than
+        the whole budget runs once nothing else is in flight, so it is
+        slowed down rather than rejected.
+
+        :param nbytes: Decoded bytes the request needs.
+        :param timeout: Seconds to wait at most, None waits for good.
+        :param is_active: Checked on every wake-up, the wait is given up
+            once it returns False.
+        :return: True once the bytes are held, False if the wait was given up.
+        """
+        budget = cls.budget()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+
+        with cls._condition:
+            cls._waiting.append(ticket)
+            while not (
+                cls._waiting[0] is ticket
+                and (cls._in_flight == 0 or cls._in_flight + nbytes <= budget)
+            ):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if (remaining is not None and remaining <= 0) or (is_active and not is_active()):
+                    # Let the requests behind this one move up.
+                    cls._waiting.remove(ticket)
+                    cls._condition.notify_all()
+                    return False
+                cls._condition.wait(remaining)
+
+            cls._waiting.popleft()
+            cls._in_flight += nbytes
+            # The next request in line may fit as well.
+            cls._condition.notify_all()
+            return True
+
+    @classmethod
+    def wake(cls):
+        """Make waiting requests check again whether their call is still active."""
+        with cls._condition:
+            cls._condition.notify_all()
+
+    @classmethod
+    def release(cls, nbytes):
+        with cls._condition:
+            cls._in_flight -= nbytes
+            cls._condition.notify_all()
+
+    @classmethod
+    def in_flight(cls):
+        with cls._condition:
+            return cls._in_flight
@@ -1,11 +1,17 @@
-import io
+import json
 import os
+import threading
 
-from PIL import Image
+import torch
 from ultralytics import YOLO
 
 from mlcore.grpc_core.protos.predict import predict_pb2
-from mlcore.logger import logger
+from mlcore.grpc_core.servers.handlers.intake import ImageIntake
+from mlcore.grpc_core.servers.handlers.quantization import Int8Layers
+from mlcore.logger import RATE_LIMITED, logger
+
+# Written by mlcore/tools/quantize.py next to the weights it evaluated.
+QUANTIZATION_MANIFEST = "quantization.json"
 
 
 class PredictHandler:
@@ -15,20 +21,59 @@ class PredictHandler:
     """
 
     _models = {}  # Dictionary to store loaded models for each plant type.
+    _owned = set()  # Plant types assigned to this node, never evicted.
+    _models_lock = threading.Lock()
 
     @classmethod
     def get_or_create_model(cls, plant_type):
-        if plant_type not in cls._models:
-            path = cls.get_model_path(plant_type)
-            cls._models[plant_type] = YOLO(path)
-            logger.info(f"Model loaded successfully for plant type: {plant_type}")
+        with cls._models_lock:
+            model = cls._models.get(plant_type)
+            if model is not None:
+                if plant_type not in cls._owned:
+                    # Reinserting keeps the dict ordered from least recently used.
+                    cls._models[plant_type] = cls._models.pop(plant_type)
+                return model
+
+        path = cls.get_model_path(plant_type)
+        model = YOLO(path)
+        Int8Layers.load(model)
+        logger.info(f"Model loaded successfully for plant type: {plant_type}")
+
+        with cls._models_lock:
+            cls._models[plant_type] = model
+            cls._evict_foreign()
+
+        return model
 
-        return cls._models[plant_type]
+    @classmethod
+    def _evict_foreign(cls):
+        # Models of unassigned plants are only needed while an owner is down,
+        # keep the FOREIGN_MODEL_CACHE most recently used ones.
+        limit = max(0, int(os.getenv("FOREIGN_MODEL_CACHE", "1")))
+        foreign = [plant_type for plant_type in cls._models if plant_type not in cls._owned]
+
+        for plant_type in foreign[:max(0, len(foreign) - limit)]:
+            del cls._models[plant_type]
+            logger.info("Evicted model for plant type %s not assigned to this node", plant_type)
+
+    @classmethod
+    def preload(cls, plant_types):
+        # Load the models this node is responsible for before serving traffic.
+        cls._owned.update(plant_types)
+        for plant_type in plant_types:
+            try:
+                cls.get_or_create_model(plant_type)
+            except Exception as e:
+                # A missing model is loaded lazily again on the first request.
+                logger.error(f"Failed to preload model for plant type {plant_type}: {e}")
 
     @staticmethod
-    def bytes_to_image(image_data):
-        logger.debug("Converting raw image data to PIL Image")
-        return Image.open(io.BytesIO(image_data))
+    def bytes_to_image(image_data, plan=None):
+        logger.debug("Decoding raw image data")
+
+        # Oversized images are decoded downscaled, within MAX_IMAGE_PIXELS.
+        plan = plan or ImageIntake.plan(image_data)
+        return ImageIntake.decode(image_data, plan)
 
     @staticmethod
     def get_model_path(plant_type):
@@ -53,10 +98,38 @@ class PredictHandler:
         }
 
         model_path = os.path.join(BASE_MODEL_PATH, model_paths[plant_type])
-        logger.debug(f"Resolved model path for plant type {plant_type}: {model_path}")
+        model_path = PredictHandler.resolve_variant(
+            model_path, os.getenv("MODEL_PRECISION", "fp32"),
+        )
+        logger.debug("Resolved model path for plant type %s: %s", plant_type, model_path)
 
         return model_path
 
+    @staticmethod
+    def resolve_variant(model_path, precision):
+        # Serve a quantized variant only if it passed the accuracy gate.
+        if precision == "fp32":
+            return model_path
+
+        manifest_path = os.path.join(os.path.dirname(model_path), QUANTIZATION_MANIFEST)
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                entry = json.load(f).get(os.path.basename(model_path), {})
+        except (OSError, ValueError):
+            entry = {}
+
+        variant = os.path.join(os.path.dirname(model_path), entry.get("variant", ""))
+        if entry.get("precision") != precision or not entry.get("accepted"):
+            logger.warning(
+                f"No accepted {precision} variant of {model_path}, serving fp32",
+            )
+            return model_path
+        if not os.path.isfile(variant):
+            logger.warning(f"Quantized variant {variant} is missing, serving fp32")
+            return model_path
+
+        return variant
+
     @staticmethod
     def convert_to_class_probabilities(model_result):
         logger.debug("Converting model results to protobuf message")
@@ -80,21 +153,61 @@ class PredictHandler:
         logger.debug("Running model on the image")
         model_result = model.predict(image, verbose=False)
 
+        result = PredictHandler._format_result(model, model_result[0])
+
+        logger.debug("Model prediction completed successfully")
+
+        return result
+
+    @staticmethod
+    def run_model_batch(model, batch):
+        # The batch is the preprocessed float32 BCHW classifier input.
+        # model.predict would take it for an image tensor, dividing it by 255
+        # when values exceed 1 and rejecting sizes off the stride, so the
+        # network is called directly.
+        if batch.ndim != 4 or batch.shape[1] != 3:
+            error_msg = f"Expected a (B, 3, H, W) batch, got shape {batch.shape}"
+            raise ValueError(error_msg)
+
+        logger.debug("Running model on a batch of %d images", len(batch))
+        network = model.model
+        if network.training:
+            network.eval()
+
+        # INT8 variants have no float parameters left, they take float32 on the CPU.
+        parameter = next(network.parameters(), None)
+        device, dtype = "cpu", torch.float32
+        if parameter is not None:
+            device, dtype = parameter.device, parameter.dtype
+        with torch.inference_mode():
+            output = network(torch.from_numpy(batch).to(device, dtype))
+
+        # Outside of export mode the classify head returns (probabilities, logits).
+        probabilities = output[0] if isinstance(output, (list, tuple)) else output
+        results = [
+            PredictHandler._format_probabilities(model, row)
+            for row in probabilities.float().cpu()
+        ]
+
+        logger.debug("Batch prediction completed successfully")
+
+        return results
+
+    @staticmethod
+    def _format_result(model, model_result):
         # If no probabilities are found, return an empty list.
-        if model_result[0].probs is None:
-            logger.warning("No probabilities found in model result")
+        if model_result.probs is None:
+            logger.warning("No probabilities found in model result", extra=RATE_LIMITED)
             return []
 
-        # Extract probabilities and class names from the model result.
-        probs = model_result[0].probs.data
+        return PredictHandler._format_probabilities(model, model_result.probs.data)
+
+    @staticmethod
+    def _format_probabilities(model, probs):
         class_names = model.names
 
         # Format the results into a list of dictionaries.
-        result = [
+        return [
             {"class_name": class_names[i], "probability": float(probs[i])}
             for i in range(len(probs))
         ]
-
-        logger.debug("Model prediction completed successfully")
-
-        return result
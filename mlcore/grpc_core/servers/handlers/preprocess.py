@@ -0,0 +1,127 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+
+from mlcore.logger import logger
+
+
+class Preprocessor:
+    """Preprocessor class turns decoded images into classifier input tensors.
+
+    It reproduces ultralytics' classify transforms (resize of the shorter
+    side, center crop, RGB, scale to 0-1, normalize, CHW) for a whole batch
+    in one vectorized pass, in its own thread pool so the next batch is
+    prepared while the model runs on the current one.
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    # Two output tensors per server thread, one being filled while the
+    # model reads the other.
+    _buffers = threading.local()
+
+    @classmethod
+    def get_executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("PREPROCESS_WORKERS", "2")),
+                    thread_name_prefix="preprocess",
+                )
+            return cls._executor
+
+    @classmethod
+    def get_buffers(cls, batch_size, size):
+        shape = (batch_size, 3, size, size)
+
+        buffers = getattr(cls._buffers, "tensors", None)
+        if buffers is None or buffers[0].shape[1:] != shape[1:] or len(buffers[0]) < batch_size:
+            buffers = [np.empty(shape, dtype=np.float32) for _ in range(2)]
+            cls._buffers.tensors = buffers
+            logger.debug("Allocated preprocessing buffers of shape %s", shape)
+
+        return [buffer[:batch_size] for buffer in buffers]
+
+    @staticmethod
+    def input_spec(model):
+        """Input size, mean and std the classifier was trained with."""
+        size = 224
+        mean, std = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+
+        args = getattr(model.model, "args", None) or {}
+        imgsz = args.get("imgsz", size) if isinstance(args, dict) else size
+        size = int(max(imgsz) if isinstance(imgsz, (list, tuple)) else imgsz)
+
+        for transform in getattr(getattr(model.model, "transforms", None), "transforms", ()):
+            if hasattr(transform, "mean") and hasattr(transform, "std"):
+                mean = tuple(float(v) for v in torch.as_tensor(transform.mean).flatten())
+                std = tuple(float(v) for v in torch.as_tensor(transform.std).flatten())
+
+        return size, mean, std
+
+    @staticmethod
+    def resize_and_crop(image, size):
+        """Resize the shorter side to `size` and cut the center square."""
+        height, width = image.shape[:2]
+
+        if (height, width) != (size, size):
+            # Same rounding as torchvision's Resize with an int size.
+            if height <= width:
+                new_height, new_width = size, int(size * width / height)
+            else:
+                new_height, new_width = int(size * height / width), size
+
+            interpolation = cv2.INTER_AREA if new_height < height else cv2.INTER_LINEAR
+            image = cv2.resize(image, (new_width, new_height), interpolation=interpolation)
+
+            top = int(round((new_height - size) / 2.0))
+            left = int(round((new_width - size) / 2.0))
+            image = image[top:top + size, left:left + size]
+
+        return image
+
+    @staticmethod
+    def _to_float(images, out):
+        # BGR -> RGB and HWC -> CHW are views, the only pass over the pixels
+        # is the conversion to float.
+        np.divide(images[..., ::-1].transpose(0, 3, 1, 2), np.float32(255), out=out, dtype=np.float32)
+
+    @classmethod
+    def preprocess(cls, images, size, mean=(0.0, 0.0, 0.0), std=(1.0, 1.0, 1.0), out=None):
+        """Build a normalized float32 BCHW batch from BGR uint8 images.
+
+        Args:
+            images: A (B, H, W, 3) uint8 array, or a list of BGR images of any size.
+            size (int): Side of the square model input.
+            mean (tuple): Per-channel RGB mean subtracted after scaling to 0-1.
+            std (tuple): Per-channel RGB std the result is divided by.
+            out (np.ndarray): Optional (B, 3, size, size) float32 array to fill.
+
+        Returns:
+            np.ndarray: The (B, 3, size, size) float32 batch.
+        """
+        if out is None:
+            out = np.empty((len(images), 3, size, size), dtype=np.float32)
+
+        if isinstance(images, np.ndarray) and images.shape[1:3] == (size, size):
+            cls._to_float(images, out)
+        else:
+            # Each image is converted into its slot, the uint8 images are
+            # never stacked into a batch of their own.
+            for image, slot in zip(images, out):
+                cls._to_float(cls.resize_and_crop(image, size)[None], slot[None])
+
+        if any(mean) or any(v != 1.0 for v in std):
+            out -= np.asarray(mean, dtype=np.float32).reshape(1, 3, 1, 1)
+            out /= np.asarray(std, dtype=np.float32).reshape(1, 3, 1, 1)
+
+        return out
+
+    @classmethod
+    def submit(cls, images, size, mean=(0.0, 0.0, 0.0), std=(1.0, 1.0, 1.0), out=None) -> Future:
+        return cls.get_executor().submit(cls.preprocess, images, size, mean, std, out)
@@ -0,0 +1,82 @@
+import torch
+from torch.ao import quantization
+from torch.ao.nn import quantized
+from ultralytics.nn.modules import DFL
+
+from mlcore.logger import logger
+
+# Checkpoint key of the INT8 weights, next to the fused FP32 network in "model".
+INT8_STATE = "int8_state_dict"
+
+
+class Int8Layers:
+    """Int8Layers class swaps the layers of a YOLO network for INT8 ones.
+
+    Every convolution becomes a quantize -> INT8 conv -> dequantize sequence
+    with activation ranges calibrated by mlcore/tools/quantize.py, Linear
+    layers are quantized dynamically. Quantized modules can't be unpickled
+    by ultralytics, so variants store the fused FP32 network and the INT8
+    state dict, and `load` rebuilds the layers after YOLO() read the file.
+
+    The bot keeps an identical copy of this class for the leaf detector.
+    """
+
+    @staticmethod
+    def convolutions(network):
+        """Yield (parent, name, conv) of every convolution worth quantizing."""
+        for parent in list(network.modules()):
+            # The DFL conv holds fixed bin indices, rounding them skews boxes.
+            if isinstance(parent, DFL):
+                continue
+            for name, child in list(parent.named_children()):
+                if type(child) is torch.nn.Conv2d:
+                    yield parent, name, child
+
+    @classmethod
+    def prepare(cls, network):
+        """Wrap the convolutions with observers, in place, for calibration.
+
+        :param network: A fused FP32 YOLO network.
+        :return: The number of wrapped convolutions.
+        """
+        qconfig = quantization.get_default_qconfig(torch.backends.quantized.engine)
+
+        layers = 0
+        for parent, name, conv in list(cls.convolutions(network)):
+            layer = torch.nn.Sequential(quantization.QuantStub(), conv, quantization.DeQuantStub())
+            layer.qconfig = qconfig
+            setattr(parent, name, layer)
+            layers += 1
+
+        quantization.prepare(network, inplace=True)
+        return layers
+
+    @staticmethod
+    def convert(network):
+        """Turn a calibrated network into its INT8 version, in place."""
+        quantization.convert(network, inplace=True)
+        quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    @classmethod
+    def load(cls, model):
+        """Rebuild the INT8 layers of a variant loaded with YOLO(), if it is one."""
+        state = (model.ckpt or {}).get(INT8_STATE)
+        if state is None:
+            return
+
+        network = model.model
+        for parent, name, conv in list(cls.convolutions(network)):
+            setattr(parent, name, torch.nn.Sequential(
+                quantized.Quantize(1.0, 0, torch.quint8),
+                quantized.Conv2d(
+                    conv.in_channels, conv.out_channels, conv.kernel_size,
+                    stride=conv.stride, padding=conv.padding, dilation=conv.dilation,
+                    groups=conv.groups, bias=conv.bias is not None,
+                ),
+                quantized.DeQuantize(),
+            ))
+        quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+        # Scales, zero points and packed weights all come from the state dict.
+        network.load_state_dict(state)
+        logger.debug("Rebuilt INT8 layers of %s", type(network).__name__)
@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing import resource_tracker, shared_memory
+
+from mlcore.logger import logger
+
+# The bot stamps the 8 bytes before the first image with the slot's generation.
+GENERATION_BYTES = 8
+
+
+class SharedMemoryReader:
+    """SharedMemoryReader class resolves images a co-located bot left in shared memory.
+
+    The bot writes the crops into its shared-memory ring and sends only
+    offsets and lengths. Segments are attached once and kept open, images are
+    returned as memoryviews into the segment, so nothing is copied before
+    decoding. The bot can release and reuse the space of a call it gave up
+    on, `is_current` tells whether the images read were still that call's.
+    """
+
+    _segments = OrderedDict()
+    _lock = threading.Lock()
+
+    # Segments of restarted bot processes are dropped after this many.
+    MAX_SEGMENTS = 16
+
+    @classmethod
+    def attach(cls, name):
+        prefix = os.getenv("SHM_ALLOWED_PREFIX", "leafcare-")
+        if not name.startswith(prefix):
+            error_msg = f"Shared memory segment {name!r} is not allowed"
+            raise ValueError(error_msg)
+
+        with cls._lock:
+            segment = cls._segments.get(name)
+            if segment is not None:
+                cls._segments.move_to_end(name)
+                return segment
+
+            segment = shared_memory.SharedMemory(name=name)
+            # The bot owns the segment, this process must not unlink it on exit.
+            resource_tracker.unregister(segment._name, "shared_memory")
+            cls._segments[name] = segment
+            logger.info(f"Attached shared memory segment {name} of {segment.size} bytes")
+
+            while len(cls._segments) > cls.MAX_SEGMENTS:
+                _, stale = cls._segments.popitem(last=False)
+                try:
+                    stale.close()
+                except BufferError:
+                    # Still read by another request, unmapped when collected.
+                    pass
+
+            return segment
+
+    @classmethod
+    def images(cls, request):
+        """Return the image buffers of the request, inline or in shared memory."""
+        if not request.shm_name:
+            return list(request.image_data)
+
+        segment = cls.attach(request.shm_name)
+
+        images = []
+        for ref in request.image_refs:
+            if ref.offset + ref.length > segment.size:
+                error_msg = f"Image at {ref.offset}+{ref.length} is outside {request.shm_name}"
+                raise ValueError(error_msg)
+            images.append(segment.buf[ref.offset:ref.offset + ref.length])
+
+        return images
+
+    @classmethod
+    def is_current(cls, request):
+        """Whether the bot still holds the ring slot of the request's images."""
+        if not request.shm_name or not request.shm_generation or not request.image_refs:
+            return True
+
+        segment = cls.attach(request.shm_name)
+        start = request.image_refs[0].offset - GENERATION_BYTES
+        if start < 0:
+            return False
+
+        generation = int.from_bytes(segment.buf[start:start + GENERATION_BYTES], "little")
+        return generation == request.shm_generation
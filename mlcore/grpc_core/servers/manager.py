@@ -3,8 +3,10 @@ from concurrent import futures
 
 import grpc
 
-from mlcore.grpc_core.protos.predict import predict_pb2_grpc
+from mlcore.grpc_core.protos.predict import predict_pb2, predict_pb2_grpc
+from mlcore.grpc_core.servers.handlers.predict import PredictHandler
 from mlcore.grpc_core.servers.services.predict import PredictService
+from mlcore.grpc_core.servers.sharding import assigned_plants
 from mlcore.logger import logger
 
 
@@ -25,6 +27,12 @@ class Server:
         # Bind the server to the specified address.
         self.server.add_insecure_port(self.server_address)
 
+        # A co-located bot can also connect on "unix:/path/to.sock".
+        self.unix_socket = os.getenv("GRPC_UNIX_SOCKET", "")
+        if self.unix_socket:
+            self.server.add_insecure_port(self.unix_socket)
+            logger.info(f"gRPC server bound to {self.unix_socket}")
+
         logger.info(f"gRPC server initialized and bound to {self.server_address}")
 
     def register(self) -> None:
@@ -33,8 +41,19 @@ class Server:
 
         logger.info("PredictService registered with the gRPC server")
 
+    def preload(self) -> None:
+        # Load only the plant models assigned to this node, others are
+        # loaded on demand when a neighbour fails over to this node and
+        # evicted again beyond FOREIGN_MODEL_CACHE.
+        plants = assigned_plants()
+        PredictHandler.preload(plants)
+
+        names = ", ".join(predict_pb2.Plant.Name(plant) for plant in plants)
+        logger.info(f"Preloaded models for: {names}")
+
     def run(self) -> None:
-        # Register services before starting the server.
+        # Load the assigned models and register services before starting the server.
+        self.preload()
         self.register()
 
         # Start the server.
@@ -1,8 +1,15 @@
+import os
+from concurrent import futures
+
 import grpc
 
 from mlcore.grpc_core.protos.predict import predict_pb2, predict_pb2_grpc
+from mlcore.grpc_core.servers.handlers.intake import ImageIntake
 from mlcore.grpc_core.servers.handlers.predict import PredictHandler
-from mlcore.logger import logger
+from mlcore.grpc_core.servers.handlers.preprocess import Preprocessor
+from mlcore.grpc_core.servers.handlers.shm import SharedMemoryReader
+from mlcore.logger import RATE_LIMITED, logger
+from mlcore.tracing import tracer
 
 
 class PredictService(predict_pb2_grpc.PredictorServicer):
@@ -14,48 +21,148 @@ class PredictService(predict_pb2_grpc.PredictorServicer):
     def Predict(self, request, context):
         """Handles the Predict RPC call.
 
-        It processes the request, runs the model, and returns the prediction results.
+        It decodes the images, runs the model on them in chunks whose input
+        tensors are prepared ahead by the Preprocessor, and returns the
+        prediction results.
 
         :param request: The gRPC request containing image data and plant type.
         :param context: The gRPC context for handling errors and metadata.
         :return: A PredictorReply message containing the prediction results.
         """
+        # Continue the bot's trace, if the request carries one.
+        remote_parent = tracer.extract(context.invocation_metadata())
+
+        with tracer.span("mlcore.predict", remote_parent=remote_parent, plant=request.plant):
+            return self._predict(request, context)
+
+    def _predict(self, request, context):
         plant_type = request.plant
 
+        if plant_type not in PredictHandler._owned:
+            # Requests for unassigned plants arrive when an owner is down.
+            logger.warning(
+                "Serving plant type %s not preloaded on this node", plant_type, extra=RATE_LIMITED,
+            )
+
         try:
-            model = PredictHandler.get_or_create_model(plant_type)
-            logger.info(f"Model loaded successfully for plant type: {plant_type}")
+            with tracer.span("model.load"):
+                model = PredictHandler.get_or_create_model(plant_type)
+            logger.debug("Model ready for plant type %s", plant_type)
         except ValueError as e:
             # Log the error and set gRPC status code and details.
-            logger.error(f"Invalid plant type: {e}")
+            logger.error("Invalid plant type: %s", e)
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
             context.set_details(f"Invalid plant type: {e}")
 
             return predict_pb2.PredictorReply(result=[])
 
-        results = []
-        for idx, image_data in enumerate(request.image_data):
-            try:
-                # Convert raw image data to a PIL Image.
-                image = PredictHandler.bytes_to_image(image_data)
-
-                # Run the model on the image.
-                model_result = PredictHandler.run_model(model, image)
-
-                # Convert the model results to a protobuf message.
-                image_results = PredictHandler.convert_to_class_probabilities(
-                    model_result,
-                )
-
-                results.append(image_results)
+        try:
+            # Co-located clients leave the images in shared memory.
+            images_data = SharedMemoryReader.images(request)
+        except Exception as e:
+            return self._fail(context, "Error reading shared memory", e)
+
+        # Sizes come from the headers, nothing is decoded yet.
+        plans = [self._plan(image_data) for image_data in images_data]
+
+        # Requests wait here while the decoded pixels in flight are over budget,
+        # at most until the call is cancelled or its deadline passes.
+        nbytes = sum(plan.nbytes for plan in plans if plan is not None)
+        context.add_callback(ImageIntake.wake)
+        with tracer.span("intake.wait", bytes=nbytes):
+            admitted = ImageIntake.acquire(
+                nbytes, timeout=context.time_remaining(), is_active=context.is_active,
+            )
+        if not admitted:
+            logger.info("Request given up while waiting for decode memory", extra=RATE_LIMITED)
+            context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+            context.set_details("Timed out waiting for decode memory")
+            return predict_pb2.PredictorReply(result=[])
 
-                logger.info(f"Successfully processed image {idx + 1}")
+        try:
+            return self._classify(model, request, images_data, plans, context)
+        finally:
+            ImageIntake.release(nbytes)
+
+    def _classify(self, model, request, images_data, plans, context):
+        images = []
+        with tracer.span("decode", images=len(images_data)):
+            for idx, (image_data, plan) in enumerate(zip(images_data, plans)):
+                try:
+                    # The Preprocessor reads each decoded image straight into
+                    # its slot of the input tensor.
+                    images.append(PredictHandler.bytes_to_image(image_data, plan=plan))
+                except Exception as e:
+                    return self._fail(context, f"Error processing image {idx + 1}", e)
+
+        # The images are decoded, shared memory is not read past this point.
+        if not SharedMemoryReader.is_current(request):
+            logger.warning("Shared memory of a cancelled request was reused", extra=RATE_LIMITED)
+            context.set_code(grpc.StatusCode.ABORTED)
+            context.set_details("Shared memory images were released before they were read")
+            return predict_pb2.PredictorReply(result=[])
 
-            except Exception as e:
-                logger.error(f"Error processing image {idx + 1}: {e}")
-                context.set_code(grpc.StatusCode.INTERNAL)
-                context.set_details(f"Error processing image: {e}")
+        results = []
+        chunk_size = int(os.getenv("PREDICT_BATCH_SIZE", "8"))
+        chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
 
-                return predict_pb2.PredictorReply(result=[])
+        pending = None
+        try:
+            size, mean, std = Preprocessor.input_spec(model)
+            buffers = Preprocessor.get_buffers(chunk_size, size)
+
+            if chunks:
+                pending = Preprocessor.submit(chunks[0], size, mean, std, out=buffers[0][:len(chunks[0])])
+
+            for i in range(len(chunks)):
+                # Only the part of preprocessing not hidden behind the model shows up.
+                with tracer.span("preprocess.wait"):
+                    tensor = pending.result()
+
+                # The bot cancels calls it no longer needs, e.g. after an early exit.
+                if not context.is_active():
+                    logger.info("Request cancelled after %d images", len(results))
+                    return predict_pb2.PredictorReply(result=results)
+
+                # Prepare the next chunk while the model runs on this one.
+                pending = None
+                if i + 1 < len(chunks):
+                    pending = Preprocessor.submit(
+                        chunks[i + 1], size, mean, std,
+                        out=buffers[(i + 1) % 2][:len(chunks[i + 1])],
+                    )
+
+                with tracer.span("inference", images=len(tensor)):
+                    model_results = PredictHandler.run_model_batch(model, tensor)
+
+                for model_result in model_results:
+                    # Convert the model results to a protobuf message.
+                    results.append(PredictHandler.convert_to_class_probabilities(model_result))
+
+            logger.info(
+                "Successfully processed %d of %d images", len(results), len(images), extra=RATE_LIMITED,
+            )
+        except Exception as e:
+            # A job already running can't be cancelled and still writes into
+            # this thread's buffers, the next request must not get them early.
+            if pending is not None and not pending.cancel():
+                futures.wait([pending])
+            return self._fail(context, "Error processing images", e)
 
         return predict_pb2.PredictorReply(result=results)
+
+    @staticmethod
+    def _plan(image_data):
+        try:
+            return ImageIntake.plan(image_data)
+        except ValueError:
+            # Reported with the image's index when it is decoded.
+            return None
+
+    @staticmethod
+    def _fail(context, message, error):
+        logger.error("%s: %s", message, error)
+        context.set_code(grpc.StatusCode.INTERNAL)
+        context.set_details(f"Error processing image: {error}")
+
+        return predict_pb2.PredictorReply(result=[])
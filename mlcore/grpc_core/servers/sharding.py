@@ -0,0 +1,78 @@
+import bisect
+import hashlib
+import os
+
+from mlcore.grpc_core.protos.predict import predict_pb2
+from mlcore.logger import logger
+
+
+class HashRing:
+    """HashRing class assigns plant types to mlcore nodes by consistent hashing.
+
+    Every node is placed on the ring several times (virtual nodes), a key is
+    owned by the first `replication` distinct nodes found clockwise from its
+    hash. Adding or removing a node only moves the keys next to it.
+
+    The bot keeps an identical copy of this class, both sides must agree on
+    the node list to route a plant type to the replicas that preloaded it.
+    """
+
+    def __init__(self, nodes: list[str], replication: int = 2, vnodes: int = 64) -> None:
+        self.nodes = list(dict.fromkeys(nodes))
+        self.replication = max(1, min(replication, len(self.nodes)))
+
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Python's hash() is salted per process, the ring must be stable.
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def owners(self, key: str) -> list[str]:
+        """Return the nodes responsible for the key, preferred node first."""
+        if not self._ring:
+            return []
+
+        owners = []
+        start = bisect.bisect(self._hashes, self._hash(key))
+
+        for i in range(len(self._ring)):
+            node = self._ring[(start + i) % len(self._ring)][1]
+            if node not in owners:
+                owners.append(node)
+                if len(owners) == self.replication:
+                    break
+
+        return owners
+
+
+def plant_key(plant_type) -> str:
+    return predict_pb2.Plant.Name(plant_type)
+
+
+def assigned_plants() -> list[int]:
+    """Plant types this node should preload.
+
+    Configured with MLCORE_NODES (comma separated node ids, the same list the
+    bot uses), MLCORE_NODE_ID and SHARD_REPLICATION. Without MLCORE_NODES the
+    node is not sharded and every plant type is assigned to it.
+    """
+    plants = list(predict_pb2.Plant.values())
+
+    nodes = [node.strip() for node in os.getenv("MLCORE_NODES", "").split(",") if node.strip()]
+    if not nodes:
+        return plants
+
+    node_id = os.getenv("MLCORE_NODE_ID", "")
+    if node_id not in nodes:
+        logger.warning(f"Node {node_id!r} is not in MLCORE_NODES, serving every plant type")
+        return plants
+
+    ring = HashRing(nodes, replication=int(os.getenv("SHARD_REPLICATION", "2")))
+
+    return [plant for plant in plants if node_id in ring.owners(plant_key(plant))]
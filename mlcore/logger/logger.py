@@ -1,10 +1,128 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" for people, "json" for log collectors.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Records logged with `extra=RATE_LIMITED` pass at most this many times per
+# second from each call site, 0 lets everything through.
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "5"))
+# Records waiting for the writer thread, newer ones are dropped beyond that.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()],
-)
+RATE_LIMITED = {"rate_limited": True}
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} [{suppressed} similar suppressed]" if suppressed else line
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Limits rate-limited records to `rate` per second for each call site.
+
+    Every call site gets a token bucket. The first record let through after
+    a burst carries the number of records dropped in between.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = max(rate, 1.0)
+        self._buckets: dict[tuple[str, int], tuple[float, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rate or not getattr(record, "rate_limited", False):
+            return True
+
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.burst, record.created, 0))
+            tokens = min(self.burst, tokens + (record.created - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, record.created, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, record.created, 0)
+
+        record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread as they are.
+
+    The stock handler formats every record in the calling thread so it can
+    be pickled, records never leave the process here, so formatting and
+    writing both happen on the writer thread. Only records carrying a
+    traceback are rendered here, a queued traceback would keep the frames
+    of the failed request and everything they reference alive.
+    """
+
+    _formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+            record.msg = record.getMessage()
+            record.args = None
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Losing a line beats blocking a request on a slow stderr.
+            pass
+
+
+def _create_listener(handler: _QueueHandler) -> logging.handlers.QueueListener:
+    handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    listener = logging.handlers.QueueListener(handler.queue, stream)
+    listener.start()
+    return listener
+
+
+_handler = _QueueHandler(None)
+_listener = _create_listener(_handler)
+atexit.register(_listener.stop)
+
+logging.basicConfig(level=LOG_LEVEL, handlers=[_handler])
 
 logger = logging.getLogger(__name__)
+logger.addFilter(RateLimitFilter(LOG_RATE_LIMIT))
@@ -0,0 +1,269 @@
+"""Produce INT8 variants of YOLO weights and gate them on accuracy.
+
+Every weights file is quantized with PyTorch post-training static
+quantization: convolutions run in INT8 with activation ranges calibrated on
+the first images of the evaluation folder, Linear layers are quantized
+dynamically. Both variants are run over the folder and the result is
+recorded in the `quantization.json` manifest next to the weights. The variant
+is written and marked as accepted only when it agrees with FP32 often enough,
+the services refuse to serve anything else.
+
+The folder is either an image-folder layout (`<class_name>/<image>`), which
+also gives top-1 accuracy for classifiers, or a flat folder of images.
+
+Usage:
+    python -m mlcore.tools.quantize mlcore/models/tomato_cls_model.pt --data data/tomato
+    python -m mlcore.tools.quantize bot/models/leaf_detect.pt --data data/leaves
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mlcore.grpc_core.servers.handlers.predict import QUANTIZATION_MANIFEST
+from mlcore.grpc_core.servers.handlers.quantization import INT8_STATE, Int8Layers
+from mlcore.logger import logger
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+PRECISION = "int8"
+
+
+def quantize(
+    model: YOLO, images: list[np.ndarray],
+) -> tuple[torch.nn.Module, torch.nn.Module, int]:
+    """Quantize the network to INT8, calibrated on the images.
+
+    The images go through the FP32 model's predictor preprocessing, so the
+    observed activation ranges are the ones seen when serving.
+
+    Returns:
+        tuple: The fused FP32 network, the quantized network and the number
+        of quantized layers.
+
+    """
+    fused = copy.deepcopy(model.model).float().eval().fuse()
+    network = copy.deepcopy(fused)
+    Int8Layers.prepare(network)
+
+    if model.predictor is None:
+        model.predict(images[0], verbose=False)
+    with torch.inference_mode():
+        for image in images:
+            network(model.predictor.preprocess([image]))
+
+    Int8Layers.convert(network)
+    layers = sum(
+        1 for module in network.modules()
+        if isinstance(module, (torch.ao.nn.quantized.Conv2d, torch.ao.nn.quantized.dynamic.Linear))
+    )
+    return fused, network, layers
+
+
+def load_dataset(folder: Path, limit: int) -> list[tuple[Path, str | None]]:
+    """List images of the folder with their class name, if any."""
+    samples = []
+    for path in sorted(folder.rglob("*")):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        label = path.parent.name if path.parent != folder else None
+        samples.append((path, label))
+
+    return samples[:limit] if limit else samples
+
+
+def box_agreement(reference: np.ndarray, candidate: np.ndarray, iou: float = 0.5) -> float:
+    """F1 score of candidate boxes matched to reference boxes by IoU."""
+    if not len(reference) and not len(candidate):
+        return 1.0
+    if not len(reference) or not len(candidate):
+        return 0.0
+
+    x1 = np.maximum(reference[:, None, 0], candidate[None, :, 0])
+    y1 = np.maximum(reference[:, None, 1], candidate[None, :, 1])
+    x2 = np.minimum(reference[:, None, 2], candidate[None, :, 2])
+    y2 = np.minimum(reference[:, None, 3], candidate[None, :, 3])
+    intersection = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+
+    def area(boxes):
+        return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    union = area(reference)[:, None] + area(candidate)[None, :] - intersection
+    overlaps = intersection / np.maximum(union, 1e-9)
+
+    matched = 0
+    for row in overlaps:
+        best = int(row.argmax())
+        if row[best] >= iou:
+            matched += 1
+            overlaps[:, best] = 0
+
+    return 2 * matched / (len(reference) + len(candidate))
+
+
+def run(model: YOLO, images: list[np.ndarray]) -> tuple[list, float]:
+    """Predict every image and return the outputs and mean latency in ms."""
+    model.predict(images[0], verbose=False)  # Warm up.
+
+    outputs, elapsed = [], 0.0
+    for image in images:
+        start = time.perf_counter()
+        result = model.predict(image, verbose=False)[0]
+        elapsed += time.perf_counter() - start
+
+        if model.task == "classify":
+            outputs.append(model.names[int(result.probs.top1)])
+        else:
+            outputs.append(result.boxes.xyxy.cpu().numpy())
+
+    return outputs, elapsed / len(images) * 1000
+
+
+def evaluate(
+    task: str,
+    labels: list[str | None],
+    reference: list,
+    candidate: list,
+) -> dict:
+    """Compare the quantized outputs with FP32 and with the labels."""
+    if task == "classify":
+        agreement = float(np.mean([r == c for r, c in zip(reference, candidate)]))
+    else:
+        agreement = float(np.mean([box_agreement(r, c) for r, c in zip(reference, candidate)]))
+
+    report = {"agreement": agreement}
+
+    if task == "classify" and all(label is not None for label in labels):
+        def accuracy(outputs):
+            return float(np.mean([
+                output.strip().lower() == label.strip().lower()
+                for output, label in zip(outputs, labels)
+            ]))
+
+        report["fp32_accuracy"] = accuracy(reference)
+        report["int8_accuracy"] = accuracy(candidate)
+
+    return report
+
+
+def gate(report: dict, min_agreement: float, max_accuracy_drop: float) -> tuple[bool, str]:
+    """Decide whether the quantized variant may be served."""
+    if not report.get("quantized_layers"):
+        return False, "no layers could be quantized"
+    if report["agreement"] < min_agreement:
+        return False, f"agreement {report['agreement']:.4f} is below {min_agreement}"
+
+    if "fp32_accuracy" in report:
+        drop = report["fp32_accuracy"] - report["int8_accuracy"]
+        if drop > max_accuracy_drop:
+            return False, f"accuracy drops by {drop:.4f}, more than {max_accuracy_drop}"
+
+    return True, "accepted"
+
+
+def update_manifest(weights: Path, entry: dict) -> None:
+    manifest_path = weights.parent / QUANTIZATION_MANIFEST
+
+    manifest = {}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    manifest[weights.name] = entry
+    manifest_path.write_text(json.dumps(manifest, indent=4), encoding="utf-8")
+
+
+def process(weights: Path, samples: list, args: argparse.Namespace) -> dict:
+    logger.info(f"Quantizing {weights}")
+
+    model = YOLO(str(weights))
+    images = [cv2.imread(str(path)) for path, _ in samples]
+    reference_outputs, fp32_latency = run(model, images)
+
+    fused, quantized, layers = quantize(model, images[:max(args.calibration_images, 1)])
+
+    variant_path = weights.with_name(f"{weights.stem}.{PRECISION}{weights.suffix}")
+    candidate = YOLO(str(weights))
+    candidate.model = quantized
+    candidate_outputs, int8_latency = run(candidate, images)
+
+    report = evaluate(
+        model.task, [label for _, label in samples], reference_outputs, candidate_outputs,
+    )
+    report.update(
+        quantized_layers=layers,
+        fp32_latency_ms=round(fp32_latency, 3),
+        int8_latency_ms=round(int8_latency, 3),
+        samples=len(samples),
+    )
+
+    accepted, reason = gate(report, args.min_agreement, args.max_accuracy_drop)
+
+    if accepted:
+        ckpt = {
+            key: value for key, value in (model.ckpt or {}).items()
+            if key not in ("ema", "optimizer", "updates")
+        }
+        ckpt["model"] = fused
+        ckpt[INT8_STATE] = quantized.state_dict()
+        torch.save(ckpt, variant_path)
+    elif variant_path.exists():
+        # Never leave a stale variant that no longer passes the gate.
+        variant_path.unlink()
+
+    entry = {
+        "precision": PRECISION,
+        "variant": variant_path.name,
+        "accepted": accepted,
+        "reason": reason,
+        "min_agreement": args.min_agreement,
+        "max_accuracy_drop": args.max_accuracy_drop,
+        "calibration_images": min(max(args.calibration_images, 1), len(images)),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **report,
+    }
+    update_manifest(weights, entry)
+
+    logger.info(
+        f"{weights.name}: agreement {report['agreement']:.4f}, "
+        f"latency {fp32_latency:.1f} ms -> {int8_latency:.1f} ms, "
+        f"{'accepted' if accepted else 'rejected'} ({reason})",
+    )
+    return entry
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("weights", nargs="+", type=Path, help="YOLO .pt files to quantize")
+    parser.add_argument("--data", type=Path, required=True, help="Labelled evaluation folder")
+    parser.add_argument("--limit", type=int, default=500, help="Max images, 0 for all")
+    parser.add_argument(
+        "--calibration-images", type=int, default=100,
+        help="Images of the folder used to calibrate activation ranges",
+    )
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    samples = load_dataset(args.data, args.limit)
+    if not samples:
+        logger.error(f"No images found in {args.data}")
+        return 1
+
+    entries = [process(weights, samples, args) for weights in args.weights]
+
+    return 0 if all(entry["accepted"] for entry in entries) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import json
+import multiprocessing.util
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from mlcore.logger import RATE_LIMITED, logger
+
+SERVICE_NAME = "mlcore"
+
+
+@dataclass
+class Span:
+    """A timed stage of a trace, exported as one JSON object."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    service: str = SERVICE_NAME
+    start_ns: int = 0
+    end_ns: int = 0
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+    sampled: bool = True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+
+class _Exporter:
+    """Writes finished spans from a background thread.
+
+    "file:///path/traces.jsonl" appends JSON lines, "udp://host:port" sends
+    one datagram per span to a local collector. The sink is opened right
+    away, so a bad URL fails at startup. At most `queue_size` spans wait for
+    the thread, newer ones are dropped beyond that.
+    """
+
+    def __init__(self, url: str, queue_size: int = 10000) -> None:
+        self.url = urlparse(url)
+        self.queue_size = queue_size
+        self.dropped = 0
+
+        self._file = None
+        self._sock = None
+        if self.url.scheme == "file":
+            self._file = open(self.url.path, "a", encoding="utf-8")  # noqa: SIM115
+        elif self.url.scheme == "udp" and self.url.hostname and self.url.port:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            error_msg = f"Unsupported trace export URL: {url}"
+            raise ValueError(error_msg)
+
+        self._start()
+        # Forked workers inherit the sink but not the thread.
+        multiprocessing.util.register_after_fork(self, _Exporter._start)
+
+    def _start(self) -> None:
+        self._queue: queue.Queue = queue.Queue(self.queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Losing a span beats blocking a request on a slow sink.
+            self.dropped += 1
+
+    def _write(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str)
+        if self._file is not None:
+            self._file.write(line + "\n")
+            # Flush once the backlog is written, not after every span.
+            if self._queue.empty():
+                self._file.flush()
+        else:
+            self._sock.sendto(line.encode(), (self.url.hostname, self.url.port))
+
+    def _run(self) -> None:
+        while True:
+            span = self._queue.get()
+            try:
+                self._write(span)
+            except Exception as e:
+                # A failing sink loses spans, it must not stop the thread.
+                logger.warning("Failed to export span: %s", e, extra=RATE_LIMITED)
+
+
+class Tracer:
+    """Tracer class records request stages as spans of a distributed trace.
+
+    Requests from the bot carry a `traceparent` in their gRPC metadata, the
+    spans recorded here join that trace and follow its sampling decision.
+    When tracing is disabled or a trace is not sampled, `span` only costs a
+    context variable lookup and nothing is exported.
+    """
+
+    _current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+    def __init__(
+        self, enabled: bool, sample_rate: float, export_url: str, queue_size: int = 10000,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.export_url = export_url
+        self._exporter = _Exporter(export_url, queue_size) if enabled else None
+
+    @property
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    @staticmethod
+    def extract(metadata) -> Optional[Span]:
+        """Parse the `traceparent` of incoming gRPC metadata into a remote parent."""
+        for key, value in metadata or ():
+            if key != "traceparent":
+                continue
+
+            parts = value.split("-")
+            if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+                logger.debug(f"Ignoring malformed traceparent {value!r}")
+                return None
+
+            return Span(
+                name="remote",
+                trace_id=parts[1],
+                span_id=parts[2],
+                sampled=parts[3] == "01",
+            )
+
+        return None
+
+    @contextmanager
+    def span(
+        self, name: str, remote_parent: Optional[Span] = None, **attributes: Any,
+    ) -> Iterator[Span]:
+        """Time the block as a child of the current or remote span, or as a new trace."""
+        parent = self._current.get() or remote_parent
+
+        if not self.enabled or (parent is not None and not parent.sampled):
+            # Keep an unsampled remote parent current so nested spans skip too.
+            token = self._current.set(parent) if remote_parent is parent else None
+            try:
+                yield _NOOP_SPAN
+            finally:
+                if token is not None:
+                    self._current.reset(token)
+            return
+
+        if parent is None:
+            span = Span(
+                name=name,
+                trace_id=uuid.uuid4().hex,
+                span_id=uuid.uuid4().hex[:16],
+                sampled=random.random() < self.sample_rate,
+            )
+        else:
+            span = Span(
+                name=name,
+                trace_id=parent.trace_id,
+                span_id=uuid.uuid4().hex[:16],
+                parent_id=parent.span_id,
+            )
+
+        if span.sampled:
+            span.attributes.update(attributes)
+            span.start_ns = time.time_ns()
+
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = f"error: {type(e).__name__}"
+            raise
+        finally:
+            self._current.reset(token)
+            if span.sampled:
+                span.end_ns = time.time_ns()
+                self._exporter.export(span)
+
+
+_NOOP_SPAN = Span(name="", trace_id="0" * 32, span_id="0" * 16, sampled=False)
+
+tracer = Tracer(
+    enabled=os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes"),
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.1")),
+    export_url=os.getenv("TRACE_EXPORT_URL", "file:///tmp/leafcare-traces.jsonl"),
+    queue_size=int(os.getenv("TRACE_QUEUE_SIZE", "10000")),
+)
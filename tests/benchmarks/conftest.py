@@ -0,0 +1,146 @@
+"""Micro-benchmarks of the hot pure-Python helpers.
+
+They only run with BENCHMARK=1, timings are meaningless on a loaded CI box:
+
+    BENCHMARK=1 python -m pytest tests/benchmarks
+
+Each benchmark keeps the best per-call time of several rounds. Timings are
+compared in units of a fixed reference workload measured right before, so a
+baseline recorded on one machine holds on another and a slow moment of a
+shared box cancels out. A benchmark fails when it is more than
+BENCHMARK_THRESHOLD (0.25 by default, i.e. 25 %) slower than its entry in
+`baseline.json`, after being measured again a few times to rule out noise. The timings of the run are saved to
+BENCHMARK_OUTPUT (`results.json` next to the baseline by default), and
+BENCHMARK_UPDATE=1 writes them into the baseline instead of comparing.
+"""
+
+import json
+import os
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+# bot.settings requires a token at import time.
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+
+BENCHMARK_DIR = Path(__file__).parent
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+
+ENABLED = os.getenv("BENCHMARK") == "1"
+UPDATE = os.getenv("BENCHMARK_UPDATE") == "1"
+THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "0.25"))
+OUTPUT_PATH = Path(os.getenv("BENCHMARK_OUTPUT", BENCHMARK_DIR / "results.json"))
+
+# Rounds per benchmark and the minimum duration of one round.
+ROUNDS = 10
+ROUND_S = 0.02
+# Extra measurements of a benchmark before it counts as regressed.
+RETRIES = 3
+
+_results: dict[str, dict[str, float]] = {}
+
+
+def reference() -> int:
+    # Plain interpreter work, comparable to the helpers under test.
+    table = {f"class_{i}": i * 0.5 for i in range(50)}
+    return sum(int(value) for key, value in table.items() if key.endswith(("1", "3")))
+
+
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    if ENABLED:
+        return
+    skip = pytest.mark.skip(reason="set BENCHMARK=1 to run the micro-benchmarks")
+    for item in items:
+        if "benchmark" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+
+def measure(func: Callable[[], object]) -> float:
+    """Return the best time of one call in microseconds."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= ROUND_S:
+            break
+        loops *= 2
+
+    best = elapsed
+    for _ in range(ROUNDS - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, time.perf_counter() - start)
+
+    return best / loops * 1e6
+
+
+@pytest.fixture(scope="session")
+def baseline() -> dict[str, dict[str, float]]:
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest, baseline: dict[str, dict[str, float]]) -> Callable:
+    """Time `func` and compare it with the baseline of the current test."""
+    name = request.node.name
+
+    def run(func: Callable[[], object]) -> float:
+        func()  # Warm caches and lazy imports outside the timing.
+
+        def relative() -> tuple[float, float]:
+            unit = measure(reference)
+            us = measure(func)
+            return us, us / unit
+
+        if UPDATE:
+            # The median, so the baseline does not keep a lucky measurement.
+            timings = sorted((relative() for _ in range(RETRIES + 1)), key=lambda timing: timing[1])
+            us, units = timings[len(timings) // 2]
+        else:
+            us, units = relative()
+
+        expected = baseline.get(name, {}).get("units")
+        limit = expected * (1 + THRESHOLD) if expected is not None and not UPDATE else None
+        for _ in range(RETRIES):
+            if limit is None or units <= limit:
+                break
+            us, units = min((us, units), relative(), key=lambda timing: timing[1])
+
+        _results[name] = {"us": round(us, 3), "units": round(units, 4)}
+        if limit is not None and units > limit:
+            pytest.fail(
+                f"{name} regressed: {units:.3f} reference units per call against "
+                f"{expected:.3f} in the baseline (+{units / expected - 1:.0%}, "
+                f"threshold {THRESHOLD:.0%}), {us:.2f} us",
+            )
+        return us
+
+    return run
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    if not _results:
+        return
+
+    OUTPUT_PATH.write_text(json.dumps(_results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if UPDATE:
+        current = json.loads(BASELINE_PATH.read_text(encoding="utf-8")) if BASELINE_PATH.exists() else {}
+        current.update(_results)
+        BASELINE_PATH.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def pytest_terminal_summary(terminalreporter: pytest.TerminalReporter) -> None:
+    if not _results:
+        return
+
+    terminalreporter.section("micro-benchmarks (per call)")
+    width = max(len(name) for name in _results)
+    for name, timing in sorted(_results.items()):
+        terminalreporter.write_line(f"{name:<{width}}  {timing['us']:>10.2f} us  {timing['units']:>9.3f} units")
@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+import pytest
+import torch
+
+from bot.protos.predict import predict_pb2
+from bot.services.diagnostics.aggregation import reply_to_matrix
+from bot.services.diagnostics.disease_index import DiseaseIndex
+from bot.services.diagnostics.plant_diagnostics import PlantDiagnostics
+from bot.services.mapping.plant_mapper import ModelMapper
+from mlcore.grpc_core.servers.handlers.predict import PredictHandler
+
+LEAVES = [1, 10, 100]
+CLASSES = [2, 20]
+SIZES = [
+    pytest.param(leaves, classes, id=f"leaves={leaves}-classes={classes}")
+    for leaves in LEAVES for classes in CLASSES
+]
+CLASS_SIZES = [pytest.param(classes, id=f"classes={classes}") for classes in CLASSES]
+
+
+def class_names(classes):
+    return [f"Tomato___disease_{i}" for i in range(classes - 1)] + ["Tomato___healthy"]
+
+def probabilities(leaves, classes):
+    rng = np.random.default_rng(leaves * 100 + classes)
+    matrix = rng.random((leaves, classes), dtype=np.float32)
+    return matrix / matrix.sum(axis=1, keepdims=True)
+
+def make_reply(leaves, classes):
+    names = class_names(classes)
+    return predict_pb2.PredictorReply(result=[
+        predict_pb2.ImageResults(results=[
+            predict_pb2.ClassProbability(class_name=name, probability=float(prob))
+            for name, prob in zip(names, row)
+        ])
+        for row in probabilities(leaves, classes)
+    ])
+
+def run_sync(coro):
+    # The diagnostics coroutines never suspend, stepping them once avoids
+    # timing an event loop.
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    error_msg = "coroutine suspended"
+    raise RuntimeError(error_msg)
+
+@pytest.fixture
+def diagnostics(tmp_path, monkeypatch):
+    db = {"помидор": {"diseases": [
+        {
+            "class_name": name,
+            "description": name.replace("_", " "),
+            "photo_url": f"https://example.com/{name}.jpg",
+            "reference_url": f"https://example.com/{name}",
+        }
+        for name in class_names(max(CLASSES))
+    ]}}
+    path = tmp_path / "diseases_db.json"
+    path.write_text(json.dumps(db), encoding="utf-8")
+    monkeypatch.setattr(DiseaseIndex, "_instance", DiseaseIndex(path=path, check_interval=0))
+    return PlantDiagnostics()
+
+
+@pytest.mark.parametrize("classes", CLASS_SIZES)
+def test_convert_to_class_probabilities(benchmark, classes):
+    model_result = [
+        {"class_name": name, "probability": float(prob)}
+        for name, prob in zip(class_names(classes), probabilities(1, classes)[0])
+    ]
+
+    benchmark(lambda: PredictHandler.convert_to_class_probabilities(model_result))
+
+@pytest.mark.parametrize("classes", CLASS_SIZES)
+def test_format_result(benchmark, classes):
+    # The probability extraction of `run_model`, on an ultralytics-like result.
+    class Probs:
+        data = torch.from_numpy(probabilities(1, classes)[0])
+
+    class Result:
+        probs = Probs()
+
+    class Model:
+        names = dict(enumerate(class_names(classes)))
+
+    benchmark(lambda: PredictHandler._format_result(Model, Result))
+
+@pytest.mark.parametrize(("leaves", "classes"), SIZES)
+def test_reply_to_matrix(benchmark, leaves, classes):
+    reply = make_reply(leaves, classes)
+
+    benchmark(lambda: reply_to_matrix(reply))
+
+@pytest.mark.parametrize(("leaves", "classes"), SIZES)
+def test_aggregate_results(benchmark, diagnostics, leaves, classes):
+    names, matrix = class_names(classes), probabilities(leaves, classes)
+
+    benchmark(lambda: run_sync(diagnostics._aggregate_results(names, matrix)))
+
+@pytest.mark.parametrize("classes", CLASS_SIZES)
+def test_process_results(benchmark, diagnostics, classes):
+    aggregated = run_sync(diagnostics._aggregate_results(class_names(classes), probabilities(10, classes)))
+
+    benchmark(lambda: run_sync(diagnostics._process_results(aggregated, "помидор")))
+
+@pytest.mark.parametrize("classes", CLASS_SIZES)
+def test_generate_report(benchmark, diagnostics, classes):
+    aggregated = run_sync(diagnostics._aggregate_results(class_names(classes), probabilities(10, classes)))
+    processed = run_sync(diagnostics._process_results(aggregated, "помидор"))
+
+    benchmark(lambda: run_sync(diagnostics._generate_report(processed)))
+
+@pytest.mark.parametrize(("leaves", "classes"), SIZES)
+def test_analyze_and_report(benchmark, diagnostics, leaves, classes):
+    reply = make_reply(leaves, classes)
+
+    benchmark(lambda: run_sync(diagnostics.analyze_and_report(reply, "помидор")))
+
+def test_get_plant_type(benchmark):
+    benchmark(lambda: ModelMapper.get_plant_type(" Помидор "))
@@ -0,0 +1,4 @@
+import os
+
+# bot.settings requires a token at import time.
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
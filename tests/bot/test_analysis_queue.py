@@ -0,0 +1,90 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.services.jobs.queue import AnalysisQueue, Progress
+
+
+def make_message(chat_id):
+    message = MagicMock()
+    message.chat.id = chat_id
+    message.answer = AsyncMock(return_value=MagicMock(edit_text=AsyncMock()))
+    return message
+
+def submit(queue, chat_id):
+    return queue.submit(
+        message=make_message(chat_id),
+        state=MagicMock(),
+        data={},
+        photo_size=MagicMock(),
+    )
+
+def test_positions_favour_users_without_waiting_jobs():
+    queue = AnalysisQueue(AsyncMock(), max_size=10)
+
+    first = submit(queue, chat_id=1)
+    second = submit(queue, chat_id=1)
+    other = submit(queue, chat_id=2)
+
+    assert queue.position(first) == 1
+    assert queue.position(other) == 2
+    assert queue.position(second) == 3
+
+def test_full_queue_applies_backpressure():
+    queue = AnalysisQueue(AsyncMock(), max_size=1)
+    submit(queue, chat_id=1)
+
+    with pytest.raises(asyncio.QueueFull):
+        submit(queue, chat_id=2)
+
+def test_workers_process_jobs_in_priority_order():
+    processed = []
+
+    async def handler(job):
+        processed.append(job.user_id)
+
+    async def run():
+        queue = AnalysisQueue.start(handler, workers=1, max_size=10)
+
+        # Workers only start once the loop runs, after all jobs are queued.
+        for chat_id in (1, 1, 2):
+            submit(queue, chat_id)
+
+        await asyncio.wait_for(queue._queue.join(), timeout=1)
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+
+    assert processed == [1, 2, 1]
+    assert queue.size == 0
+    assert not queue._per_user
+
+def test_worker_survives_failing_job():
+    handler = AsyncMock(side_effect=[RuntimeError("boom"), None])
+
+    async def run():
+        queue = AnalysisQueue.start(handler, workers=1, max_size=10)
+        submit(queue, chat_id=1)
+        submit(queue, chat_id=2)
+
+        await asyncio.wait_for(queue._queue.join(), timeout=1)
+        await queue.stop()
+
+    asyncio.run(run())
+
+    assert handler.await_count == 2
+
+def test_progress_sends_once_then_edits():
+    message = make_message(1)
+    progress = Progress(message)
+
+    async def run():
+        await progress.update("first")
+        await progress.update("second")
+
+    asyncio.run(run())
+
+    message.answer.assert_awaited_once_with("first")
+    message.answer.return_value.edit_text.assert_awaited_once_with("second")
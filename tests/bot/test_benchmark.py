@@ -0,0 +1,74 @@
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+from aiogram.types import BufferedInputFile
+from aiohttp import web
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "bot" / "tools"))
+
+from benchmark import CorpusPhoto, FakeBotAPI, percentiles, stage_latencies
+
+from bot.bot_instance import instance_bot
+
+
+def test_percentiles():
+    summary = percentiles([float(i) for i in range(1, 101)])
+
+    assert summary["count"] == 100
+    assert summary["p50"] == 50.5
+    assert summary["max"] == 100.0
+    assert percentiles([]) == {"count": 0}
+
+def test_stage_latencies(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    path.write_text(
+        '{"service": "bot", "name": "detect", "start_ns": 0, "end_ns": 2000000, "attributes": {}}\n'
+        '{"service": "bot", "name": "analysis", "start_ns": 0, "end_ns": 5000000, '
+        '"attributes": {"queue_wait_ms": 3.0}}\n',
+    )
+
+    stages = stage_latencies([path, tmp_path / "missing.jsonl"])
+
+    assert stages["bot.detect"]["p50"] == 2.0
+    assert stages["bot.analysis"]["max"] == 5.0
+    assert stages["bot.queue_wait"]["mean"] == 3.0
+
+def test_bot_talks_to_fake_api():
+    async def run():
+        photo = CorpusPhoto("corpus-0", b"jpeg bytes", width=640, height=480)
+        api = FakeBotAPI([photo])
+
+        runner = web.AppRunner(api.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        bot = instance_bot("123456:benchmark", api_url=f"http://127.0.0.1:{port}")
+        try:
+            assert (await bot.get_me()).username == "leafcare_bench_bot"
+
+            api.push_photo(7, photo, unique_id="u-1")
+            updates = await bot.get_updates(timeout=1)
+            assert updates[0].message.photo[0].file_unique_id == "u-1"
+            # Confirmed updates are not served again.
+            assert await bot.get_updates(offset=updates[0].update_id + 1) == []
+
+            file = await bot.get_file("corpus-0")
+            downloaded = await bot.download_file(file.file_path, io.BytesIO())
+            assert downloaded.getvalue() == b"jpeg bytes"
+
+            await bot.send_message(7, "Вы выбрали: Помидор")
+            sent = await bot.send_photo(7, BufferedInputFile(b"png", "a.png"), caption="🔍")
+            assert sent.photo[-1].file_size == 3
+
+            outgoing = await api.wait_for(7, ("🔍",), timeout=1)
+            assert outgoing.method == "sendPhoto"
+            assert api.chats[7].last_request == outgoing.at
+        finally:
+            await bot.session.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
@@ -0,0 +1,189 @@
+import asyncio
+import io
+import sys
+import tarfile
+import zipfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "bot" / "tools"))
+
+import classify_bulk
+from classify_bulk import (
+    BulkClassifier,
+    ResultWriter,
+    connect_backends,
+    iter_images,
+    parse_plant,
+)
+
+from bot.protos.predict import predict_pb2
+from bot.services.detection.batcher import Detections
+
+
+@pytest.fixture
+def jpeg():
+    _, buffer = cv2.imencode(".jpg", np.full((120, 160, 3), 90, dtype=np.uint8))
+    return buffer.tobytes()
+
+def test_iter_images_from_folder_and_archives(tmp_path, jpeg):
+    folder = tmp_path / "photos"
+    (folder / "field").mkdir(parents=True)
+    (folder / "field" / "a.jpg").write_bytes(jpeg)
+    (folder / "notes.txt").write_text("skip")
+
+    with zipfile.ZipFile(tmp_path / "photos.zip", "w") as archive:
+        archive.writestr("b.JPG", jpeg)
+        archive.writestr("readme.md", "skip")
+
+    with tarfile.open(tmp_path / "photos.tar.gz", "w:gz") as archive:
+        info = tarfile.TarInfo("c.png")
+        info.size = len(jpeg)
+        archive.addfile(info, io.BytesIO(jpeg))
+
+    assert list(iter_images(folder)) == [("field/a.jpg", jpeg)]
+    assert list(iter_images(tmp_path / "photos.zip")) == [("b.JPG", jpeg)]
+    assert list(iter_images(tmp_path / "photos.tar.gz")) == [("c.png", jpeg)]
+
+def test_parse_plant():
+    assert parse_plant("Помидор") == predict_pb2.PLANT_TOMATO
+    assert parse_plant("tomato") == predict_pb2.PLANT_TOMATO
+    assert parse_plant("PLANT_PEPPER") == predict_pb2.PLANT_PEPPER
+    with pytest.raises(ValueError, match="Unknown plant"):
+        parse_plant("cactus")
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_writer_resumes_after_interruption(tmp_path, suffix):
+    path = tmp_path / f"results{suffix}"
+    result = {
+        "image": "a.jpg", "status": "ok", "leaves": 2, "dropped": 0,
+        "top": [{"class_name": "healthy", "probability": 0.9}], "elapsed_ms": 12.0,
+    }
+
+    writer = ResultWriter(path, top=1)
+    writer.open()
+    writer.write(result)
+    writer.close()
+    # A run killed in the middle of a line.
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('"b.jpg",o' if suffix == ".csv" else '{"image": "b.j')
+
+    writer = ResultWriter(path, top=1)
+    assert writer.done() == {"a.jpg"}
+
+    writer.open()
+    writer.write({**result, "image": "c.jpg", "status": "no_leaves", "top": []})
+    writer.close()
+
+    summary = writer.summary()
+    assert summary["images"] == 2
+    assert summary["statuses"] == {"ok": 1, "no_leaves": 1}
+    assert summary["top1"] == {"healthy": 1}
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_failed_images_are_retried(tmp_path, suffix):
+    path = tmp_path / f"results{suffix}"
+    ok = {"image": "a.jpg", "status": "ok", "leaves": 1, "top": [{"class_name": "healthy", "probability": 0.9}]}
+    failed = {"image": "b.jpg", "status": "error", "error": "Connection error"}
+
+    writer = ResultWriter(path, top=1)
+    writer.open()
+    writer.write(ok)
+    writer.write(failed)
+    writer.close()
+
+    assert writer.done() == {"a.jpg"}
+
+    writer.open()
+    writer.write({**ok, "image": "b.jpg"})
+    writer.close()
+
+    assert writer.done() == {"a.jpg", "b.jpg"}
+    summary = writer.summary()
+    assert summary["images"] == 2
+    assert summary["statuses"] == {"ok": 2}
+
+class FakeBatcher:
+    async def submit(self, image):
+        return Detections(
+            boxes=np.array([[10, 10, 60, 60], [80, 20, 150, 100]], dtype=np.float32),
+            scores=np.array([0.9, 0.8], dtype=np.float32),
+        )
+
+class FakeEncoder:
+    size = 320
+
+    def __init__(self):
+        self.sizes = []
+
+    async def encode_all(self, image, boxes, size=None):
+        self.sizes.append(size)
+        return [b"crop"] * len(boxes)
+
+class FakeClient:
+    def __init__(self, target, fail=False, error=ConnectionError("down")):
+        self.target, self.fail, self.error, self.calls = target, fail, error, 0
+
+    async def predict(self, images_data, plant_type):
+        self.calls += 1
+        if self.fail:
+            raise self.error
+        leaf = predict_pb2.ImageResults(results=[
+            predict_pb2.ClassProbability(class_name="healthy", probability=0.2),
+            predict_pb2.ClassProbability(class_name="late_blight", probability=0.8),
+        ])
+        return predict_pb2.PredictorReply(result=[leaf] * len(images_data))
+
+def test_classifier_fails_over_between_backends(jpeg):
+    down, up = FakeClient("a:1", fail=True), FakeClient("b:2")
+    encoder = FakeEncoder()
+    classifier = BulkClassifier(FakeBatcher(), encoder, [down, up], predict_pb2.PLANT_TOMATO, top=2)
+
+    results = asyncio.run(classifier.classify("a.jpg", jpeg))
+
+    assert results["status"] == "ok"
+    assert results["leaves"] == 2
+    assert [item["class_name"] for item in results["top"]] == ["late_blight", "healthy"]
+    assert down.calls == up.calls == 1
+    # Cut at the tomato classifier's input size.
+    assert encoder.sizes == [256]
+
+def test_classifier_fails_over_on_timeout(jpeg):
+    slow, up = FakeClient("a:1", fail=True, error=asyncio.TimeoutError()), FakeClient("b:2")
+    classifier = BulkClassifier(FakeBatcher(), FakeEncoder(), [slow, up], predict_pb2.PLANT_TOMATO)
+
+    result = asyncio.run(classifier.classify("a.jpg", jpeg))
+
+    assert result["status"] == "ok"
+    assert slow.calls == up.calls == 1
+
+def test_classifier_reports_bad_images():
+    classifier = BulkClassifier(FakeBatcher(), FakeEncoder(), [FakeClient("a:1")], predict_pb2.PLANT_TOMATO)
+
+    result = asyncio.run(classifier.classify("broken.jpg", b"not an image"))
+
+    assert result["status"] == "error"
+    assert result["error"] == "Failed to decode image data"
+
+class FakeConnection:
+    def __init__(self, host, port):
+        self.target, self.closed = f"{host}:{port}", False
+
+    async def connect(self):
+        if self.target.startswith("down"):
+            raise ConnectionError(f"Connection timeout to {self.target}")
+
+    async def close(self):
+        self.closed = True
+
+def test_unreachable_backends_are_left_out(monkeypatch):
+    monkeypatch.setattr(classify_bulk, "PredictClient", FakeConnection)
+
+    clients = asyncio.run(connect_backends(["down:1", "up:2"]))
+
+    assert [client.target for client in clients] == ["up:2"]
+    with pytest.raises(ConnectionError, match="None of the mlcore backends"):
+        asyncio.run(connect_backends(["down:1", "down:2"]))
@@ -0,0 +1,62 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from bot.protos.predict import predict_pb2
+from bot.services.detection.crops import CropEncoder
+from bot.services.mapping.plant_mapper import ModelMapper
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+def test_square_box_is_padded_and_centered():
+    encoder = CropEncoder(padding=0.0)
+
+    assert encoder.square_box(np.array([100, 100, 200, 150]), (480, 640)) == (
+        100, 75, 200, 175,
+    )
+
+def test_square_box_is_shifted_inside_the_image():
+    encoder = CropEncoder(padding=0.0)
+
+    x1, y1, x2, y2 = encoder.square_box(np.array([0, 0, 50, 100]), (480, 640))
+
+    assert (x1, y1) == (0, 0)
+    assert x2 - x1 == y2 - y1 == 100
+
+def test_prepare_resizes_to_classifier_input(image):
+    encoder = CropEncoder(size=224)
+
+    crop = encoder.prepare(image, np.array([10, 20, 400, 90]))
+
+    assert crop.shape == (224, 224, 3)
+
+def test_encode_all_at_the_classifier_size(image):
+    encoder = CropEncoder(size=320)
+    size = ModelMapper.get_input_size(predict_pb2.PLANT_TOMATO, default=encoder.size)
+
+    crops = asyncio.run(encoder.encode_all(image, np.array([[0, 0, 100, 100]]), size))
+
+    assert size == 256
+    assert cv2.imdecode(np.frombuffer(crops[0], np.uint8), cv2.IMREAD_COLOR).shape == (256, 256, 3)
+    assert ModelMapper.get_input_size(predict_pb2.PLANT_SALAD, default=320) == 320
+
+@pytest.mark.parametrize("image_format", ["jpeg", "webp", "png", "raw"])
+def test_encode_all_round_trips(image, image_format):
+    encoder = CropEncoder(size=64, image_format=image_format)
+    boxes = np.array([[0, 0, 100, 100], [300, 200, 640, 480]], dtype=np.float32)
+
+    crops = asyncio.run(encoder.encode_all(image, boxes))
+
+    assert len(crops) == 2
+    for crop in crops:
+        decoded = cv2.imdecode(np.frombuffer(crop, np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape == (64, 64, 3)
+
+def test_unsupported_format():
+    with pytest.raises(ValueError, match="Unsupported crop format"):
+        CropEncoder(image_format="gif")
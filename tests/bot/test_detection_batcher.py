@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+import torch
+
+from bot.services.detection.batcher import (
+    DetectionBatcher,
+    letterbox,
+    unletterbox_boxes,
+)
+from bot.services.detection.pool import DetectorPool
+
+
+def make_result(boxes, scores):
+    result = MagicMock()
+    result.boxes.xyxy = torch.tensor(boxes, dtype=torch.float32).reshape(-1, 4)
+    result.boxes.conf = torch.tensor(scores, dtype=torch.float32)
+    return result
+
+def test_letterbox_round_trip():
+    image = np.zeros((200, 400, 3), dtype=np.uint8)
+    canvas, scale, pad = letterbox(image, 640)
+
+    assert canvas.shape == (640, 640, 3)
+    assert scale == 1.6
+    assert pad == (0, 160)
+
+    boxes = np.array([[0, 160, 640, 480]], dtype=np.float32)
+    restored = unletterbox_boxes(boxes, scale, pad, image.shape[:2])
+
+    np.testing.assert_allclose(restored, [[0, 0, 400, 200]])
+
+def test_concurrent_submissions_share_one_forward_pass():
+    model = MagicMock()
+    model.predict.side_effect = lambda images, **kwargs: [
+        make_result([[100, 100, 200, 200]], [0.9]) for _ in images
+    ]
+
+    batcher = DetectionBatcher(DetectorPool([model]), imgsz=640, max_batch_size=4, max_wait_ms=50)
+    images = [np.zeros((640, 640, 3), dtype=np.uint8) for _ in range(3)]
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(image) for image in images))
+
+    detections = asyncio.run(run())
+
+    assert model.predict.call_count == 1
+    assert len(model.predict.call_args.args[0]) == 3
+    assert [len(d) for d in detections] == [1, 1, 1]
+    np.testing.assert_allclose(detections[0].boxes, [[100, 100, 200, 200]])
+
+def test_batch_error_is_raised_to_every_caller():
+    model = MagicMock()
+    model.predict.side_effect = RuntimeError("boom")
+
+    batcher = DetectionBatcher(DetectorPool([model]), max_wait_ms=20)
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit(image), batcher.submit(image), return_exceptions=True,
+        )
+
+    errors = asyncio.run(run())
+
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+def test_replicas_run_batches_in_parallel():
+    started = threading.Barrier(2, timeout=5)
+
+    def predict(images, **kwargs):
+        # Both replicas must be inside predict at the same time.
+        started.wait()
+        return [make_result([[0, 0, 10, 10]], [0.9]) for _ in images]
+
+    replicas = [MagicMock(), MagicMock()]
+    for replica in replicas:
+        replica.predict.side_effect = predict
+
+    pool = DetectorPool(replicas)
+    batcher = DetectionBatcher(pool, max_batch_size=1, max_wait_ms=0)
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(image) for _ in range(4)))
+
+    detections = asyncio.run(run())
+
+    assert [len(d) for d in detections] == [1, 1, 1, 1]
+    assert all(replica.predict.call_count == 2 for replica in replicas)
+
+    stats = pool.stats()
+    assert stats.in_use == 0
+    assert stats.checkouts == 4
+
+def test_checkout_waits_for_a_free_replica():
+    pool = DetectorPool(["replica"])
+
+    async def hold():
+        async with pool.checkout() as replica:
+            await asyncio.sleep(0.05)
+            return replica
+
+    async def run():
+        return await asyncio.gather(hold(), hold())
+
+    assert asyncio.run(run()) == ["replica", "replica"]
+
+    stats = pool.stats()
+    assert stats.checkouts == 2
+    assert stats.waited == 1
+    assert stats.max_wait >= 0.04
+    assert stats.in_use == 0
@@ -0,0 +1,116 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from bot.services.detection.intake import ImageIntake
+
+
+def encode(width, height, ext=".jpg"):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, : width // 2] = (0, 0, 255)
+    _, buffer = cv2.imencode(ext, image)
+    return buffer.tobytes()
+
+def test_small_photo_is_decoded_in_full():
+    intake = ImageIntake(max_pixels=1_000_000)
+
+    async def load():
+        async with intake.load(encode(640, 480)) as image:
+            return image.shape
+
+    assert asyncio.run(load()) == (480, 640, 3)
+
+@pytest.mark.parametrize(("max_pixels", "reduction"), [(800_000, 2), (200_000, 4), (40_000, 8)])
+def test_large_jpeg_is_reduced_while_decoding(max_pixels, reduction):
+    intake = ImageIntake(max_pixels=max_pixels)
+    data = encode(1600, 1200)
+
+    plan = intake.plan(data)
+    image = intake.decode(data, plan)
+
+    assert plan.reduction == reduction
+    assert plan.nbytes == (1600 // reduction) * (1200 // reduction) * 3
+    assert image.shape == (1200 // reduction, 1600 // reduction, 3)
+    assert image[10, 10, 2] > 200 and image[10, -10, 2] < 50
+
+def test_png_reserves_its_full_size():
+    intake = ImageIntake(max_pixels=200_000)
+    data = encode(1600, 1200, ext=".png")
+
+    plan = intake.plan(data)
+
+    assert plan.nbytes == 1600 * 1200 * 3
+    assert intake.decode(data, plan).shape == (300, 400, 3)
+
+def test_file_over_the_byte_limit_is_not_read(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(encode(640, 480))
+    intake = ImageIntake(max_bytes=1000)
+
+    with pytest.raises(ValueError, match="over the limit"):
+        asyncio.run(intake.read(str(path)))
+    with pytest.raises(ValueError, match="Failed to decode"):
+        ImageIntake().plan(b"not an image")
+
+def test_photos_wait_for_the_memory_budget():
+    intake = ImageIntake(memory_budget=1000)
+    order = []
+
+    async def photo(name, nbytes, hold):
+        async with intake.reserve(nbytes):
+            order.append(f"{name} start")
+            await asyncio.sleep(hold)
+            order.append(f"{name} end")
+
+    async def main():
+        first = asyncio.create_task(photo("first", 800, 0.05))
+        await asyncio.sleep(0)
+        # Over the budget next to the first photo, alone it would be too.
+        await asyncio.gather(first, photo("second", 400, 0), photo("huge", 5000, 0))
+
+    asyncio.run(main())
+
+    assert order[:2] == ["first start", "first end"]
+    assert sorted(order[2:]) == ["huge end", "huge start", "second end", "second start"]
+    assert intake.in_flight == 0
+
+def test_photos_are_admitted_in_arrival_order():
+    intake = ImageIntake(memory_budget=1000)
+    order = []
+
+    async def photo(name, nbytes):
+        async with intake.reserve(nbytes):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        first = asyncio.create_task(photo("first", 600))
+        await asyncio.sleep(0)
+        # "small" would fit next to "first", but "large" came before it.
+        large = asyncio.create_task(photo("large", 900))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, large, photo("small", 100))
+
+    asyncio.run(main())
+
+    assert order == ["first", "large", "small"]
+    assert intake.in_flight == 0
+
+def test_cancelled_photo_leaves_the_line():
+    intake = ImageIntake(memory_budget=1000)
+
+    async def main():
+        async with intake.reserve(900):
+            waiting = asyncio.create_task(intake.reserve(900).__aenter__())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+
+        # The cancelled photo no longer blocks the queue.
+        async with intake.reserve(100):
+            pass
+
+    asyncio.run(asyncio.wait_for(main(), timeout=1))
+    assert intake.in_flight == 0
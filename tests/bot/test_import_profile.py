@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "bot" / "tools"))
+
+from import_profile import DEFERRED, parse_importtime, profile_imports, summarize
+
+OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _io
+import time:      3000 |       3500 |   aiogram.types
+import time:       500 |       4000 | aiogram
+import time:       900 |        900 | cv2
+"""
+
+
+def test_parse_importtime():
+    records = parse_importtime(OUTPUT)
+
+    assert [record.name for record in records] == ["_io", "aiogram.types", "aiogram", "cv2"]
+    assert [record.depth for record in records] == [2, 1, 0, 0]
+    assert records[1].self_us == 3000
+    assert records[2].cumulative_us == 4000
+
+def test_summarize():
+    summary = summarize(parse_importtime(OUTPUT), top=2)
+
+    assert summary["total_s"] == 0.005
+    assert summary["deferred_imported"] == ["cv2"]
+    assert list(summary["packages_ms"]) == ["aiogram", "cv2"]
+    assert summary["slowest"][0]["name"] == "aiogram"
+
+def test_startup_does_not_import_ml_stack():
+    names = {record.name.split(".")[0] for record in profile_imports("main")}
+
+    assert "aiogram" in names
+    assert not names & set(DEFERRED)
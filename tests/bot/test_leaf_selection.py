@@ -0,0 +1,58 @@
+import numpy as np
+
+from bot.services.detection.batcher import Detections
+from bot.services.detection.selection import select_leaves
+
+SHAPE = (1000, 1000)
+
+def make_detections(boxes, scores):
+    return Detections(
+        boxes=np.array(boxes, dtype=np.float32),
+        scores=np.array(scores, dtype=np.float32),
+    )
+
+def test_tiny_boxes_are_dropped():
+    detections = make_detections([[0, 0, 200, 200], [500, 500, 510, 510]], [0.9, 0.99])
+
+    selected = select_leaves(detections, SHAPE, min_area_ratio=0.002)
+
+    assert len(selected) == 1
+    assert selected.dropped == 1
+
+def test_near_duplicates_are_suppressed():
+    detections = make_detections(
+        [[0, 0, 200, 200], [10, 10, 205, 205], [50, 50, 120, 120], [400, 400, 600, 600]],
+        [0.8, 0.9, 0.95, 0.6],
+    )
+
+    selected = select_leaves(detections, SHAPE)
+
+    np.testing.assert_array_equal(selected.boxes, [[10, 10, 205, 205], [400, 400, 600, 600]])
+    assert selected.dropped == 2
+
+def test_budget_keeps_top_ranked_boxes():
+    boxes = [[i * 100, 0, i * 100 + 90, 90 + i] for i in range(10)]
+    detections = make_detections(boxes, [0.5 + i * 0.01 for i in range(10)])
+
+    selected = select_leaves(detections, SHAPE, max_leaves=3)
+
+    assert len(selected) == 3
+    assert selected.dropped == 0
+    assert selected.over_budget == 7
+    np.testing.assert_array_equal(selected.boxes[0], boxes[9])
+
+def test_empty_detections():
+    selected = select_leaves(Detections(), SHAPE)
+
+    assert len(selected) == 0
+    assert selected.dropped == 0
+
+def test_duplicates_past_the_budget_are_not_counted_as_over_budget():
+    boxes = [[0, 0, 200, 200], [5, 5, 205, 205], [400, 400, 600, 600], [405, 405, 605, 605]]
+    detections = make_detections(boxes, [0.9, 0.8, 0.7, 0.6])
+
+    selected = select_leaves(detections, SHAPE, max_leaves=1)
+
+    np.testing.assert_array_equal(selected.boxes, [[0, 0, 200, 200]])
+    assert selected.dropped == 2
+    assert selected.over_budget == 1
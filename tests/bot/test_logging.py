@@ -0,0 +1,81 @@
+import json
+import logging
+import queue
+import sys
+
+from bot.logger.logger import (
+    JsonFormatter,
+    RateLimitFilter,
+    TextFormatter,
+    _QueueHandler,
+)
+
+
+def make_record(created, rate_limited=True, lineno=10, msg="Processed %d images", args=(3,)):
+    record = logging.LogRecord("bot", logging.INFO, "pipeline.py", lineno, msg, args, None)
+    record.created = created
+    record.rate_limited = rate_limited
+    return record
+
+def test_rate_limit_per_call_site():
+    rate_filter = RateLimitFilter(rate=2)
+
+    passed = [rate_filter.filter(make_record(100.0)) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+
+    # Other call sites and records without the marker are not limited.
+    assert rate_filter.filter(make_record(100.0, lineno=20))
+    assert rate_filter.filter(make_record(100.0, rate_limited=False))
+
+    # Tokens refill over time, the next record reports what was dropped.
+    record = make_record(100.5)
+    assert rate_filter.filter(record)
+    assert record.suppressed == 3
+
+def test_rate_limit_disabled():
+    rate_filter = RateLimitFilter(rate=0)
+    assert all(rate_filter.filter(make_record(100.0)) for _ in range(100))
+
+def test_queue_handler_defers_formatting():
+    handler = _QueueHandler(queue.Queue(1))
+    record = make_record(100.0)
+
+    handler.emit(record)
+    handler.emit(make_record(100.0))  # Dropped, the queue is full.
+
+    queued = handler.queue.get_nowait()
+    assert queued is record
+    assert queued.msg == "Processed %d images"
+    assert queued.args == (3,)
+
+def test_formatters():
+    record = make_record(100.0)
+    record.suppressed = 2
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Processed 3 images"
+    assert entry["level"] == "INFO"
+    assert entry["suppressed"] == 2
+
+    assert TextFormatter("%(message)s").format(record) == "Processed 3 images [2 similar suppressed]"
+
+def test_queue_handler_renders_tracebacks():
+    handler = _QueueHandler(queue.Queue(1))
+    try:
+        raise ValueError("bad image")
+    except ValueError:
+        record = logging.LogRecord(
+            "bot", logging.ERROR, "pipeline.py", 10, "Failed on %s", ("a.jpg",), sys.exc_info(),
+        )
+
+    handler.emit(record)
+    queued = handler.queue.get_nowait()
+
+    # Nothing of the failed call stays referenced while the record waits.
+    assert queued.exc_info is None
+    assert queued.args is None
+    assert queued.msg == "Failed on a.jpg"
+    assert "ValueError: bad image" in queued.exc_text
+
+    assert "ValueError: bad image" in json.loads(JsonFormatter().format(queued))["exception"]
+    assert TextFormatter("%(message)s").format(queued).startswith("Failed on a.jpg\nTraceback")
@@ -0,0 +1,33 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# main.py runs from the bot folder, its routers import `states` from there.
+sys.path.append(str(Path(__file__).resolve().parents[2] / "bot"))
+
+import main
+
+
+class FakeBot:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def delete_webhook(self, drop_pending_updates):
+        self.calls.append(("delete_webhook", drop_pending_updates))
+
+class FakeDispatcher:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def start_polling(self, bot):
+        self.calls.append(("start_polling", bot))
+
+def test_polling_deletes_a_leftover_webhook(monkeypatch):
+    calls = []
+    bot = FakeBot(calls)
+    monkeypatch.setattr(main, "instance_bot", lambda token, api_url=None: bot)
+    monkeypatch.setattr(main, "create_dispatcher", lambda: FakeDispatcher(calls))
+
+    asyncio.run(main.main())
+
+    assert calls == [("delete_webhook", False), ("start_polling", bot)]
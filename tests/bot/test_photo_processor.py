@@ -0,0 +1,43 @@
+import numpy as np
+from aiogram.types import PhotoSize
+
+from bot.services.detection.batcher import Detections
+from bot.services.detection.processor import PhotoProcessor
+
+PHOTO_SIZES = [
+    PhotoSize(file_id="s", file_unique_id="s", width=90, height=67),
+    PhotoSize(file_id="m", file_unique_id="m", width=320, height=240),
+    PhotoSize(file_id="x", file_unique_id="x", width=800, height=600),
+    PhotoSize(file_id="y", file_unique_id="y", width=1280, height=960),
+    PhotoSize(file_id="w", file_unique_id="w", width=2560, height=1920),
+]
+
+def detections_with_side(side):
+    return Detections(
+        boxes=np.array([[0, 0, side, side]], dtype=np.float32),
+        scores=np.array([0.9], dtype=np.float32),
+    )
+
+def test_select_photo_size_picks_smallest_sufficient():
+    assert PhotoProcessor.select_photo_size(PHOTO_SIZES, 640).file_id == "x"
+    assert PhotoProcessor.select_photo_size(PHOTO_SIZES, 320).file_id == "m"
+
+def test_select_photo_size_falls_back_to_largest():
+    assert PhotoProcessor.select_photo_size(PHOTO_SIZES, 5000).file_id == "w"
+
+def test_larger_size_not_needed_for_big_leaves():
+    assert PhotoProcessor.select_larger_photo_size(
+        PHOTO_SIZES, PHOTO_SIZES[3], detections_with_side(300), 112,
+    ) is None
+
+def test_larger_size_for_small_leaves():
+    larger = PhotoProcessor.select_larger_photo_size(
+        PHOTO_SIZES, PHOTO_SIZES[2], detections_with_side(60), 112,
+    )
+
+    assert larger.file_id == "w"
+
+def test_no_larger_size_when_already_largest():
+    assert PhotoProcessor.select_larger_photo_size(
+        PHOTO_SIZES, PHOTO_SIZES[4], detections_with_side(10), 112,
+    ) is None
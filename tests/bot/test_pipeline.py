@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+from bot.services.cache.result_cache import ResultCache
+from bot.services.detection.processor import PhotoProcessor
+from bot.services.jobs import pipeline
+from bot.services.jobs.pipeline import REPORT_SEPARATOR, pack_messages
+
+
+class SlowProgress:
+    def __init__(self):
+        self.texts = []
+
+    async def update(self, text):
+        if text.startswith("🔄"):
+            await asyncio.sleep(0.05)
+        self.texts.append(text)
+
+
+def test_pack_messages_joins_items():
+    assert pack_messages(["a", "b", "c"]) == [REPORT_SEPARATOR.join(["a", "b", "c"])]
+
+def test_pack_messages_respects_limit():
+    items = ["x" * 40, "y" * 40, "z" * 10]
+
+    messages = pack_messages(items, limit=60)
+
+    assert messages == ["x" * 40, "y" * 40 + REPORT_SEPARATOR + "z" * 10]
+    assert all(len(message) <= 60 for message in messages)
+
+def test_pack_messages_keeps_oversized_item():
+    assert pack_messages(["x" * 100], limit=60) == ["x" * 100]
+
+def test_download_error_is_not_overwritten_by_status(monkeypatch):
+    async def fail_download(data, message):
+        raise OSError("download failed")
+
+    monkeypatch.setattr(PhotoProcessor, "save_photo_to_tempfile", fail_download)
+    monkeypatch.setattr(ResultCache, "_instance", ResultCache())
+
+    progress = SlowProgress()
+    photo = SimpleNamespace(file_unique_id="abc", width=1280, height=960)
+    job = SimpleNamespace(
+        message=SimpleNamespace(photo=[photo]),
+        state=None,
+        data={"predict": "Томат"},
+        photo_size=photo,
+        progress=progress,
+    )
+
+    asyncio.run(pipeline._run_analysis(job))
+
+    assert progress.texts == ["🔄 Идет анализ фото...", "❌ Ошибка при обработке фото."]
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+from bot.protos.predict import predict_pb2
+from bot.services.diagnostics.aggregation import aggregate, reply_to_matrix, top_k
+from bot.services.diagnostics.disease_index import DiseaseIndex
+from bot.services.diagnostics.plant_diagnostics import PlantDiagnostics
+
+DB = {
+    "помидор": {
+        "diseases": [
+            {
+                "class_name": "Tomato___Late_blight",
+                "description": "Фитофтороз томата",
+                "photo_url": "https://example.com/late.jpg",
+                "reference_url": "https://example.com/late",
+            },
+            {
+                "class_name": "Tomato___healthy ",
+                "description": "",
+                "photo_url": "",
+                "reference_url": "",
+            },
+        ],
+    },
+}
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "diseases_db.json"
+    path.write_text(json.dumps(DB), encoding="utf-8")
+    return path
+
+@pytest.fixture
+def index(db_path, monkeypatch):
+    index = DiseaseIndex(path=db_path, check_interval=0)
+    monkeypatch.setattr(DiseaseIndex, "_instance", index)
+    return index
+
+def make_reply(*leaves):
+    return predict_pb2.PredictorReply(result=[
+        predict_pb2.ImageResults(results=[
+            predict_pb2.ClassProbability(class_name=name, probability=prob)
+            for name, prob in leaf.items()
+        ])
+        for leaf in leaves
+    ])
+
+def test_lookup_is_normalized(index):
+    info = index.get("Помидор", "tomato___late_blight")
+
+    assert info.description == "Фитофтороз томата"
+    assert info.details == (
+        "Фото: https://example.com/late.jpg\n\nПодробнее: https://example.com/late"
+    )
+    assert index.get("помидор", "Tomato___healthy").is_healthy
+
+def test_unknown_class_falls_back(index):
+    info = index.get("дыня", "Melon___healthy")
+
+    assert not info.known
+    assert info.is_healthy
+    assert info.description == "Melon healthy"
+
+def test_reload_on_mtime_change(index, db_path):
+    db = json.loads(db_path.read_text(encoding="utf-8"))
+    db["помидор"]["diseases"][0]["description"] = "Updated"
+    db_path.write_text(json.dumps(db), encoding="utf-8")
+
+    stat = os.stat(db_path)
+    os.utime(db_path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert index.get("помидор", "Tomato___Late_blight").description == "Updated"
+
+def test_report_for_diseased_plant(index):
+    reply = make_reply(
+        {"Tomato___Late_blight": 0.8, "Tomato___healthy": 0.2},
+        {"Tomato___Late_blight": 0.6, "Tomato___healthy": 0.4},
+    )
+
+    report = asyncio.run(PlantDiagnostics().analyze_and_report(reply, "помидор"))
+
+    assert report[0].startswith("🔴")
+    assert len(report) == 2
+    assert report[1].startswith("🔴 Фитофтороз томата - вероятность 70.0%")
+
+def test_report_with_unknown_class_does_not_crash(index):
+    reply = make_reply({"Tomato___healthy": 0.95, "Tomato___New_disease": 0.05})
+
+    report = asyncio.run(PlantDiagnostics().analyze_and_report(reply, "помидор"))
+
+    assert report[0].startswith("🟢")
+    assert report[1] == "🟡 Tomato New disease - вероятность 5.0%"
+
+def test_reply_to_matrix_aligns_classes():
+    reply = make_reply(
+        {"a": 0.7, "b": 0.3},
+        {"b": 0.4, "a": 0.6},
+    )
+
+    class_names, matrix = reply_to_matrix(reply)
+
+    assert class_names == ["a", "b"]
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix, [[0.7, 0.3], [0.6, 0.4]])
+
+@pytest.mark.parametrize(("policy", "expected"), [
+    ("sum", [0.65, 0.35]),
+    ("mean", [0.65, 0.35]),
+    ("max", [0.7 / 1.1, 0.4 / 1.1]),
+    ("weighted", [(0.7 * 3 + 0.6) / 4, (0.3 * 3 + 0.4) / 4]),
+])
+def test_aggregation_policies(policy, expected):
+    matrix = np.array([[0.7, 0.3], [0.6, 0.4]], dtype=np.float32)
+
+    vector = aggregate(matrix, policy=policy, weights=np.array([3.0, 1.0]))
+
+    np.testing.assert_allclose(vector, expected, rtol=1e-6)
+
+def test_unknown_aggregation_policy():
+    with pytest.raises(ValueError, match="Unknown aggregation policy"):
+        aggregate(np.ones((1, 2)), policy="median")
+
+def test_top_k_is_sorted():
+    vector = np.array([0.1, 0.5, 0.05, 0.3, 0.05])
+
+    assert top_k(vector, 3).tolist() == [1, 3, 0]
+    assert top_k(vector, 10).tolist()[:2] == [1, 3]
+
+def test_is_decisive(index, monkeypatch):
+    from bot.settings import settings
+
+    monkeypatch.setattr(settings, "AGGREGATION_POLICY", "sum")
+    monkeypatch.setattr(settings, "EARLY_EXIT_MIN_LEAVES", 3)
+    monkeypatch.setattr(settings, "EARLY_EXIT_MARGIN", 0.5)
+    diagnostics = PlantDiagnostics()
+
+    clear = {"Tomato___Late_blight": 0.9, "Tomato___healthy": 0.1}
+    unclear = {"Tomato___Late_blight": 0.4, "Tomato___healthy": 0.6}
+
+    assert not diagnostics.is_decisive(make_reply(clear, clear))
+    assert diagnostics.is_decisive(make_reply(clear, clear, clear))
+    assert not diagnostics.is_decisive(make_reply(clear, unclear, unclear))
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from bot.protos.predict import predict_pb2
+from bot.services.grpc import prediction
+from bot.services.grpc.prediction import PredictionService
+from bot.services.grpc.sharding import ShardRouter
+
+DATA = {"predict": "Помидор"}
+
+
+def make_reply(images):
+    return predict_pb2.PredictorReply(result=[
+        predict_pb2.ImageResults(results=[
+            predict_pb2.ClassProbability(class_name=image.decode(), probability=1.0),
+        ])
+        for image in images
+    ])
+
+def names(reply):
+    return [result.results[0].class_name for result in reply.result]
+
+
+class FakeClient:
+    def __init__(self, delays=None, hang_from=None):
+        self.calls = []
+        self.cancelled = []
+        self.delays = delays or {}
+        self.hang_from = hang_from
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def predict(self, images_data, plant_type):
+        call = len(self.calls)
+        self.calls.append(list(images_data))
+        try:
+            if self.hang_from is not None and call >= self.hang_from:
+                await asyncio.Event().wait()
+            await asyncio.sleep(self.delays.get(call, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        return make_reply(images_data)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+
+    async def connect(plant_type):
+        return client
+
+    monkeypatch.setattr(PredictionService, "_connect", connect)
+    return client
+
+def test_progressive_sends_every_chunk(client):
+    boxes = [f"leaf{i}".encode() for i in range(5)]
+
+    reply = asyncio.run(PredictionService.predict_progressive(
+        DATA, boxes, should_stop=lambda reply: False, chunk_size=2,
+    ))
+
+    assert client.calls == [boxes[0:2], boxes[2:4], boxes[4:5]]
+    assert names(reply) == [f"leaf{i}" for i in range(5)]
+
+def test_progressive_keeps_order_when_later_chunks_finish_first(client):
+    # The first chunk answers last, the merged reply still follows the boxes.
+    client.delays = {0: 0.05}
+    boxes = [f"leaf{i}".encode() for i in range(6)]
+
+    reply = asyncio.run(PredictionService.predict_progressive(
+        DATA, boxes, should_stop=lambda reply: False, chunk_size=2,
+    ))
+
+    assert names(reply) == [f"leaf{i}" for i in range(6)]
+
+def test_progressive_cancels_the_chunk_in_flight(client):
+    client.hang_from = 1
+    boxes = [f"leaf{i}".encode() for i in range(6)]
+
+    reply = asyncio.run(PredictionService.predict_progressive(
+        DATA, boxes, should_stop=lambda reply: len(reply.result) >= 2, chunk_size=2,
+    ))
+
+    assert names(reply) == ["leaf0", "leaf1"]
+    assert client.calls == [boxes[0:2], boxes[2:4]]
+    assert client.cancelled == [1]
+
+def test_progressive_errors_match_predict(client):
+    async def fail(images_data, plant_type):
+        raise ConnectionError("node went away")
+
+    client.predict = fail
+
+    with pytest.raises(ConnectionError, match="Connection error: node went away"):
+        asyncio.run(PredictionService.predict(DATA, [b"leaf"]))
+    with pytest.raises(ConnectionError, match="Connection error: node went away"):
+        asyncio.run(PredictionService.predict_progressive(
+            DATA, [b"leaf0", b"leaf1"], should_stop=lambda reply: False, chunk_size=1,
+        ))
+
+def test_connect_tries_a_node_that_just_failed_last(monkeypatch):
+    attempts = []
+
+    class Client:
+        def __init__(self, host, port, **kwargs):
+            self.host = host
+
+        async def connect(self):
+            attempts.append(self.host)
+            if self.host.startswith("unix:"):
+                raise ConnectionError("socket is gone")
+
+        async def close(self):
+            pass
+
+    router = ShardRouter([], replication=1, fallback="nginx:443", local="unix:/tmp/mlcore.sock")
+    monkeypatch.setattr(PredictionService, "_router", router)
+    monkeypatch.setattr(prediction, "PredictClient", Client)
+
+    for _ in range(2):
+        client = asyncio.run(PredictionService._connect(predict_pb2.PLANT_TOMATO))
+        assert client.host == "nginx"
+
+    assert attempts == ["unix:/tmp/mlcore.sock", "nginx", "nginx"]
@@ -0,0 +1,51 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from bot.services.detection.batcher import Detections
+from bot.services.detection.preview import BOX_COLOR, PreviewRenderer
+
+
+@pytest.fixture
+def image():
+    return np.full((3000, 4000, 3), 200, dtype=np.uint8)
+
+@pytest.fixture
+def detections():
+    return Detections(
+        boxes=np.array([[400, 400, 2000, 1600], [2400, 0, 3600, 1200]], dtype=np.float32),
+        scores=np.array([0.91, 0.55], dtype=np.float32),
+    )
+
+def test_preview_is_downscaled_and_annotated(image, detections):
+    renderer = PreviewRenderer(max_side=1280, quality=80)
+
+    data = renderer.render(image, detections)
+    preview = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    assert preview.shape == (960, 1280, 3)
+    # The first box is drawn at a third of its original coordinates.
+    assert np.abs(preview[300, 128].astype(int) - BOX_COLOR).max() < 40
+    assert np.abs(preview[600, 400].astype(int) - 200).max() < 10
+    # The original is left untouched for the crops.
+    assert (image == 200).all()
+
+def test_small_images_are_not_upscaled(detections):
+    renderer = PreviewRenderer(max_side=1280)
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    preview, scale = renderer.downscale(image)
+
+    assert scale == 1.0
+    assert preview.shape == image.shape
+    assert preview is not image
+
+def test_render_file_without_detections(image):
+    renderer = PreviewRenderer(max_side=640)
+
+    photo = asyncio.run(renderer.render_file(image, Detections()))
+
+    assert photo.filename == "preview.jpg"
+    assert cv2.imdecode(np.frombuffer(photo.data, np.uint8), cv2.IMREAD_COLOR).shape == (480, 640, 3)
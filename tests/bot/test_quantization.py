@@ -0,0 +1,33 @@
+import json
+from types import SimpleNamespace
+
+from bot.services.detection.quantization import QUANTIZATION_MANIFEST, load_int8, resolve_variant
+
+
+def test_resolve_variant(tmp_path):
+    weights = tmp_path / "leaf_detect.pt"
+    variant = tmp_path / "leaf_detect.int8.pt"
+    weights.touch()
+    variant.touch()
+
+    manifest = tmp_path / QUANTIZATION_MANIFEST
+    entry = {"precision": "int8", "variant": variant.name, "accepted": True}
+    manifest.write_text(json.dumps({weights.name: entry}))
+
+    assert resolve_variant(str(weights), "fp32") == str(weights)
+    assert resolve_variant(str(weights), "int8") == str(variant)
+
+    manifest.write_text(json.dumps({weights.name: {**entry, "accepted": False}}))
+    assert resolve_variant(str(weights), "int8") == str(weights)
+
+    manifest.write_text(json.dumps({weights.name: entry}))
+    variant.unlink()
+    assert resolve_variant(str(weights), "int8") == str(weights)
+
+def test_fp32_weights_are_left_alone():
+    network = object()
+    model = SimpleNamespace(ckpt={"model": network}, model=network)
+
+    load_int8(model)
+
+    assert model.model is network
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+import pytest
+
+from bot.services.cache.result_cache import CachedResult, ResultCache
+
+
+@pytest.fixture
+def image():
+    # Smooth large-scale structure, like a photo rather than pixel noise.
+    rng = np.random.default_rng(0)
+    coarse = rng.integers(0, 255, (6, 8, 3), dtype=np.uint8)
+    return cv2.resize(coarse, (640, 480), interpolation=cv2.INTER_CUBIC)
+
+def make_result(photo_hash=None):
+    return CachedResult(
+        boxes=np.zeros((2, 4), dtype=np.float32),
+        annotated_file_id="annotated",
+        report=["report"],
+        photo_hash=photo_hash,
+    )
+
+def test_get_by_file_unique_id():
+    cache = ResultCache()
+    cache.put("помидор", "abc", make_result())
+
+    assert cache.get("помидор", "abc").annotated_file_id == "annotated"
+    assert cache.get("огурец", "abc") is None
+
+def test_entries_expire():
+    cache = ResultCache(ttl=10)
+    result = make_result()
+    cache.put("помидор", "abc", result)
+
+    result.created_at -= 11
+
+    assert cache.get("помидор", "abc") is None
+    assert len(cache) == 0
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put("помидор", "a", make_result())
+    cache.put("помидор", "b", make_result())
+    cache.get("помидор", "a")
+    cache.put("помидор", "c", make_result())
+
+    assert cache.get("помидор", "b") is None
+    assert cache.get("помидор", "a") is not None
+
+def test_recompressed_copy_matches_by_hash(image):
+    cache = ResultCache(max_distance=4)
+    cache.put("помидор", "original", make_result(ResultCache.perceptual_hash(image)))
+
+    _, buffer = cv2.imencode(".jpg", cv2.resize(image, (320, 240)), [cv2.IMWRITE_JPEG_QUALITY, 40])
+    copy = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    assert cache.find_similar("помидор", ResultCache.perceptual_hash(copy)) is not None
+    assert cache.find_similar("огурец", ResultCache.perceptual_hash(copy)) is None
+
+def test_different_photo_does_not_match(image):
+    cache = ResultCache(max_distance=4)
+    cache.put("помидор", "original", make_result(ResultCache.perceptual_hash(image)))
+
+    other = np.ascontiguousarray(image[:, ::-1])
+
+    assert cache.find_similar("помидор", ResultCache.perceptual_hash(other)) is None
@@ -0,0 +1,81 @@
+from bot.protos.predict import predict_pb2
+from bot.services.grpc.sharding import HashRing, ShardRouter
+
+NODES = ["mlcore1:50051", "mlcore2:50052", "mlcore3:50053"]
+PLANTS = list(predict_pb2.Plant.keys())
+
+def test_owners_are_distinct_and_stable():
+    ring = HashRing(NODES, replication=2)
+
+    for plant in PLANTS:
+        owners = ring.owners(plant)
+        assert len(owners) == 2
+        assert len(set(owners)) == 2
+        assert owners == HashRing(list(reversed(NODES)), replication=2).owners(plant)
+
+def test_replication_is_capped_by_node_count():
+    assert len(HashRing(NODES[:1], replication=3).owners("PLANT_TOMATO")) == 1
+    assert HashRing([], replication=2).owners("PLANT_TOMATO") == []
+
+def test_adding_a_node_moves_few_keys():
+    keys = [f"key-{i}" for i in range(1000)]
+    before = HashRing(NODES, replication=1)
+    after = HashRing([*NODES, "mlcore4:50054"], replication=1)
+
+    moved = sum(before.owners(key) != after.owners(key) for key in keys)
+
+    # Roughly a quarter of the keys go to the new node, nothing else moves.
+    assert 100 < moved < 450
+    assert all(
+        after.owners(key) == ["mlcore4:50054"]
+        for key in keys if before.owners(key) != after.owners(key)
+    )
+
+def test_router_falls_back_to_load_balancer():
+    router = ShardRouter(NODES, replication=2, fallback="nginx:443")
+    targets = router.targets(predict_pb2.PLANT_TOMATO)
+
+    assert targets[:2] == router.ring.owners("PLANT_TOMATO")
+    assert targets[-1] == "nginx:443"
+    assert ShardRouter([], replication=2, fallback="nginx:443").targets(
+        predict_pb2.PLANT_TOMATO,
+    ) == ["nginx:443"]
+    assert ShardRouter.split_address("mlcore1:50051") == ("mlcore1", "50051")
+
+def test_failed_node_is_tried_last_until_retry(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("bot.services.grpc.sharding.time.monotonic", lambda: now)
+    router = ShardRouter(NODES, replication=2, fallback="nginx:443", retry_after=30)
+    preferred, replica = router.ring.owners("PLANT_TOMATO")
+
+    router.mark_down(preferred)
+
+    assert router.targets(predict_pb2.PLANT_TOMATO) == [replica, "nginx:443", preferred]
+
+    now += 31
+    assert router.targets(predict_pb2.PLANT_TOMATO) == [preferred, replica, "nginx:443"]
+
+    router.mark_down(preferred)
+    router.mark_up(preferred)
+    assert router.targets(predict_pb2.PLANT_TOMATO)[0] == preferred
+
+def test_local_socket_is_preferred_only_for_owned_plants():
+    router = ShardRouter(NODES, replication=1, fallback="nginx:443")
+    plants = {node: [] for node in NODES}
+    for plant in PLANTS:
+        plants[router.ring.owners(plant)[0]].append(predict_pb2.Plant.Value(plant))
+    local_node = next(node for node in NODES if plants[node])
+    other = next(
+        plant for node in NODES if node != local_node for plant in plants[node]
+    )
+
+    socket = "unix:/tmp/mlcore.sock"
+    router = ShardRouter(
+        NODES, replication=1, fallback="nginx:443", local=socket, local_node=local_node,
+    )
+
+    assert router.targets(plants[local_node][0]) == [socket, "nginx:443"]
+    assert socket not in router.targets(other)
+    assert ShardRouter([], replication=1, fallback="nginx:443", local=socket).targets(
+        predict_pb2.PLANT_TOMATO,
+    ) == [socket, "nginx:443"]
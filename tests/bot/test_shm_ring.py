@@ -0,0 +1,59 @@
+import pytest
+
+from bot.protos.predict import predict_pb2
+from bot.services.grpc.shm import SHM_PREFIX, SharedMemoryRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedMemoryRing(size=100)
+    yield ring
+    ring.close()
+
+def test_name_has_prefix(ring):
+    assert ring.name.startswith(SHM_PREFIX)
+
+def test_allocations_wrap_around_and_never_overlap(ring):
+    first = ring.allocate(60)
+    assert (first.start, first.end) == (0, 60)
+
+    # Neither after the head nor at the start is there room for 50 bytes.
+    assert ring.allocate(50) is None
+
+    second = ring.allocate(30)
+    assert (second.start, second.end) == (60, 90)
+
+    ring.release(first)
+    third = ring.allocate(50)
+    assert (third.start, third.end) == (0, 50)
+
+def test_write_references_images(ring):
+    request = predict_pb2.PredictorRequest()
+    allocation = ring.write(request, [b"abc", b"defgh"])
+
+    assert request.shm_name == ring.name
+    assert [(ref.offset, ref.length) for ref in request.image_refs] == [(8, 3), (11, 5)]
+    assert bytes(ring._shm.buf[8:16]) == b"abcdefgh"
+    assert not request.image_data
+
+    ring.release(allocation)
+
+def test_release_clears_the_generation(ring):
+    first, second = predict_pb2.PredictorRequest(), predict_pb2.PredictorRequest()
+    allocation = ring.write(first, [b"abc"])
+
+    assert first.shm_generation == allocation.generation
+    assert bytes(ring._shm.buf[:8]) == allocation.generation.to_bytes(8, "little")
+
+    ring.release(allocation)
+    assert bytes(ring._shm.buf[:8]) == bytes(8)
+
+    reused = ring.write(second, [b"def"])
+    assert second.shm_generation != first.shm_generation
+    assert bytes(ring._shm.buf[reused.start:reused.start + 8]) == reused.generation.to_bytes(8, "little")
+
+def test_write_falls_back_when_full(ring):
+    request = predict_pb2.PredictorRequest()
+
+    assert ring.write(request, [b"x" * 101]) is None
+    assert not request.shm_name
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.states import Form
+from bot.storage import create_storage
+
+fakeredis = pytest.importorskip("fakeredis")
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+def test_memory_storage():
+    assert isinstance(create_storage("memory://"), MemoryStorage)
+
+def test_unsupported_storage():
+    with pytest.raises(ValueError, match="Unsupported FSM storage URL"):
+        create_storage("postgres://localhost")
+
+def test_redis_storage_is_shared_between_workers(monkeypatch):
+    import aiogram.fsm.storage.redis as redis_storage
+
+    server = fakeredis.FakeServer()
+    urls = []
+
+    def fake_redis(connection_pool):
+        urls.append(connection_pool.connection_kwargs)
+        return fakeredis.aioredis.FakeRedis(server=server)
+
+    monkeypatch.setattr(redis_storage, "Redis", fake_redis)
+
+    # Two workers with their own connections to the same Redis.
+    first = create_storage("redis://redis:6379/0", ttl=600)
+    second = create_storage("redis://redis:6379/0", ttl=600)
+
+    assert isinstance(first, redis_storage.RedisStorage)
+    assert first.state_ttl == first.data_ttl == timedelta(seconds=600)
+    assert urls[0]["host"] == "redis" and urls[0]["db"] == 0
+
+    async def run():
+        await first.set_state(KEY, Form.predict_get_photo)
+        await first.update_data(KEY, {"predict": "Помидор"})
+
+        return await second.get_state(KEY), await second.get_data(KEY)
+
+    state, data = asyncio.run(run())
+
+    assert state == Form.predict_get_photo.state
+    assert data == {"predict": "Помидор"}
@@ -0,0 +1,97 @@
+import json
+import time
+
+import pytest
+
+from bot.tracing import Tracer
+from bot.tracing.tracer import Span, _Exporter
+
+
+def read_spans(path, count):
+    # Spans are written by a background thread.
+    for _ in range(100):
+        if path.exists():
+            lines = path.read_text().splitlines()
+            if len(lines) >= count:
+                return [json.loads(line) for line in lines]
+        time.sleep(0.01)
+    raise AssertionError("spans were not exported")
+
+def test_disabled_tracer_is_noop(tmp_path):
+    tracer = Tracer(enabled=False, sample_rate=1.0, export_url=f"file://{tmp_path}/t.jsonl")
+
+    with tracer.span("analysis") as span:
+        assert not span.sampled
+        assert tracer.inject() == []
+
+    assert not (tmp_path / "t.jsonl").exists()
+
+def test_child_spans_share_the_trace(tmp_path):
+    path = tmp_path / "t.jsonl"
+    tracer = Tracer(enabled=True, sample_rate=1.0, export_url=f"file://{path}")
+
+    with tracer.span("analysis", user_id=1) as root:
+        with tracer.span("detect") as child:
+            assert tracer.inject() == [("traceparent", f"00-{root.trace_id}-{child.span_id}-01")]
+
+    spans = {span["name"]: span for span in read_spans(path, 2)}
+    assert spans["detect"]["trace_id"] == spans["analysis"]["trace_id"]
+    assert spans["detect"]["parent_id"] == spans["analysis"]["span_id"]
+    assert spans["analysis"]["attributes"] == {"user_id": 1}
+    assert spans["analysis"]["end_ns"] >= spans["analysis"]["start_ns"] > 0
+
+def test_unsampled_trace_propagates_decision(tmp_path):
+    tracer = Tracer(enabled=True, sample_rate=0.0, export_url=f"file://{tmp_path}/t.jsonl")
+
+    with tracer.span("analysis") as root:
+        assert not root.sampled
+        assert tracer.inject()[0][1].endswith("-00")
+        with tracer.span("detect") as child:
+            assert not child.sampled
+
+def test_error_status(tmp_path):
+    path = tmp_path / "t.jsonl"
+    tracer = Tracer(enabled=True, sample_rate=1.0, export_url=f"file://{path}")
+
+    try:
+        with tracer.span("classify"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert read_spans(path, 1)[0]["status"] == "error: RuntimeError"
+
+def test_bad_sink_fails_at_startup(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Tracer(enabled=True, sample_rate=1.0, export_url=f"file://{tmp_path}/missing/t.jsonl")
+    with pytest.raises(ValueError, match="Unsupported"):
+        Tracer(enabled=True, sample_rate=1.0, export_url="udp://collector")
+
+def test_full_queue_drops_spans(tmp_path, monkeypatch):
+    # Without a running thread nothing leaves the queue.
+    monkeypatch.setattr(_Exporter, "_run", lambda self: None)
+    exporter = _Exporter(f"file://{tmp_path}/t.jsonl", queue_size=2)
+
+    for i in range(3):
+        exporter.export(Span(name=f"span{i}", trace_id="0" * 32, span_id="0" * 16))
+
+    assert exporter.dropped == 1
+
+def test_failing_sink_keeps_the_thread(tmp_path, monkeypatch):
+    write = _Exporter._write
+
+    def flaky_write(self, span):
+        if span.name == "broken":
+            raise OSError("disk full")
+        write(self, span)
+
+    monkeypatch.setattr(_Exporter, "_write", flaky_write)
+    path = tmp_path / "t.jsonl"
+    tracer = Tracer(enabled=True, sample_rate=1.0, export_url=f"file://{path}")
+
+    with tracer.span("broken"):
+        pass
+    with tracer.span("analysis"):
+        pass
+
+    assert [span["name"] for span in read_spans(path, 1)] == ["analysis"]
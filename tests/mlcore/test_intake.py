@@ -0,0 +1,149 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from mlcore.grpc_core.servers.handlers.intake import ImageIntake
+from mlcore.grpc_core.servers.handlers.predict import PredictHandler
+
+
+def encode(width, height, ext=".jpg"):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, : width // 2] = (0, 0, 255)
+    _, buffer = cv2.imencode(ext, image)
+    return buffer.tobytes()
+
+def test_small_image_is_decoded_in_full(monkeypatch):
+    monkeypatch.setenv("MAX_IMAGE_PIXELS", "1000000")
+    data = encode(640, 480)
+
+    plan = ImageIntake.plan(data)
+
+    assert (plan.width, plan.height, plan.reduction) == (640, 480, 1)
+    assert plan.nbytes == 640 * 480 * 3
+    assert PredictHandler.bytes_to_image(data).shape == (480, 640, 3)
+
+@pytest.mark.parametrize(("max_pixels", "reduction"), [(200_000, 4), (800_000, 2), (40_000, 8)])
+def test_large_jpeg_is_reduced_while_decoding(monkeypatch, max_pixels, reduction):
+    monkeypatch.setenv("MAX_IMAGE_PIXELS", str(max_pixels))
+    data = encode(1600, 1200)
+
+    plan = ImageIntake.plan(data)
+    image = ImageIntake.decode(data, plan)
+
+    assert plan.reduction == reduction
+    # Only the reduced pixels are ever allocated.
+    assert plan.nbytes == (1600 // reduction) * (1200 // reduction) * 3
+    assert image.shape == (1200 // reduction, 1600 // reduction, 3)
+    # Still red on the left, black on the right.
+    assert image[10, 10, 2] > 200 and image[10, -10, 2] < 50
+
+def test_png_is_shrunk_after_a_full_decode(monkeypatch):
+    monkeypatch.setenv("MAX_IMAGE_PIXELS", "200000")
+    data = encode(1600, 1200, ext=".png")
+
+    plan = ImageIntake.plan(data)
+    image = ImageIntake.decode(data, plan)
+
+    assert plan.nbytes == 1600 * 1200 * 3
+    assert image.shape == (300, 400, 3)
+
+def test_image_still_too_large_at_one_eighth_is_resized(monkeypatch):
+    monkeypatch.setenv("MAX_IMAGE_PIXELS", "5000")
+    data = encode(1600, 1200)
+
+    image = ImageIntake.decode(data, ImageIntake.plan(data))
+
+    assert image.shape[0] * image.shape[1] <= 5000
+    assert image.shape[1] / image.shape[0] == pytest.approx(4 / 3, rel=0.05)
+
+def test_limits_are_checked_before_decoding(monkeypatch):
+    monkeypatch.setenv("MAX_IMAGE_BYTES", "1000")
+    with pytest.raises(ValueError, match="over the limit"):
+        ImageIntake.plan(encode(640, 480))
+
+    monkeypatch.delenv("MAX_IMAGE_BYTES")
+    with pytest.raises(ValueError, match="Failed to decode"):
+        ImageIntake.plan(b"not an image")
+
+def test_requests_wait_for_the_memory_budget(monkeypatch):
+    monkeypatch.setenv("DECODE_MEMORY_BUDGET", "1000")
+    order = []
+
+    ImageIntake.acquire(800)
+
+    def second():
+        ImageIntake.acquire(400)
+        order.append("second")
+        ImageIntake.release(400)
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    time.sleep(0.05)
+    order.append("first done")
+    ImageIntake.release(800)
+    thread.join(timeout=1)
+
+    assert order == ["first done", "second"]
+    assert ImageIntake.in_flight() == 0
+
+def test_request_over_the_whole_budget_runs_alone(monkeypatch):
+    monkeypatch.setenv("DECODE_MEMORY_BUDGET", "1000")
+
+    ImageIntake.acquire(5000)
+    assert ImageIntake.in_flight() == 5000
+    ImageIntake.release(5000)
+
+def test_requests_are_admitted_in_arrival_order(monkeypatch):
+    monkeypatch.setenv("DECODE_MEMORY_BUDGET", "1000")
+    order = []
+
+    def request(name, nbytes):
+        ImageIntake.acquire(nbytes)
+        order.append(name)
+        ImageIntake.release(nbytes)
+
+    ImageIntake.acquire(600)
+    large = threading.Thread(target=request, args=("large", 900))
+    large.start()
+    time.sleep(0.05)
+    # Would fit next to the 600 bytes in flight, but "large" came first.
+    small = threading.Thread(target=request, args=("small", 100))
+    small.start()
+    time.sleep(0.05)
+
+    assert order == []
+    ImageIntake.release(600)
+    large.join(timeout=1)
+    small.join(timeout=1)
+
+    assert order == ["large", "small"]
+    assert ImageIntake.in_flight() == 0
+
+def test_wait_is_given_up_at_the_deadline_or_on_cancellation(monkeypatch):
+    monkeypatch.setenv("DECODE_MEMORY_BUDGET", "1000")
+    ImageIntake.acquire(900)
+
+    started = time.monotonic()
+    assert not ImageIntake.acquire(500, timeout=0.05)
+    assert time.monotonic() - started < 1
+
+    active = threading.Event()
+    active.set()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(ImageIntake.acquire(500, is_active=active.is_set)))
+    thread.start()
+    time.sleep(0.05)
+    active.clear()
+    ImageIntake.wake()
+    thread.join(timeout=1)
+
+    assert result == [False]
+    ImageIntake.release(900)
+
+    # Requests that gave up no longer hold the line.
+    assert ImageIntake.acquire(500, timeout=0.05)
+    ImageIntake.release(500)
+    assert ImageIntake.in_flight() == 0
@@ -1,6 +1,7 @@
 import io
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from PIL import Image
 from pytest import approx
@@ -21,8 +22,14 @@ def mock_image():
 def test_bytes_to_image(mock_image):
     image = PredictHandler.bytes_to_image(mock_image)
 
-    assert isinstance(image, Image.Image)
-    assert image.size == (100, 100)
+    assert isinstance(image, np.ndarray)
+    assert image.shape == (100, 100, 3)
+    # Decoded as BGR, the order ultralytics expects for arrays.
+    assert image[50, 50, 2] > 200 and image[50, 50, 0] < 50
+
+def test_bytes_to_image_invalid_data():
+    with pytest.raises(ValueError, match="Failed to decode image data"):
+        PredictHandler.bytes_to_image(TEST_IMAGE_DATA)
 
 @patch("os.path.abspath")
 def test_get_model_path(mock_abspath):
@@ -77,3 +84,21 @@ def test_full_flow(mock_get_model, mock_yolo, mock_image):
 
     assert len(pb_result.results) == 1
     assert pb_result.results[0].probability == approx(0.9, abs=1e-6)
+
+def test_foreign_models_are_evicted(monkeypatch):
+    monkeypatch.setattr(PredictHandler, "_models", {})
+    monkeypatch.setattr(PredictHandler, "_owned", set())
+    monkeypatch.setattr(PredictHandler, "get_model_path", staticmethod(lambda plant_type: plant_type))
+    monkeypatch.setattr("mlcore.grpc_core.servers.handlers.predict.YOLO", lambda path: MagicMock())
+    monkeypatch.setenv("FOREIGN_MODEL_CACHE", "1")
+
+    PredictHandler.preload([predict_pb2.PLANT_TOMATO])
+    owned = PredictHandler.get_or_create_model(predict_pb2.PLANT_TOMATO)
+    cucumber = PredictHandler.get_or_create_model(predict_pb2.PLANT_CUCUMBER)
+
+    assert PredictHandler.get_or_create_model(predict_pb2.PLANT_CUCUMBER) is cucumber
+
+    PredictHandler.get_or_create_model(predict_pb2.PLANT_MELON)
+
+    assert set(PredictHandler._models) == {predict_pb2.PLANT_TOMATO, predict_pb2.PLANT_MELON}
+    assert PredictHandler.get_or_create_model(predict_pb2.PLANT_TOMATO) is owned
@@ -1,13 +1,15 @@
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 import grpc
 import numpy as np
 import pytest
-from PIL import Image
 from pytest import approx
 
 from mlcore.grpc_core.protos.predict import predict_pb2
 from mlcore.grpc_core.servers.handlers.predict import PredictHandler
+from mlcore.grpc_core.servers.handlers.preprocess import Preprocessor
 from mlcore.grpc_core.servers.services.predict import PredictService
 
 
@@ -24,19 +26,19 @@ def valid_request():
 
 @pytest.fixture
 def mock_image():
-    return Image.fromarray(np.zeros((256, 256, 3), dtype=np.uint8))
+    return np.zeros((256, 256, 3), dtype=np.uint8)
 
 def test_predict_success(predict_service, valid_request, mock_image):
     with patch.object(PredictHandler, "get_or_create_model") as mock_get_model, \
          patch.object(PredictHandler, "bytes_to_image") as mock_bytes_to_image, \
-         patch.object(PredictHandler, "run_model") as mock_run_model, \
+         patch.object(PredictHandler, "run_model_batch") as mock_run_model, \
          patch.object(PredictHandler, "convert_to_class_probabilities") as mock_convert:
 
         mock_model = MagicMock()
 
         mock_get_model.return_value = mock_model
         mock_bytes_to_image.return_value = mock_image
-        mock_run_model.return_value = "mock_result"
+        mock_run_model.return_value = ["mock_result", "mock_result"]
         mock_convert.return_value = predict_pb2.ImageResults(
             results=[
                 predict_pb2.ClassProbability(class_name="healthy", probability=0.9),
@@ -93,7 +95,7 @@ def test_predict_image_processing_error(predict_service, valid_request):
 def test_predict_model_run_error(predict_service, valid_request, mock_image):
     with patch.object(PredictHandler, "get_or_create_model") as mock_get_model, \
          patch.object(PredictHandler, "bytes_to_image") as mock_bytes_to_image, \
-         patch.object(PredictHandler, "run_model") as mock_run_model:
+         patch.object(PredictHandler, "run_model_batch") as mock_run_model:
 
         mock_get_model.return_value = MagicMock()
         mock_bytes_to_image.return_value = mock_image
@@ -109,6 +111,39 @@ def test_predict_model_run_error(predict_service, valid_request, mock_image):
             "Error processing image: Model run failed",
         )
 
+def test_predict_model_run_error_waits_for_preprocessing(
+    predict_service, valid_request, mock_image, monkeypatch,
+):
+    # The next chunk is already being written into the reused buffers when the model fails.
+    monkeypatch.setenv("PREDICT_BATCH_SIZE", "1")
+    started = threading.Event()
+    finished = []
+
+    def preprocess(images, size, mean, std, out):
+        if finished:
+            started.set()
+            time.sleep(0.1)
+        finished.append(len(images))
+        return out
+
+    def run_model_batch(model, tensor):
+        started.wait(1)
+        raise Exception("Model run failed")
+
+    with patch.object(PredictHandler, "get_or_create_model") as mock_get_model, \
+         patch.object(PredictHandler, "bytes_to_image") as mock_bytes_to_image, \
+         patch.object(PredictHandler, "run_model_batch", side_effect=run_model_batch), \
+         patch.object(Preprocessor, "preprocess", side_effect=preprocess):
+
+        mock_get_model.return_value = MagicMock()
+        mock_bytes_to_image.return_value = mock_image
+
+        context = MagicMock()
+        predict_service.Predict(valid_request, context)
+
+        assert finished == [1, 1]
+        context.set_code.assert_called_once_with(grpc.StatusCode.INTERNAL)
+
 def test_predict_empty_image_data(predict_service):
     empty_request = predict_pb2.PredictorRequest(
         plant=predict_pb2.PLANT_TOMATO,
@@ -126,7 +161,7 @@ def test_predict_empty_image_data(predict_service):
 def test_predict_partial_success(predict_service, valid_request, mock_image):
     with patch.object(PredictHandler, "get_or_create_model") as mock_get_model, \
          patch.object(PredictHandler, "bytes_to_image") as mock_bytes_to_image, \
-         patch.object(PredictHandler, "run_model") as mock_run_model, \
+         patch.object(PredictHandler, "run_model_batch") as mock_run_model, \
          patch.object(PredictHandler, "convert_to_class_probabilities") as mock_convert:
 
         mock_model = MagicMock()
@@ -137,7 +172,7 @@ def test_predict_partial_success(predict_service, valid_request, mock_image):
             Exception("Image processing failed"),
         ]
 
-        mock_run_model.return_value = "mock_result"
+        mock_run_model.return_value = ["mock_result"]
         mock_convert.return_value = predict_pb2.ImageResults(
             results=[
                 predict_pb2.ClassProbability(class_name="healthy", probability=0.9),
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from ultralytics.data.augment import classify_transforms
+
+from mlcore.grpc_core.servers.handlers.preprocess import Preprocessor
+
+
+def reference(images, size):
+    transforms = classify_transforms(size)
+    return torch.stack([
+        transforms(Image.fromarray(image[..., ::-1].copy())) for image in images
+    ]).numpy()
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+def test_parity_without_resize(rng):
+    images = rng.integers(0, 256, (4, 224, 224, 3), dtype=np.uint8)
+
+    np.testing.assert_allclose(Preprocessor.preprocess(images, 224), reference(images, 224), atol=1e-6)
+
+@pytest.mark.parametrize("shape", [(300, 400), (400, 300), (160, 120)])
+def test_parity_with_resize(rng, shape):
+    # Smooth images, resampling filters only differ on high frequencies.
+    small = rng.integers(0, 256, (3, 8, 8, 3), dtype=np.uint8)
+    images = [np.kron(image, np.ones((shape[0] // 8, shape[1] // 8, 1), dtype=np.uint8)) for image in small]
+
+    result = Preprocessor.preprocess(images, 224)
+
+    assert result.shape == (3, 3, 224, 224)
+    assert np.abs(result - reference(images, 224)).mean() < 0.02
+
+def test_list_of_decoded_images_matches_batch(rng):
+    images = rng.integers(0, 256, (3, 224, 224, 3), dtype=np.uint8)
+
+    np.testing.assert_array_equal(Preprocessor.preprocess(list(images), 224), Preprocessor.preprocess(images, 224))
+
+def test_normalization_and_buffer(rng):
+    images = rng.integers(0, 256, (2, 32, 32, 3), dtype=np.uint8)
+    out = Preprocessor.get_buffers(2, 32)[0]
+
+    result = Preprocessor.submit(images, 32, mean=(0.5, 0.5, 0.5), std=(0.25, 0.25, 0.25), out=out).result()
+
+    assert result is out
+    expected = (images[..., ::-1].transpose(0, 3, 1, 2) / 255 - 0.5) / 0.25
+    np.testing.assert_allclose(result, expected, atol=1e-5)
+
+def test_model_parity():
+    from ultralytics import YOLO
+
+    from mlcore.grpc_core.servers.handlers.predict import PredictHandler
+
+    model = YOLO("yolov8n-cls.yaml")
+    images = np.random.default_rng(1).integers(0, 256, (2, 224, 224, 3), dtype=np.uint8)
+
+    expected = [PredictHandler.run_model(model, image) for image in images]
+    batch = Preprocessor.preprocess(images, *Preprocessor.input_spec(model))
+    results = PredictHandler.run_model_batch(model, batch)
+
+    for result, reference_result in zip(results, expected):
+        np.testing.assert_allclose(
+            [item["probability"] for item in result],
+            [item["probability"] for item in reference_result],
+            atol=1e-4,
+        )
+
+def test_model_parity_with_normalization():
+    from ultralytics import YOLO
+
+    from mlcore.grpc_core.servers.handlers.predict import PredictHandler
+
+    model = YOLO("yolov8n-cls.yaml")
+    model.model.transforms = classify_transforms(224, mean=(0.4, 0.45, 0.5), std=(0.2, 0.22, 0.25))
+    images = np.random.default_rng(2).integers(0, 256, (2, 224, 224, 3), dtype=np.uint8)
+
+    batch = Preprocessor.preprocess(images, *Preprocessor.input_spec(model))
+    # Values past 1 are what model.predict would have divided by 255 again.
+    assert batch.max() > 1
+    results = PredictHandler.run_model_batch(model, batch)
+
+    for image, result in zip(images, results):
+        expected = model.predict(image, imgsz=224, verbose=False)[0].probs.data
+        np.testing.assert_allclose([item["probability"] for item in result], expected, atol=1e-4)
+
+def test_model_batch_off_the_stride():
+    from ultralytics import YOLO
+
+    from mlcore.grpc_core.servers.handlers.predict import PredictHandler
+
+    model = YOLO("yolov8n-cls.yaml")
+    batch = Preprocessor.preprocess(np.zeros((3, 100, 100, 3), dtype=np.uint8), 100)
+
+    # 100 is not a multiple of the model stride of 32.
+    assert batch.shape[-1] % 32
+    results = PredictHandler.run_model_batch(model, batch)
+
+    assert len(results) == 3
+    assert sum(item["probability"] for item in results[0]) == pytest.approx(1, abs=1e-4)
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from mlcore.grpc_core.servers.handlers.predict import (
+    QUANTIZATION_MANIFEST,
+    PredictHandler,
+)
+from mlcore.grpc_core.servers.handlers.quantization import INT8_STATE, Int8Layers
+from mlcore.tools.quantize import box_agreement, evaluate, gate, quantize
+
+
+def test_box_agreement():
+    boxes = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+
+    assert box_agreement(boxes, boxes) == 1.0
+    assert box_agreement(boxes, boxes[:1] + 1) == 2 / 3
+    assert box_agreement(boxes[:0], boxes[:0]) == 1.0
+    assert box_agreement(boxes, boxes[:0]) == 0.0
+
+def test_evaluate_classifier():
+    report = evaluate(
+        "classify",
+        ["healthy", "blight", "blight", "blight"],
+        ["healthy", "blight", "blight", "healthy"],
+        ["healthy", "blight", "healthy", "healthy"],
+    )
+
+    assert report == {"agreement": 0.75, "fp32_accuracy": 0.75, "int8_accuracy": 0.5}
+
+def test_gate():
+    report = {"agreement": 0.99, "quantized_layers": 1, "fp32_accuracy": 0.9, "int8_accuracy": 0.895}
+
+    assert gate(report, min_agreement=0.98, max_accuracy_drop=0.01)[0]
+    assert not gate(report, min_agreement=0.995, max_accuracy_drop=0.01)[0]
+    assert not gate(report, min_agreement=0.98, max_accuracy_drop=0.001)[0]
+    assert not gate({**report, "quantized_layers": 0}, 0.98, 0.01)[0]
+
+def test_resolve_variant(tmp_path):
+    weights = tmp_path / "tomato_cls_model.pt"
+    variant = tmp_path / "tomato_cls_model.int8.pt"
+    weights.touch()
+    variant.touch()
+
+    manifest = tmp_path / QUANTIZATION_MANIFEST
+    entry = {"precision": "int8", "variant": variant.name, "accepted": True}
+    manifest.write_text(json.dumps({weights.name: entry}))
+
+    assert PredictHandler.resolve_variant(str(weights), "fp32") == str(weights)
+    assert PredictHandler.resolve_variant(str(weights), "int8") == str(variant)
+
+    manifest.write_text(json.dumps({weights.name: {**entry, "accepted": False}}))
+    assert PredictHandler.resolve_variant(str(weights), "int8") == str(weights)
+
+    manifest.write_text(json.dumps({weights.name: entry}))
+    variant.unlink()
+    assert PredictHandler.resolve_variant(str(weights), "int8") == str(weights)
+
+def test_int8_variant_round_trip(tmp_path):
+    model = YOLO("yolov8n-cls.yaml")
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (64, 64, 3), dtype=np.uint8) for _ in range(2)]
+
+    fused, quantized, layers = quantize(model, images)
+
+    convs = [m for m in quantized.modules() if isinstance(m, torch.ao.nn.quantized.Conv2d)]
+    assert convs and layers > len(convs)
+
+    variant = tmp_path / "tomato_cls_model.int8.pt"
+    torch.save({"model": fused, INT8_STATE: quantized.state_dict()}, variant)
+    loaded = YOLO(str(variant))
+    Int8Layers.load(loaded)
+
+    batch = torch.from_numpy(np.stack(images).transpose(0, 3, 1, 2).astype(np.float32) / 255)
+    with torch.inference_mode():
+        expected = quantized(batch)[0]
+        output = loaded.model(batch)[0]
+
+    torch.testing.assert_close(output, expected)
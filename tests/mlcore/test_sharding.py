@@ -0,0 +1,34 @@
+from mlcore.grpc_core.protos.predict import predict_pb2
+from mlcore.grpc_core.servers.sharding import HashRing, assigned_plants, plant_key
+
+NODES = "mlcore1:50051,mlcore2:50052,mlcore3:50053"
+
+def test_unsharded_node_serves_every_plant(monkeypatch):
+    monkeypatch.delenv("MLCORE_NODES", raising=False)
+
+    assert assigned_plants() == list(predict_pb2.Plant.values())
+
+def test_every_plant_is_assigned_replication_times(monkeypatch):
+    monkeypatch.setenv("MLCORE_NODES", NODES)
+    monkeypatch.setenv("SHARD_REPLICATION", "2")
+
+    assigned = []
+    for node in NODES.split(","):
+        monkeypatch.setenv("MLCORE_NODE_ID", node)
+        assigned.extend(assigned_plants())
+
+    for plant in predict_pb2.Plant.values():
+        assert assigned.count(plant) == 2
+
+def test_assignment_matches_ring(monkeypatch):
+    monkeypatch.setenv("MLCORE_NODES", NODES)
+    monkeypatch.setenv("MLCORE_NODE_ID", "mlcore2:50052")
+    monkeypatch.setenv("SHARD_REPLICATION", "1")
+
+    ring = HashRing(NODES.split(","), replication=1)
+    expected = [
+        plant for plant in predict_pb2.Plant.values()
+        if ring.owners(plant_key(plant)) == ["mlcore2:50052"]
+    ]
+
+    assert assigned_plants() == expected
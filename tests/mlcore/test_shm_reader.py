@@ -0,0 +1,69 @@
+from multiprocessing import shared_memory
+
+import pytest
+
+from mlcore.grpc_core.protos.predict import predict_pb2
+from mlcore.grpc_core.servers.handlers.shm import SharedMemoryReader
+
+
+@pytest.fixture
+def segment():
+    segment = shared_memory.SharedMemory(name="leafcare-test-reader", create=True, size=16)
+    segment.buf[:8] = b"abcdefgh"
+    yield segment
+    SharedMemoryReader._segments.pop(segment.name, None)
+    segment.close()
+    segment.unlink()
+
+def test_inline_images():
+    request = predict_pb2.PredictorRequest(image_data=[b"a", b"b"])
+
+    assert SharedMemoryReader.images(request) == [b"a", b"b"]
+
+def test_images_from_shared_memory(segment):
+    request = predict_pb2.PredictorRequest(
+        shm_name=segment.name,
+        image_refs=[
+            predict_pb2.SharedMemoryRef(offset=0, length=3),
+            predict_pb2.SharedMemoryRef(offset=3, length=5),
+        ],
+    )
+
+    images = SharedMemoryReader.images(request)
+
+    assert [bytes(image) for image in images] == [b"abc", b"defgh"]
+    assert all(isinstance(image, memoryview) for image in images)
+    del images
+
+def test_reference_outside_segment(segment):
+    request = predict_pb2.PredictorRequest(
+        shm_name=segment.name,
+        image_refs=[predict_pb2.SharedMemoryRef(offset=10, length=100)],
+    )
+
+    with pytest.raises(ValueError, match="outside"):
+        SharedMemoryReader.images(request)
+
+def test_foreign_segment_is_rejected():
+    request = predict_pb2.PredictorRequest(shm_name="other-segment")
+
+    with pytest.raises(ValueError, match="not allowed"):
+        SharedMemoryReader.images(request)
+
+def test_generation_of_a_reused_slot(segment):
+    segment.buf[:8] = (7).to_bytes(8, "little")
+    request = predict_pb2.PredictorRequest(
+        shm_name=segment.name,
+        shm_generation=7,
+        image_refs=[predict_pb2.SharedMemoryRef(offset=8, length=4)],
+    )
+
+    assert SharedMemoryReader.is_current(request)
+
+    # The bot cleared the stamp when it released the slot.
+    segment.buf[:8] = bytes(8)
+    assert not SharedMemoryReader.is_current(request)
+
+    # Requests without a generation come from bots that do not stamp slots.
+    request.shm_generation = 0
+    assert SharedMemoryReader.is_current(request)
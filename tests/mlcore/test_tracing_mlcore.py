@@ -0,0 +1,40 @@
+from mlcore.tracing import Tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_extract_traceparent():
+    parent = Tracer.extract([("user-agent", "grpc"), ("traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01")])
+
+    assert parent.trace_id == TRACE_ID
+    assert parent.span_id == PARENT_ID
+    assert parent.sampled
+
+def test_extract_ignores_missing_or_malformed():
+    assert Tracer.extract([]) is None
+    assert Tracer.extract(None) is None
+    assert Tracer.extract([("traceparent", "garbage")]) is None
+
+def test_span_joins_remote_trace(tmp_path):
+    tracer = Tracer(enabled=True, sample_rate=0.0, export_url=f"file://{tmp_path}/t.jsonl")
+    remote = Tracer.extract([("traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01")])
+
+    # The bot's sampling decision wins over the local sample rate.
+    with tracer.span("mlcore.predict", remote_parent=remote) as span:
+        assert span.sampled
+        assert span.trace_id == TRACE_ID
+        assert span.parent_id == PARENT_ID
+        with tracer.span("decode") as child:
+            assert child.parent_id == span.span_id
+
+def test_unsampled_remote_trace_skips_nested_spans(tmp_path):
+    tracer = Tracer(enabled=True, sample_rate=1.0, export_url=f"file://{tmp_path}/t.jsonl")
+    remote = Tracer.extract([("traceparent", f"00-{TRACE_ID}-{PARENT_ID}-00")])
+
+    with tracer.span("mlcore.predict", remote_parent=remote) as span:
+        assert not span.sampled
+        with tracer.span("decode") as child:
+            assert not child.sampled
+
+    assert tracer.current is None